@@ -1,28 +1,51 @@
-import logging
+import os
+import sys
 import smtplib
 import requests
 import json
+import threading
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime
 
+# 添加项目根目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from infrastructure.logging_setup import get_logger
+
 class AlertManager:
-    def __init__(self, config_path=None):
+    def __init__(self, config_path=None, store=None, history_limit=1000):
         self.logger = self._setup_logger()
+        self.config_path = config_path
         self.config = self._load_config(config_path)
+        
+        # 内存中只保留最近history_limit条告警，完整历史保存在store（AlertStore）中
         self.alert_history = []
+        self.history_lock = threading.Lock()
+        self.history_limit = history_limit
+        self.store = store
         
+        # (告警类型, 资源ID) -> 最后一次发送的时间，冷却检查不需要遍历历史
+        self.last_sent = {}
+        if store is not None:
+            self._load_history()
+    
     def _setup_logger(self):
-        logger = logging.getLogger("alert_manager")
-        logger.setLevel(logging.INFO)
-        handler = logging.FileHandler("alerts.log")
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        handler.setFormatter(formatter)
-        logger.addHandler(handler)
-        return logger
+        return get_logger("alert_manager", "alerts.log")
     
     def _load_config(self, config_path):
-        """加载告警配置"""
+        """加载告警配置（配置文件有误时使用默认配置）"""
+        try:
+            config = self._read_config(config_path)
+            if config_path:
+                self.logger.info(f"Configuration loaded from {config_path}")
+            return config
+        except Exception as e:
+            self.logger.error(f"Error loading configuration: {str(e)}")
+            return self._read_config(None)
+    
+    def _read_config(self, config_path):
+        """读取告警配置并与默认配置合并，文件无法解析时抛出异常"""
         default_config = {
             "email": {
                 "enabled": False,
@@ -54,52 +77,144 @@ class AlertManager:
         }
         
         if config_path:
-            try:
-                with open(config_path, 'r') as f:
-                    loaded_config = json.load(f)
-                    # 合并配置
-                    for key, value in loaded_config.items():
-                        if key in default_config and isinstance(value, dict):
-                            default_config[key].update(value)
-                        else:
-                            default_config[key] = value
-                self.logger.info(f"Configuration loaded from {config_path}")
-            except Exception as e:
-                self.logger.error(f"Error loading configuration: {str(e)}")
+            with open(config_path, 'r') as f:
+                loaded_config = json.load(f)
+            # 合并配置
+            for key, value in loaded_config.items():
+                if key in default_config and isinstance(value, dict):
+                    default_config[key].update(value)
+                else:
+                    default_config[key] = value
         
         return default_config
     
+    @staticmethod
+    def _validate_config(config):
+        """校验告警渠道配置，不合法时抛出ValueError"""
+        required = {
+            "email": ("smtp_server", "smtp_port", "from_address", "recipients"),
+            "webhook": ("url",),
+            "sms": ("api_url", "to_numbers")
+        }
+        for channel, keys in required.items():
+            channel_config = config.get(channel)
+            if not isinstance(channel_config, dict):
+                raise ValueError(f"{channel} must be an object")
+            if not isinstance(channel_config.get("enabled"), bool):
+                raise ValueError(f"{channel}.enabled must be true or false")
+            if channel_config["enabled"]:
+                missing = [key for key in keys if not channel_config.get(key)]
+                if missing:
+                    raise ValueError(f"{channel} is enabled but missing {', '.join(missing)}")
+        if not isinstance(config["email"].get("recipients"), list):
+            raise ValueError("email.recipients must be a list")
+        if not isinstance(config["sms"].get("to_numbers"), list):
+            raise ValueError("sms.to_numbers must be a list")
+        
+        cooldown = config.get("alert_cooldown_minutes")
+        if isinstance(cooldown, bool) or not isinstance(cooldown, (int, float)) or cooldown < 0:
+            raise ValueError(f"alert_cooldown_minutes must be a non-negative number, got {cooldown!r}")
+    
+    def reload_config(self, path=None):
+        """重新读取并校验告警配置，校验通过后整体替换（发送中的告警仍使用旧配置）"""
+        path = path or self.config_path
+        try:
+            config = self._read_config(path)
+            self._validate_config(config)
+        except Exception as e:
+            self.logger.error(f"Alert configuration reload from {path} rejected: {str(e)}")
+            return False
+        self.config = config
+        self.logger.info(f"Alert configuration reloaded from {path}")
+        return True
+    
+    def _load_history(self):
+        """从告警存储恢复最近的告警和冷却状态，重启后冷却期内的告警不会重复发送"""
+        try:
+            cooldown_seconds = self.config.get("alert_cooldown_minutes", 15) * 60
+            self.alert_history = self.store.recent(self.history_limit)
+            self.last_sent = self.store.last_sent(datetime.now().timestamp() - cooldown_seconds)
+            self.logger.info(f"Loaded {len(self.alert_history)} alerts from {self.store.path}")
+        except Exception as e:
+            self.logger.error(f"Error loading alert history: {str(e)}")
+    
+    def restore_history(self, alerts):
+        """恢复告警（timestamp为datetime）到内存历史和冷却状态，用于没有告警存储时从状态快照恢复"""
+        with self.history_lock:
+            self.alert_history[:0] = alerts
+            del self.alert_history[:-self.history_limit]
+            for alert in alerts:
+                key = (alert["type"], alert["resource_id"])
+                if key not in self.last_sent or self.last_sent[key] < alert["timestamp"]:
+                    self.last_sent[key] = alert["timestamp"]
+    
     def _should_send_alert(self, alert_type, resource_id):
         """检查是否应该发送告警（避免告警风暴）"""
         now = datetime.now()
         cooldown_minutes = self.config.get("alert_cooldown_minutes", 15)
         
-        # 检查历史告警
-        for alert in self.alert_history:
-            if (alert["type"] == alert_type and 
-                alert["resource_id"] == resource_id and 
-                (now - alert["timestamp"]).total_seconds() < cooldown_minutes * 60):
-                return False
+        # 检查同一类型、同一资源最后一次告警的时间
+        last = self.last_sent.get((alert_type, resource_id))
+        return last is None or (now - last).total_seconds() >= cooldown_minutes * 60
+    
+    @staticmethod
+    def _serialize(alert):
+        """告警的副本，时间转换为ISO字符串（不修改历史中的记录）"""
+        alert = dict(alert)
+        if isinstance(alert.get("timestamp"), datetime):
+            alert["timestamp"] = alert["timestamp"].isoformat()
+        return alert
+    
+    def recent_alerts(self, limit=50):
+        """最近的limit条告警（按时间从旧到新）"""
+        with self.history_lock:
+            alerts = self.alert_history[-limit:] if limit > 0 else []
+        return [self._serialize(alert) for alert in alerts]
+    
+    def query_alerts(self, start=None, end=None, alert_type=None, resource_id=None, severity=None,
+                     limit=50, offset=0):
+        """按时间范围（epoch秒）、类型、资源和严重性分页查询告警，返回 (告警列表, 总数)
         
-        return True
+        有告警存储时查询完整历史，否则查询内存中的最近告警；页的划分与AlertStore.query相同。
+        """
+        if self.store is not None:
+            return self.store.query(start=start, end=end, alert_type=alert_type, resource_id=resource_id,
+                                    severity=severity, limit=limit, offset=offset)
+        
+        with self.history_lock:
+            matched = [alert for alert in self.alert_history
+                       if (start is None or alert["timestamp"].timestamp() >= start) and
+                       (end is None or alert["timestamp"].timestamp() < end) and
+                       (alert_type is None or alert["type"] == alert_type) and
+                       (resource_id is None or alert["resource_id"] == resource_id) and
+                       (severity is None or alert["severity"] == severity)]
+        page = matched[max(len(matched) - offset - limit, 0):max(len(matched) - offset, 0)]
+        return [self._serialize(alert) for alert in page], len(matched)
+    
+    def close(self):
+        """关闭告警存储，之后的查询使用内存中的最近告警"""
+        store, self.store = self.store, None
+        if store is not None:
+            store.close()
     
     def send_email_alert(self, subject, message):
         """发送邮件告警"""
-        if not self.config["email"]["enabled"]:
+        email_config = self.config["email"]
+        if not email_config["enabled"]:
             self.logger.info("Email alerts are disabled")
             return False
         
         try:
             msg = MIMEMultipart()
-            msg['From'] = self.config["email"]["from_address"]
-            msg['To'] = ", ".join(self.config["email"]["recipients"])
+            msg['From'] = email_config["from_address"]
+            msg['To'] = ", ".join(email_config["recipients"])
             msg['Subject'] = subject
             
             msg.attach(MIMEText(message, 'plain'))
             
-            server = smtplib.SMTP(self.config["email"]["smtp_server"], self.config["email"]["smtp_port"])
+            server = smtplib.SMTP(email_config["smtp_server"], email_config["smtp_port"])
             server.starttls()
-            server.login(self.config["email"]["username"], self.config["email"]["password"])
+            server.login(email_config["username"], email_config["password"])
             server.send_message(msg)
             server.quit()
             
@@ -111,14 +226,15 @@ class AlertManager:
     
     def send_webhook_alert(self, payload):
         """发送Webhook告警"""
-        if not self.config["webhook"]["enabled"]:
+        webhook_config = self.config["webhook"]
+        if not webhook_config["enabled"]:
             self.logger.info("Webhook alerts are disabled")
             return False
         
         try:
             response = requests.post(
-                self.config["webhook"]["url"],
-                headers=self.config["webhook"]["headers"],
+                webhook_config["url"],
+                headers=webhook_config["headers"],
                 data=json.dumps(payload)
             )
             
@@ -134,21 +250,22 @@ class AlertManager:
     
     def send_sms_alert(self, message):
         """发送短信告警"""
-        if not self.config["sms"]["enabled"]:
+        sms_config = self.config["sms"]
+        if not sms_config["enabled"]:
             self.logger.info("SMS alerts are disabled")
             return False
         
         try:
-            for to_number in self.config["sms"]["to_numbers"]:
+            for to_number in sms_config["to_numbers"]:
                 payload = {
-                    "api_key": self.config["sms"]["api_key"],
-                    "from": self.config["sms"]["from_number"],
+                    "api_key": sms_config["api_key"],
+                    "from": sms_config["from_number"],
                     "to": to_number,
                     "message": message
                 }
                 
                 response = requests.post(
-                    self.config["sms"]["api_url"],
+                    sms_config["api_url"],
                     json=payload
                 )
                 
@@ -164,22 +281,34 @@ class AlertManager:
     
     def trigger_alert(self, alert_type, resource_id, severity, message, details=None):
         """触发告警"""
-        if not self._should_send_alert(alert_type, resource_id):
-            self.logger.info(f"Alert for {alert_type} on {resource_id} suppressed (cooldown period)")
-            return False
-        
-        now = datetime.now()
-        alert_record = {
-            "type": alert_type,
-            "resource_id": resource_id,
-            "severity": severity,
-            "message": message,
-            "details": details,
-            "timestamp": now
-        }
+        # 检查冷却期和记录告警在同一把锁内完成，多个告警线程并发时不会重复发送
+        with self.history_lock:
+            if not self._should_send_alert(alert_type, resource_id):
+                self.logger.info(f"Alert for {alert_type} on {resource_id} suppressed (cooldown period)")
+                return False
+            
+            now = datetime.now()
+            alert_record = {
+                "type": alert_type,
+                "resource_id": resource_id,
+                "severity": severity,
+                "message": message,
+                "details": details,
+                "timestamp": now
+            }
+            
+            # 记录告警
+            self.alert_history.append(alert_record)
+            if len(self.alert_history) > self.history_limit:
+                del self.alert_history[:-self.history_limit]
+            self.last_sent[(alert_type, resource_id)] = now
         
-        # 记录告警
-        self.alert_history.append(alert_record)
+        # 写入告警存储（在锁外进行，不阻塞其他告警的冷却检查）
+        if self.store is not None:
+            try:
+                self.store.add(alert_record)
+            except Exception as e:
+                self.logger.error(f"Error persisting alert: {str(e)}")
         
         # 根据严重性构建告警标题
         severity_prefix = {
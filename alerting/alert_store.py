@@ -0,0 +1,138 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from datetime import datetime
+
+class AlertStore:
+    """基于SQLite的告警历史存储
+    
+    使用WAL日志模式（写入不阻塞读取），按时间、告警类型和资源ID建立索引，
+    几个月的告警历史上按条件分页查询仍然只扫描索引范围内的行。
+    超过retention_days的告警在写入时定期清理。
+    """
+    
+    PRUNE_EVERY = 1000
+    
+    def __init__(self, path, retention_days=180):
+        self.path = path
+        self.retention_days = retention_days
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS alerts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp REAL NOT NULL,
+                type TEXT NOT NULL,
+                resource_id TEXT NOT NULL,
+                severity TEXT,
+                message TEXT,
+                details TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_alerts_time ON alerts (timestamp);
+            CREATE INDEX IF NOT EXISTS idx_alerts_type_time ON alerts (type, timestamp);
+            CREATE INDEX IF NOT EXISTS idx_alerts_resource_time ON alerts (resource_id, timestamp);
+        """)
+        self._inserts = 0
+        self.prune()
+    
+    def add(self, alert):
+        """保存一条告警（timestamp为datetime），返回其id"""
+        timestamp = alert["timestamp"]
+        if isinstance(timestamp, datetime):
+            timestamp = timestamp.timestamp()
+        details = json.dumps(alert.get("details"), ensure_ascii=False, default=str)
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO alerts (timestamp, type, resource_id, severity, message, details) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (timestamp, alert["type"], alert["resource_id"], alert.get("severity"), alert.get("message"), details)
+            )
+            self._inserts += 1
+        if self._inserts % self.PRUNE_EVERY == 0:
+            self.prune()
+        return cursor.lastrowid
+    
+    @staticmethod
+    def _where(start=None, end=None, alert_type=None, resource_id=None, severity=None):
+        """构建查询条件，start/end为epoch秒"""
+        clauses, params = [], []
+        for clause, value in (("timestamp >= ?", start), ("timestamp < ?", end), ("type = ?", alert_type),
+                              ("resource_id = ?", resource_id), ("severity = ?", severity)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+    
+    @staticmethod
+    def _to_dict(row):
+        return {
+            "id": row["id"],
+            "type": row["type"],
+            "resource_id": row["resource_id"],
+            "severity": row["severity"],
+            "message": row["message"],
+            "details": json.loads(row["details"]) if row["details"] else None,
+            "timestamp": datetime.fromtimestamp(row["timestamp"]).isoformat()
+        }
+    
+    def query(self, start=None, end=None, alert_type=None, resource_id=None, severity=None, limit=50, offset=0):
+        """按条件分页查询，返回 (告警列表, 符合条件的总数)
+        
+        页按时间从新到旧划分（offset=0为最新的limit条），页内按时间从旧到新排列；
+        timestamp转换为ISO字符串。
+        """
+        where, params = self._where(start, end, alert_type, resource_id, severity)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM alerts{where} ORDER BY timestamp DESC, id DESC LIMIT ? OFFSET ?",
+                params + [limit, offset]
+            ).fetchall()
+            total = self._conn.execute(f"SELECT COUNT(*) FROM alerts{where}", params).fetchone()[0]
+        return [self._to_dict(row) for row in reversed(rows)], total
+    
+    def recent(self, limit=50):
+        """最近的limit条告警（时间为datetime，用于恢复内存中的历史和冷却状态）"""
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM alerts ORDER BY timestamp DESC, id DESC LIMIT ?",
+                                      (limit,)).fetchall()
+        alerts = []
+        for row in reversed(rows):
+            alert = self._to_dict(row)
+            alert["timestamp"] = datetime.fromtimestamp(row["timestamp"])
+            alerts.append(alert)
+        return alerts
+    
+    def last_sent(self, since):
+        """since（epoch秒）之后每个 (告警类型, 资源ID) 最后一次告警的时间"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT type, resource_id, MAX(timestamp) FROM alerts WHERE timestamp >= ? "
+                "GROUP BY type, resource_id",
+                (since,)
+            ).fetchall()
+        return {(row[0], row[1]): datetime.fromtimestamp(row[2]) for row in rows}
+    
+    def prune(self):
+        """删除超过保留期的告警，返回删除的条数"""
+        if not self.retention_days:
+            return 0
+        cutoff = time.time() - self.retention_days * 86400
+        with self._lock:
+            return self._conn.execute("DELETE FROM alerts WHERE timestamp < ?", (cutoff,)).rowcount
+    
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM alerts").fetchone()[0]
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,26 +1,188 @@
+import sys
 import pandas as pd
 import numpy as np
 from sklearn.preprocessing import MinMaxScaler
 from sklearn.ensemble import RandomForestRegressor
+from scipy.special import ndtri
 import matplotlib.pyplot as plt
-import logging
+import time
 import os
 
+# 添加项目根目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from infrastructure.logging_setup import get_logger
+
+def _fill_missing(series):
+    """缺失值用前一个值填充（开头的缺失用之后第一个值），形状为 (序列数, 样本数)"""
+    series = np.asarray(series, dtype=float)
+    if not np.isnan(series).any():
+        return series
+    return pd.DataFrame(series).ffill(axis=1).bfill(axis=1).fillna(0.0).values
+
+class ForecastBackend:
+    """轻量预测后端的基类
+    
+    后端对单个指标的一批序列 (序列数, 样本数) 直接在历史数据上闭式拟合，不需要单独训练，
+    forecast()返回各预测步的均值和标准差 (序列数, steps)。sample_paths()把它转换为
+    与随机森林相同形式的样本路径，quantiles和time_to_threshold可以统一处理。
+    """
+    
+    name = None
+    
+    def forecast(self, history, steps):
+        raise NotImplementedError
+    
+    def sample_paths(self, history, steps, n_paths=100):
+        """由预测均值和标准差生成n_paths条路径 (n_paths, 序列数, steps)
+        
+        第k条路径取各步正态分布的第(k+0.5)/n_paths分位数，路径之间不交叉：
+        某条路径达到阈值的比例等于各步超过阈值概率的最大值。
+        """
+        mean, std = self.forecast(_fill_missing(history), steps)
+        z = ndtri((np.arange(n_paths) + 0.5) / n_paths)
+        return mean[np.newaxis] + z[:, np.newaxis, np.newaxis] * std[np.newaxis]
+
+class LinearTrendBackend(ForecastBackend):
+    """最近window个样本上的最小二乘线性趋势，标准差为回归的预测区间"""
+    
+    name = "linear"
+    
+    def __init__(self, window=120):
+        self.window = window
+    
+    def forecast(self, history, steps):
+        y = history[:, -self.window:]
+        n = y.shape[1]
+        x = np.arange(n) - (n - 1) / 2.0
+        sxx = max(float((x ** 2).sum()), 1e-12)
+        y_mean = y.mean(axis=1, keepdims=True)
+        slope = ((y - y_mean) * x).sum(axis=1, keepdims=True) / sxx
+        residuals = y - y_mean - slope * x
+        sigma = np.sqrt((residuals ** 2).sum(axis=1, keepdims=True) / max(n - 2, 1))
+        
+        future = (n - 1) / 2.0 + np.arange(1, steps + 1)
+        mean = y_mean + slope * future
+        std = sigma * np.sqrt(1 + 1.0 / n + future ** 2 / sxx)
+        return mean, std
+
+class HoltWintersBackend(ForecastBackend):
+    """加法Holt-Winters指数平滑；season_length为0或历史不足两个周期时为Holt线性趋势"""
+    
+    name = "holt_winters"
+    
+    def __init__(self, alpha=0.3, beta=0.05, gamma=0.1, season_length=0):
+        self.alpha = alpha
+        self.beta = beta
+        self.gamma = gamma
+        self.season_length = season_length
+    
+    def forecast(self, history, steps):
+        y = history
+        n_series, n = y.shape
+        m = self.season_length if self.season_length and n >= 2 * self.season_length else 0
+        if m:
+            first = y[:, :m].mean(axis=1)
+            level = first
+            trend = (y[:, m:2 * m].mean(axis=1) - first) / m
+            season = y[:, :m] - first[:, np.newaxis]
+            start = m
+        else:
+            k = max(min(n - 1, 10), 1)
+            level = y[:, 0].copy()
+            trend = (y[:, k] - y[:, 0]) / k if n > 1 else np.zeros(n_series)
+            season = None
+            start = 1
+        
+        squared_error = np.zeros(n_series)
+        for t in range(start, n):
+            s = season[:, t % m] if m else 0.0
+            error = y[:, t] - (level + trend + s)
+            squared_error += error ** 2
+            new_level = self.alpha * (y[:, t] - s) + (1 - self.alpha) * (level + trend)
+            trend = self.beta * (new_level - level) + (1 - self.beta) * trend
+            if m:
+                season[:, t % m] = self.gamma * (y[:, t] - new_level) + (1 - self.gamma) * s
+            level = new_level
+        sigma = np.sqrt(squared_error / max(n - start, 1))
+        
+        h = np.arange(1, steps + 1)
+        mean = level[:, np.newaxis] + h * trend[:, np.newaxis]
+        if m:
+            mean = mean + season[:, (n - 1 + h) % m]
+        # 加法Holt模型h步预测误差的方差系数：1 + sum((alpha * (1 + j * beta))^2), j = 1..h-1
+        c = self.alpha * (1 + np.arange(1, steps) * self.beta)
+        variance = 1 + np.concatenate(([0.0], np.cumsum(c ** 2)))
+        return mean, sigma[:, np.newaxis] * np.sqrt(variance)
+
+class RidgeLagBackend(ForecastBackend):
+    """以前lags个样本为特征的岭回归（每个序列闭式求解），递推预测，标准差由自回归系数的脉冲响应得到"""
+    
+    name = "ridge"
+    
+    def __init__(self, lags=12, l2=0.01):
+        self.lags = lags
+        self.l2 = l2
+    
+    def forecast(self, history, steps):
+        n_series, n = history.shape
+        lags = max(1, min(self.lags, n // 3))
+        
+        # 按序列标准化，正则化强度与数据尺度无关
+        center = history.mean(axis=1, keepdims=True)
+        scale = np.maximum(history.std(axis=1, keepdims=True), 1e-6)
+        z = (history - center) / scale
+        
+        windows = np.lib.stride_tricks.sliding_window_view(z, lags + 1, axis=1)
+        X, target = windows[..., :-1], windows[..., -1]
+        gram = np.einsum('sni,snj->sij', X, X) + self.l2 * X.shape[1] * np.eye(lags)
+        coef = np.linalg.solve(gram, np.einsum('sni,sn->si', X, target)[..., np.newaxis])[..., 0]
+        residuals = target - np.einsum('sni,si->sn', X, coef)
+        sigma = np.sqrt((residuals ** 2).mean(axis=1))
+        
+        # coef按时间顺序排列（最后一个对应上一步），phi[:, i]是滞后i+1步的系数
+        phi = coef[:, ::-1]
+        window = z[:, -lags:].copy()
+        mean = np.empty((n_series, steps))
+        psi = np.zeros((n_series, steps))
+        psi[:, 0] = 1.0
+        for step in range(steps):
+            mean[:, step] = (window * coef).sum(axis=1)
+            window = np.concatenate([window[:, 1:], mean[:, step:step + 1]], axis=1)
+            if step > 0:
+                j = min(step, lags)
+                psi[:, step] = (phi[:, :j] * psi[:, step - 1::-1][:, :j]).sum(axis=1)
+        std = sigma[:, np.newaxis] * np.sqrt(np.cumsum(psi ** 2, axis=1))
+        return center + scale * mean, scale * std
+
+# 可按指标选择的预测后端；"forest"为PredictiveAnalytics自身的随机森林
+FORECAST_BACKENDS = {
+    LinearTrendBackend.name: LinearTrendBackend,
+    HoltWintersBackend.name: HoltWintersBackend,
+    RidgeLagBackend.name: RidgeLagBackend
+}
+
 class PredictiveAnalytics:
-    def __init__(self, model_path=None):
+    def __init__(self, model_path=None, cpu_budget=None, n_estimators=100, backend_params=None, n_paths=100):
         self.model = None
         self.model_path = model_path
+        self.cpu_budget = cpu_budget
+        self.n_estimators = n_estimators
         self.scaler = MinMaxScaler()
         self.logger = self._setup_logger()
         
+        # 轻量预测后端；n_paths为不使用随机森林时每个序列的样本路径数
+        self.backends = {}
+        self.set_backend_params(backend_params)
+        self.n_paths = n_paths
+    
     def _setup_logger(self):
-        logger = logging.getLogger("predictive_analytics")
-        logger.setLevel(logging.INFO)
-        handler = logging.FileHandler("predictions.log")
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        handler.setFormatter(formatter)
-        logger.addHandler(handler)
-        return logger
+        return get_logger("predictive_analytics", "predictions.log")
+    
+    def set_backend_params(self, backend_params=None):
+        """按 {后端名: 参数字典} 创建轻量预测后端"""
+        backend_params = backend_params or {}
+        self.backends = {name: cls(**backend_params.get(name, {})) for name, cls in FORECAST_BACKENDS.items()}
     
     def prepare_data(self, data, look_back=24):
         """准备时序数据"""
@@ -30,28 +192,41 @@ class PredictiveAnalytics:
             y.append(data[i + look_back, :])
         return np.array(X).reshape(len(X), -1), np.array(y)
     
-    def train(self, data_path, feature_columns, target_column=None, look_back=24):
-        """训练预测模型"""
+    def train(self, data_path, feature_columns, target_column=None, look_back=24, n_jobs=None):
+        """训练预测模型（data_path可以是CSV路径或DataFrame）"""
         try:
             # 加载数据
-            df = pd.read_csv(data_path)
+            df = data_path if isinstance(data_path, pd.DataFrame) else pd.read_csv(data_path)
             
             # 如果没有指定目标列，使用与特征相同的列进行预测
             if target_column is None:
                 target_column = feature_columns[0]
-                
+            
             # 准备特征和目标
             features = df[feature_columns].values
             
-            # 标准化数据
-            scaled_features = self.scaler.fit_transform(features)
+            # 标准化数据（使用新的scaler，训练完成前不影响正在进行的预测）
+            scaler = MinMaxScaler()
+            scaled_features = scaler.fit_transform(features)
             
             # 准备时序数据
             X, y = self.prepare_data(scaled_features, look_back)
             
-            # 构建随机森林模型
-            self.model = RandomForestRegressor(n_estimators=100, random_state=42)
-            self.model.fit(X, y)
+            # 按CPU预算确定并行度
+            if self.cpu_budget is not None and n_jobs is None:
+                n_jobs = self.cpu_budget.n_jobs()
+            
+            # 构建随机森林模型（有CPU预算时在调低了优先级的专用训练线程中拟合）
+            self.logger.info(f"Training prediction model (n_jobs={n_jobs})...")
+            model = RandomForestRegressor(n_estimators=self.n_estimators, random_state=42, n_jobs=n_jobs)
+            if self.cpu_budget is not None:
+                self.cpu_budget.run(model.fit, X, y)
+            else:
+                model.fit(X, y)
+            
+            # 训练完成后再替换模型和scaler
+            self.scaler = scaler
+            self.model = model
             
             # 保存模型和scaler
             if self.model_path:
@@ -141,8 +316,178 @@ class PredictiveAnalytics:
             self.logger.error(f"Error forecasting: {str(e)}")
             return None
     
-    def plot_forecast(self, historical_data, forecast_data, feature_index=0, feature_name="Value"):
-        """绘制历史数据和预测数据"""
+    def forecast_paths(self, data, steps=60, look_back=24, scaled=None):
+        """概率预测：随机森林的每棵树沿自己的预测递推steps步
+        
+        data为单个序列 (样本数, 特征数) 或一批序列 (序列数, 样本数, 特征数)，如多台主机，
+        所有序列在每棵树上一次批量预测。返回原始单位的路径数组 (树数, 序列数, steps, 特征数)，
+        各树路径的分布即预测的不确定性。scaled为已用当前scaler缩放的回看窗口
+        （如FeatureStore.lag_matrix的结果），给出时不再缩放data。
+        """
+        if self.model is None:
+            self.logger.error("Model not trained or loaded")
+            return None
+        
+        try:
+            data = np.asarray(data, dtype=float)
+            if data.ndim == 2:
+                data = data[np.newaxis]
+            n_series, _, n_features = data.shape
+            
+            if scaled is None:
+                scaled = self.scaler.transform(data[:, -look_back:].reshape(-1, n_features))
+            scaled = np.asarray(scaled).reshape(n_series, look_back, n_features)
+            
+            trees = self.model.estimators_
+            windows = np.repeat(scaled[np.newaxis], len(trees), axis=0).astype(np.float32)
+            paths = np.empty((len(trees), n_series, steps, n_features), dtype=np.float32)
+            for step in range(steps):
+                for t, tree in enumerate(trees):
+                    X = np.ascontiguousarray(windows[t].reshape(n_series, -1))
+                    paths[t, :, step] = tree.predict(X, check_input=False).reshape(n_series, n_features)
+                # 每棵树的窗口滑动一步，追加该树自己的预测
+                windows = np.concatenate([windows[:, :, 1:], paths[:, :, step:step + 1]], axis=2)
+            
+            # MinMaxScaler是逐特征的线性变换，可直接整体反变换
+            paths = self.scaler.inverse_transform(paths.reshape(-1, n_features).astype(float))
+            return paths.reshape(len(trees), n_series, steps, n_features)
+        except Exception as e:
+            self.logger.error(f"Error forecasting paths: {str(e)}")
+            return None
+    
+    def forecast_by_metric(self, data, steps=60, look_back=24, backends=None, scaled=None):
+        """按指标使用各自的预测后端生成样本路径
+        
+        data形状与forecast_paths相同，backends为与特征顺序对应的后端名列表（默认全部使用随机森林）。
+        只有选择了"forest"的指标需要运行随机森林，此时路径数等于树的数量，否则为n_paths；
+        scaled传给forecast_paths。
+        返回 (路径数, 序列数, steps, 特征数)。
+        """
+        data = np.asarray(data, dtype=float)
+        if data.ndim == 2:
+            data = data[np.newaxis]
+        n_series, _, n_features = data.shape
+        backends = list(backends or ["forest"] * n_features)
+        
+        forest_paths = None
+        if "forest" in backends:
+            forest_paths = self.forecast_paths(data, steps=steps, look_back=look_back, scaled=scaled)
+            if forest_paths is None:
+                self.logger.warning("Forest forecast unavailable, falling back to linear backend")
+                backends = ["linear" if name == "forest" else name for name in backends]
+        
+        try:
+            n_paths = len(forest_paths) if forest_paths is not None else self.n_paths
+            paths = np.empty((n_paths, n_series, steps, n_features))
+            for i, name in enumerate(backends):
+                if name == "forest":
+                    paths[..., i] = forest_paths[..., i]
+                else:
+                    paths[..., i] = self.backends[name].sample_paths(data[:, :, i], steps, n_paths)
+            return paths
+        except Exception as e:
+            self.logger.error(f"Error forecasting with backends {backends}: {str(e)}")
+            return None
+    
+    def _forest_mean(self, data, steps, look_back):
+        """随机森林的均值预测（整个森林递推），用于交叉验证"""
+        n_series, _, n_features = data.shape
+        window = self.scaler.transform(data[:, -look_back:].reshape(-1, n_features)).reshape(n_series, look_back,
+                                                                                              n_features)
+        mean = np.empty((n_series, steps, n_features))
+        for step in range(steps):
+            mean[:, step] = self.model.predict(window.reshape(n_series, -1)).reshape(n_series, n_features)
+            window = np.concatenate([window[:, 1:], mean[:, step:step + 1]], axis=1)
+        return self.scaler.inverse_transform(mean.reshape(-1, n_features)).reshape(n_series, steps, n_features)
+    
+    def select_backends(self, data, features, steps=60, look_back=24, candidates=None, configured=None,
+                        folds=3, tolerance=0.1):
+        """按滚动起点交叉验证为每个指标选择预测后端
+        
+        在data (序列数, 样本数, 特征数) 的最后folds个起点上，用起点之前的数据预测之后的
+        steps步（历史不足时缩短），记录各候选后端的平均绝对误差和每次预测的耗时。
+        每个指标选择误差不超过最佳误差(1 + tolerance)倍的候选中耗时最少的一个。
+        configured为 {指标: 后端名或"auto"}，指定了后端的指标不参与选择。
+        返回 (选择 {指标: 后端名}, 评估结果 {指标: {后端名: {"mae", "cost_ms"}}})。
+        """
+        configured = configured or {}
+        candidates = [c for c in (candidates or list(FORECAST_BACKENDS) + ["forest"])
+                      if c in FORECAST_BACKENDS or (c == "forest" and self.model is not None)]
+        selection = {f: configured[f] for f in features if configured.get(f, "auto") != "auto"}
+        auto = [i for i, f in enumerate(features) if f not in selection]
+        if not auto or not candidates:
+            return {**{features[i]: "linear" for i in auto}, **selection}, {}
+        
+        data = np.asarray(data, dtype=float)
+        if data.ndim == 2:
+            data = data[np.newaxis]
+        data = np.stack([_fill_missing(data[:, :, i]) for i in range(data.shape[2])], axis=2)
+        n = data.shape[1]
+        min_history = max(look_back, 30)
+        horizon = max(1, min(steps, (n - min_history) // folds))
+        origins = [n - horizon * k for k in range(folds, 0, -1) if n - horizon * k >= min_history]
+        if not origins:
+            return {**{features[i]: "linear" for i in auto}, **selection}, {}
+        
+        errors = {c: np.zeros(len(features)) for c in candidates}
+        costs = {c: np.zeros(len(features)) for c in candidates}
+        for origin in origins:
+            history, actual = data[:, :origin], data[:, origin:origin + horizon]
+            for candidate in candidates:
+                if candidate == "forest":
+                    # 随机森林一次预测所有指标，耗时计入每个指标（森林的训练数据通常包含验证区间，误差偏乐观）
+                    started = time.perf_counter()
+                    predicted = self._forest_mean(history, horizon, look_back)
+                    costs[candidate] += time.perf_counter() - started
+                    errors[candidate] += np.abs(predicted - actual).mean(axis=(0, 1))
+                    continue
+                for i in auto:
+                    started = time.perf_counter()
+                    predicted, _ = self.backends[candidate].forecast(history[:, :, i], horizon)
+                    costs[candidate][i] += time.perf_counter() - started
+                    errors[candidate][i] += np.abs(predicted - actual[:, :, i]).mean()
+        
+        report = {}
+        for i in auto:
+            scores = {c: {"mae": float(errors[c][i] / len(origins)),
+                          "cost_ms": float(costs[c][i] / len(origins) * 1000)} for c in candidates}
+            best = min(score["mae"] for score in scores.values())
+            eligible = [c for c in candidates if scores[c]["mae"] <= best * (1 + tolerance) + 1e-9]
+            selection[features[i]] = min(eligible, key=lambda c: scores[c]["cost_ms"])
+            report[features[i]] = scores
+        return selection, report
+    
+    @staticmethod
+    def quantiles(paths, quantiles=(0.1, 0.5, 0.9)):
+        """各预测步的分位数，形状为 (分位数, 序列数, steps, 特征数)"""
+        return np.quantile(paths, quantiles, axis=0)
+    
+    @staticmethod
+    def time_to_threshold(paths, thresholds):
+        """估计达到阈值的时间（以预测步数计）
+        
+        thresholds为每个特征的阈值。对每条树路径找到首次达到阈值的步，返回字典：
+        probability为预测范围内达到阈值的路径比例，steps_p50为首次达到步数的中位数，
+        steps_p10为较早的估计（10%的路径在此之前达到）；估计超出预测范围时为NaN。
+        各数组形状为 (序列数, 特征数)。
+        """
+        reached = paths >= np.asarray(thresholds, dtype=float)
+        crossed = reached.any(axis=2)
+        first = np.where(crossed, reached.argmax(axis=2) + 1, np.inf)
+        
+        # 未达到阈值的路径记为无穷大，按排序位置取分位数（避免无穷大之间插值）
+        ordered = np.sort(first, axis=0)
+        steps_p50 = ordered[(len(ordered) - 1) // 2]
+        steps_p10 = ordered[int(0.1 * (len(ordered) - 1))]
+        return {
+            "probability": crossed.mean(axis=0),
+            "steps_p50": np.where(np.isfinite(steps_p50), steps_p50, np.nan),
+            "steps_p10": np.where(np.isfinite(steps_p10), steps_p10, np.nan)
+        }
+    
+    def plot_forecast(self, historical_data, forecast_data, feature_index=0, feature_name="Value",
+                      lower=None, upper=None):
+        """绘制历史数据和预测数据（lower/upper给出时绘制预测区间）"""
         try:
             plt.figure(figsize=(12, 6))
             
@@ -153,9 +498,15 @@ class PredictiveAnalytics:
             
             # 绘制预测数据
             plt.plot(range(len(historical_data)-1, len(historical_data) + len(forecast_data)), 
-                     np.vstack([historical_data[-1:, feature_index], forecast_data[:, feature_index]]), 
+                     np.concatenate([historical_data[-1:, feature_index], forecast_data[:, feature_index]]), 
                      label='Forecast', color='red', linestyle='--')
             
+            # 绘制预测区间
+            if lower is not None and upper is not None:
+                plt.fill_between(range(len(historical_data), len(historical_data) + len(forecast_data)),
+                                 lower[:, feature_index], upper[:, feature_index],
+                                 color='red', alpha=0.2, label='Forecast Interval')
+            
             plt.title(f'{feature_name} Forecast')
             plt.xlabel('Time')
             plt.ylabel(feature_name)
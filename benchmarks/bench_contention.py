@@ -0,0 +1,133 @@
+import os
+import sys
+import time
+import argparse
+import json
+import threading
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from infrastructure.metrics_store import MetricsStore
+
+FEATURES = ['cpu_percent', 'memory_percent', 'disk_usage']
+
+class GlobalLockStore:
+    """原有模型：列表加全局锁，读写和训练都在锁内完成"""
+
+    def __init__(self):
+        self.data = []
+        self.lock = threading.Lock()
+
+    def append(self, record):
+        with self.lock:
+            self.data.append(record)
+
+    def read_recent(self, limit):
+        with self.lock:
+            return np.array([[r[f] for f in FEATURES] for r in self.data[-limit:]])
+
+    def train(self, hold_seconds):
+        with self.lock:
+            df = pd.DataFrame(self.data)
+            time.sleep(hold_seconds)
+            return len(df)
+
+class SnapshotStore:
+    """快照模型：单写者发布不可变快照，读者和训练不加锁"""
+
+    def __init__(self):
+        self.store = MetricsStore()
+
+    def append(self, record):
+        self.store.append(record)
+
+    def read_recent(self, limit):
+        return self.store.snapshot().feature_array(FEATURES, last=limit)
+
+    def train(self, hold_seconds):
+        df = self.store.snapshot().to_frame()
+        time.sleep(hold_seconds)
+        return len(df)
+
+def make_record(i):
+    return {
+        "timestamp": i,
+        "cpu_percent": 40.0 + i % 20,
+        "memory_percent": 60.0 + i % 10,
+        "disk_usage": 50.0
+    }
+
+def run(store, duration, readers, preload, hold_seconds):
+    """运行一轮并发读写，返回读延迟分位数和写吞吐"""
+    for i in range(preload):
+        store.append(make_record(i))
+
+    stop = threading.Event()
+    latencies = [[] for _ in range(readers)]
+    writes = [0]
+
+    def writer():
+        i = preload
+        while not stop.is_set():
+            store.append(make_record(i))
+            i += 1
+            writes[0] += 1
+            time.sleep(0.0005)
+
+    def reader(idx):
+        while not stop.is_set():
+            start = time.perf_counter()
+            store.read_recent(100)
+            latencies[idx].append(time.perf_counter() - start)
+            time.sleep(0.001)
+
+    def trainer():
+        while not stop.is_set():
+            store.train(hold_seconds)
+            stop.wait(hold_seconds)
+
+    threads = [threading.Thread(target=writer), threading.Thread(target=trainer)]
+    threads += [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    for t in threads:
+        t.start()
+    time.sleep(duration)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    all_latencies = np.array([l for ls in latencies for l in ls]) * 1000
+    return {
+        "reads": int(len(all_latencies)),
+        "read_p50_ms": float(np.percentile(all_latencies, 50)),
+        "read_p99_ms": float(np.percentile(all_latencies, 99)),
+        "read_max_ms": float(all_latencies.max()),
+        "writes_per_second": writes[0] / duration
+    }
+
+def parse_arguments():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='全局锁与快照存储的读写争用基准测试')
+    parser.add_argument('--duration', type=float, default=5.0, help='每轮运行时间（秒）')
+    parser.add_argument('--readers', type=int, default=4, help='读线程数')
+    parser.add_argument('--preload', type=int, default=50000, help='预先写入的记录数')
+    parser.add_argument('--hold', type=float, default=0.2, help='模拟训练持有数据的时间（秒）')
+    parser.add_argument('--output', type=str, default=None, help='结果保存为JSON文件')
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_arguments()
+
+    results = {}
+    for name, store in [("global_lock", GlobalLockStore()), ("snapshot", SnapshotStore())]:
+        results[name] = run(store, args.duration, args.readers, args.preload, args.hold)
+        r = results[name]
+        print(f"{name:<12} reads={r['reads']:<8} p50={r['read_p50_ms']:.3f}ms "
+              f"p99={r['read_p99_ms']:.3f}ms max={r['read_max_ms']:.1f}ms "
+              f"writes/s={r['writes_per_second']:.0f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
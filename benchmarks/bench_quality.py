@@ -0,0 +1,260 @@
+import os
+import sys
+import time
+import json
+import argparse
+import tempfile
+import itertools
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from controller.main_controller import AIOperationsController
+from analytics.predictive_analytics import PredictiveAnalytics
+from infrastructure.metrics_store import DEFAULT_HOST, to_epoch
+from benchmarks.synthetic import SyntheticFleet, FEATURES
+from benchmarks.harness import save_results
+
+class ReplayCost:
+    """统计一次回放消耗的CPU时间、墙钟时间和峰值内存（tracemalloc）"""
+
+    def __enter__(self):
+        tracemalloc.start()
+        self.cpu_start = time.process_time()
+        self.wall_start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cpu_seconds = time.process_time() - self.cpu_start
+        self.wall_seconds = time.perf_counter() - self.wall_start
+        _, self.peak_memory_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    def to_dict(self):
+        return {
+            "cpu_seconds": self.cpu_seconds,
+            "wall_seconds": self.wall_seconds,
+            "peak_memory_bytes": int(self.peak_memory_bytes)
+        }
+
+def load_dataset(args):
+    """读取带is_anomaly标签的CSV，未指定时生成合成数据"""
+    if args.data:
+        df = pd.read_csv(args.data)
+        if "is_anomaly" not in df.columns:
+            raise ValueError(f"{args.data} has no is_anomaly column")
+        return df
+    fleet = SyntheticFleet(hosts=1, seed=args.seed, anomaly_rate=args.anomaly_rate)
+    return fleet.generate_host(0, args.rows)
+
+def anomaly_windows(labels):
+    """把连续的异常标签合并为窗口 [(起点, 终点), ...]"""
+    windows = []
+    start = None
+    for i, label in enumerate(labels):
+        if label and start is None:
+            start = i
+        elif not label and start is not None:
+            windows.append((start, i))
+            start = None
+    if start is not None:
+        windows.append((start, len(labels)))
+    return windows
+
+def replay_config(workdir, contamination, n_estimators, args):
+    """回放用的控制器配置：文件写入临时目录，不执行修复，不恢复或保存状态"""
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    config = {
+        "anomaly_model_path": os.path.join(workdir, "anomaly_model.pkl"),
+        "prediction_model_path": os.path.join(workdir, "prediction_model.h5"),
+        "alert_config_path": os.path.join(root, "config", "alerts.json"),
+        "data_path": os.path.join(workdir, "metrics.csv"),
+        "auto_remediation": False,
+        "models": {"contamination": contamination, "anomaly_estimators": n_estimators},
+        "drift_detection": {"training_window": args.train_rows},
+        "baseline": {"enabled": args.baseline},
+        "training": {"niceness": 0},
+        "storage": {"segment_dir": os.path.join(workdir, "segments")},
+        "state": {"enabled": False},
+        "alert_store": {"enabled": False},
+        "config_reload": {"enabled": False},
+        "process_tracking": {"enabled": False}
+    }
+    path = os.path.join(workdir, "config.json")
+    with open(path, 'w') as f:
+        json.dump(config, f)
+    return path
+
+def replay_detection(df, contamination, n_estimators, args):
+    """通过控制器回放异常检测：每条记录经ingest写入（阈值检查、特征存储、季节性基线、漂移统计），
+    每detect_every条数据运行一次检测任务（由漂移监控决定是否重新训练），检测阶段在回放线程中同步执行；
+    --baseline时启用季节性基线过滤"""
+    columns = [c for c in ["timestamp", "host"] + FEATURES if c in df.columns]
+    records = df[columns].to_dict("records")
+    labels = df["is_anomaly"].values.astype(bool)
+    predicted = np.zeros(len(records), dtype=bool)
+    scored = np.zeros(len(records), dtype=bool)
+
+    def key(record):
+        return record.get("host", DEFAULT_HOST), to_epoch(record["timestamp"])
+
+    index = {key(record): i for i, record in enumerate(records)}
+    model_samples = [0]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        controller = AIOperationsController(config_path=replay_config(workdir, contamination, n_estimators, args))
+        detect = controller.anomaly_detector.detect_anomalies
+
+        def counting_detect(X):
+            model_samples[0] += len(X)
+            return detect(X)
+
+        def submit(stage, item):
+            # 检测阶段同步执行并记录结果；告警和修复不在回放中执行
+            if stage == "detect":
+                for record in item["records"]:
+                    scored[index[key(record)]] = True
+                for event in controller._detect_stage(item) or []:
+                    predicted[index[key(event["details"])]] = True
+            return True
+
+        controller.anomaly_detector.detect_anomalies = counting_detect
+        controller.pipeline.submit = submit
+        try:
+            with ReplayCost() as cost:
+                for i, record in enumerate(records):
+                    controller.ingest([record])
+                    if (i + 1) % args.detect_every == 0:
+                        controller.detect_anomalies()
+        finally:
+            controller.cpu_budget.close()
+            controller.alert_manager.close()
+    model_samples = model_samples[0]
+
+    truth = labels[scored]
+    hits = predicted[scored]
+    tp = int((truth & hits).sum())
+    fp = int((~truth & hits).sum())
+    fn = int((truth & ~hits).sum())
+    windows = [(s, e) for s, e in anomaly_windows(labels) if scored[s:e].any()]
+    caught = sum(1 for s, e in windows if predicted[s:e].any())
+
+    return {
+        "contamination": contamination,
+        "n_estimators": n_estimators,
+        "scored": int(scored.sum()),
+        "precision": tp / (tp + fp) if tp + fp else 0.0,
+        "recall": tp / (tp + fn) if tp + fn else 0.0,
+        "event_recall": caught / len(windows) if windows else None,
+        "false_positives_per_1000": fp * 1000.0 / max(1, int(scored.sum())),
+        "model_samples": model_samples,
+        **cost.to_dict()
+    }
+
+def replay_prediction(df, look_back, n_estimators, args):
+    """回放预测：训练后每predict_every条数据预测下一个采样点，与实际值比较"""
+    values = df[FEATURES].values
+    analytics = PredictiveAnalytics(n_estimators=n_estimators)
+    errors = []
+    failures = 0
+    trained_at = None
+
+    with ReplayCost() as cost:
+        for end in range(args.train_rows, len(values) - 1, args.predict_every):
+            if trained_at is None or end - trained_at >= args.retrain_every:
+                window = pd.DataFrame(values[end - args.train_rows:end], columns=FEATURES)
+                analytics.train(window, feature_columns=FEATURES, look_back=look_back)
+                trained_at = end
+
+            forecast = analytics.forecast_next_days(values[:end], days=1, look_back=look_back)
+            if forecast is None or len(forecast) == 0:
+                failures += 1
+                continue
+            errors.append(np.abs(forecast[0] - values[end]))
+
+    forecasts = len(errors)
+    errors = np.array(errors) if errors else np.full((1, len(FEATURES)), np.nan)
+    return {
+        "look_back": look_back,
+        "n_estimators": n_estimators,
+        "forecasts": forecasts,
+        "failures": failures,
+        "mae": {feature: float(np.nanmean(errors[:, i])) for i, feature in enumerate(FEATURES)},
+        "mae_mean": float(np.nanmean(errors)),
+        **cost.to_dict()
+    }
+
+def cheapest(results, accept):
+    """满足accept条件的结果中CPU时间最少的一个"""
+    candidates = [r for r in results if accept(r)]
+    return min(candidates, key=lambda r: r["cpu_seconds"]) if candidates else None
+
+def parse_list(text, cast):
+    return [cast(v) for v in text.split(',')]
+
+def parse_arguments():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='异常检测和预测模型在不同配置下的效果与开销评估（离线回放）')
+    parser.add_argument('--data', type=str, default=None, help='带is_anomaly标签列的CSV，默认生成合成数据')
+    parser.add_argument('--rows', type=int, default=5000, help='合成数据行数')
+    parser.add_argument('--anomaly-rate', type=float, default=0.002, help='合成数据中异常窗口的注入率')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    parser.add_argument('--contamination', type=str, default='0.01,0.02,0.05', help='异常检测contamination列表')
+    parser.add_argument('--anomaly-estimators', type=str, default='25,50,100', help='IsolationForest树数量列表')
+    parser.add_argument('--look-back', type=str, default='6,12,24', help='预测回看窗口列表')
+    parser.add_argument('--prediction-estimators', type=str, default='25,50,100', help='RandomForest树数量列表')
+    parser.add_argument('--train-rows', type=int, default=1440,
+                        help='训练窗口（采样点数，检测回放中作为drift_detection.training_window）')
+    parser.add_argument('--retrain-every', type=int, default=1440,
+                        help='预测回放中每隔多少采样点重新训练（检测回放由漂移监控决定）')
+    parser.add_argument('--detect-every', type=int, default=5, help='每隔多少采样点运行一次检测任务')
+    parser.add_argument('--predict-every', type=int, default=60, help='每隔多少采样点预测一次')
+    parser.add_argument('--min-precision', type=float, default=0.5, help='异常检测精确率目标')
+    parser.add_argument('--min-recall', type=float, default=0.5, help='异常检测召回率目标')
+    parser.add_argument('--max-mae', type=float, default=5.0, help='预测平均绝对误差目标')
+    parser.add_argument('--baseline', action='store_true', help='检测前先用季节性基线过滤，只把可疑样本交给模型')
+    parser.add_argument('--skip', type=str, default=None, help='跳过detection或prediction')
+    parser.add_argument('--output', type=str, default=None, help='结果保存为JSON文件')
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    df = load_dataset(args)
+    print(f"Replaying {len(df)} samples ({int(df['is_anomaly'].sum())} labelled anomalous)")
+
+    detection = []
+    if args.skip != "detection":
+        print(f"\n{'contam':>7}{'trees':>7}{'precision':>11}{'recall':>8}{'events':>8}{'fp/1k':>8}"
+              f"{'model n':>9}{'cpu s':>8}{'peak MB':>9}")
+        for contamination, n_estimators in itertools.product(parse_list(args.contamination, float),
+                                                            parse_list(args.anomaly_estimators, int)):
+            r = replay_detection(df, contamination, n_estimators, args)
+            detection.append(r)
+            events = f"{r['event_recall']:.2f}" if r['event_recall'] is not None else "-"
+            print(f"{contamination:>7.3f}{n_estimators:>7}{r['precision']:>11.3f}{r['recall']:>8.3f}{events:>8}"
+                  f"{r['false_positives_per_1000']:>8.1f}{r['model_samples']:>9}{r['cpu_seconds']:>8.2f}"
+                  f"{r['peak_memory_bytes'] / 1024 / 1024:>9.2f}")
+
+        best = cheapest(detection, lambda r: r["precision"] >= args.min_precision and r["recall"] >= args.min_recall)
+        print(f"Cheapest detection config meeting targets: "
+              f"{'none' if best is None else (best['contamination'], best['n_estimators'])}")
+
+    prediction = []
+    if args.skip != "prediction":
+        print(f"\n{'lookback':>9}{'trees':>7}{'mae':>8}{'failures':>10}{'cpu s':>8}{'peak MB':>9}")
+        for look_back, n_estimators in itertools.product(parse_list(args.look_back, int),
+                                                        parse_list(args.prediction_estimators, int)):
+            r = replay_prediction(df, look_back, n_estimators, args)
+            prediction.append(r)
+            print(f"{look_back:>9}{n_estimators:>7}{r['mae_mean']:>8.3f}{r['failures']:>10}"
+                  f"{r['cpu_seconds']:>8.2f}{r['peak_memory_bytes'] / 1024 / 1024:>9.2f}")
+
+        best = cheapest(prediction, lambda r: r["failures"] == 0 and r["mae_mean"] <= args.max_mae)
+        print(f"Cheapest prediction config meeting targets: "
+              f"{'none' if best is None else (best['look_back'], best['n_estimators'])}")
+
+    if args.output:
+        save_results(args.output, {"detection": detection, "prediction": prediction}, parameters=vars(args))
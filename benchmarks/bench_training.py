@@ -0,0 +1,68 @@
+import os
+import sys
+import time
+import argparse
+import json
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from models.anomaly_detection import AnomalyDetector
+from analytics.predictive_analytics import PredictiveAnalytics
+from infrastructure.cpu_budget import CPUBudget
+from benchmarks.synthetic import make_dataset, FEATURES
+
+def bench(model, rows, n_jobs, look_back):
+    """训练一次并返回耗时（秒）"""
+    df = make_dataset(rows)
+    start = time.perf_counter()
+    if model == "anomaly":
+        ok = AnomalyDetector().train(df, save_model=False, n_jobs=n_jobs)
+    else:
+        ok = PredictiveAnalytics().train(df, feature_columns=FEATURES, look_back=look_back, n_jobs=n_jobs)
+    elapsed = time.perf_counter() - start
+    return elapsed if ok else None
+
+def parse_arguments():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='模型训练耗时与并行核数的基准测试')
+    parser.add_argument('--rows', type=str, default='10000,100000,1000000', help='数据行数列表，逗号分隔')
+    parser.add_argument('--cores', type=str, default=None, help='并行核数列表，默认1到可用核数的2的幂')
+    parser.add_argument('--models', type=str, default='anomaly,prediction', help='anomaly,prediction')
+    parser.add_argument('--look-back', type=int, default=6, help='预测模型的回看窗口')
+    parser.add_argument('--output', type=str, default=None, help='结果保存为JSON文件')
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_arguments()
+
+    available = CPUBudget().available_cores()
+    if args.cores:
+        cores_list = [int(c) for c in args.cores.split(',')]
+    else:
+        cores_list = []
+        c = 1
+        while c < available:
+            cores_list.append(c)
+            c *= 2
+        cores_list.append(available)
+
+    print(f"Available cores (cgroup-aware): {available}")
+    print(f"{'model':<12}{'rows':>10}{'n_jobs':>8}{'seconds':>10}{'speedup':>9}")
+
+    results = []
+    for model in args.models.split(','):
+        for rows in [int(r) for r in args.rows.split(',')]:
+            baseline = None
+            for n_jobs in cores_list:
+                elapsed = bench(model, rows, n_jobs, args.look_back)
+                if elapsed is None:
+                    print(f"{model:<12}{rows:>10}{n_jobs:>8}{'failed':>10}")
+                    continue
+                baseline = baseline or elapsed
+                print(f"{model:<12}{rows:>10}{n_jobs:>8}{elapsed:>10.2f}{baseline / elapsed:>8.2f}x")
+                results.append({"model": model, "rows": rows, "n_jobs": n_jobs, "seconds": elapsed})
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"available_cores": available, "results": results}, f, indent=2)
@@ -0,0 +1,93 @@
+import os
+import sys
+import time
+import json
+import platform
+import tracemalloc
+import numpy as np
+from datetime import datetime
+
+def measure(name, func, items=1, repeat=20, warmup=2, setup=None):
+    """多次运行func，返回吞吐、延迟分位数和峰值内存
+
+    items为每次调用处理的条目数（用于计算吞吐），setup在每次调用前执行且不计时，
+    其返回值作为func的参数。峰值内存在单独一次tracemalloc运行中测量，不影响计时。
+    """
+    def call():
+        arg = setup() if setup else None
+        start = time.perf_counter()
+        func(arg) if setup else func()
+        return time.perf_counter() - start
+
+    for _ in range(warmup):
+        call()
+
+    durations = np.array([call() for _ in range(repeat)])
+
+    arg = setup() if setup else None
+    tracemalloc.start()
+    try:
+        func(arg) if setup else func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    total = durations.sum()
+    return {
+        "name": name,
+        "repeat": repeat,
+        "items": items,
+        "throughput_per_second": items * repeat / total if total > 0 else None,
+        "latency_ms": {
+            "mean": float(durations.mean() * 1000),
+            "p50": float(np.percentile(durations, 50) * 1000),
+            "p95": float(np.percentile(durations, 95) * 1000),
+            "p99": float(np.percentile(durations, 99) * 1000),
+            "max": float(durations.max() * 1000)
+        },
+        "peak_memory_bytes": int(peak)
+    }
+
+def environment():
+    """记录运行环境，便于比较不同机器上的结果"""
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__
+    }
+
+def save_results(path, results, parameters=None):
+    with open(path, 'w') as f:
+        json.dump({
+            "environment": environment(),
+            "parameters": parameters or {},
+            "results": results
+        }, f, indent=2)
+
+def load_results(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def compare_results(baseline, results, tolerance=0.2):
+    """与基线结果比较p50延迟，返回 [(名称, 基线ms, 当前ms, 变化比例, 是否回退)]"""
+    baseline_by_name = {r["name"]: r for r in baseline.get("results", [])}
+    rows = []
+    for result in results:
+        base = baseline_by_name.get(result["name"])
+        if base is None:
+            continue
+        before = base["latency_ms"]["p50"]
+        after = result["latency_ms"]["p50"]
+        change = (after - before) / before if before > 0 else 0.0
+        rows.append((result["name"], before, after, change, change > tolerance))
+    return rows
+
+def format_result(result):
+    latency = result["latency_ms"]
+    throughput = result["throughput_per_second"]
+    return (f"{result['name']:<24}{throughput or 0:>14.1f}{latency['p50']:>11.3f}{latency['p95']:>11.3f}"
+            f"{latency['p99']:>11.3f}{result['peak_memory_bytes'] / 1024 / 1024:>11.2f}")
+
+HEADER = f"{'benchmark':<24}{'items/s':>14}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}{'peak MB':>11}"
@@ -0,0 +1,276 @@
+import os
+import sys
+import types
+import asyncio
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.synthetic import SyntheticFleet, make_dataset, FEATURES
+from benchmarks.harness import measure, save_results, load_results, compare_results, format_result, HEADER
+from infrastructure.data_collector import SystemDataCollector
+from infrastructure.process_tracker import ProcessTracker
+from infrastructure.metrics_store import MetricsStore, to_epoch
+from models.anomaly_detection import AnomalyDetector
+from analytics.predictive_analytics import PredictiveAnalytics
+from alerting.alert_manager import AlertManager
+from infrastructure.remote_collector import RemoteCollector
+
+class StubHandler(BaseHTTPRequestHandler):
+    """本地Webhook/短信接口桩，读取请求体后直接返回200"""
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        self.rfile.read(length)
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, format, *args):
+        pass
+
+class StubServer:
+    """在后台线程运行的本地HTTP桩服务"""
+
+    def __init__(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.server.shutdown()
+        self.server.server_close()
+
+class StubExporter:
+    """在后台线程事件循环中运行的Prometheus导出器桩（keep-alive），每个路径代表一个目标"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.requests = 0
+        self.connections = {}
+        self.loop = asyncio.new_event_loop()
+        self.server = self.loop.run_until_complete(asyncio.start_server(self.handle, '127.0.0.1', 0,
+                                                                         backlog=4096))
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.sockets[0].getsockname()[1]}"
+
+    async def handle(self, reader, writer):
+        self.connections[asyncio.current_task()] = writer
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                while (await reader.readline()) not in (b'\r\n', b''):
+                    pass
+                self.requests += 1
+                if self.delay:
+                    await asyncio.sleep(self.delay)
+                target = request_line.split()[1].rsplit(b'/', 1)[-1].decode()
+                body = (f"# TYPE cpu_percent gauge\ncpu_percent{{target=\"{target}\"}} {self.requests % 100}\n"
+                        f"memory_percent 61.5\ndisk_usage 48.2\n"
+                        f"node_cpu_seconds_total{{cpu=\"0\",mode=\"idle\"}} {self.requests}\n").encode()
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\n"
+                             b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            del self.connections[asyncio.current_task()]
+            writer.close()
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    async def shutdown(self):
+        # 关闭连接让处理协程自行退出（取消处理协程会在流的回调中报错）
+        self.server.close()
+        for writer in list(self.connections.values()):
+            writer.close()
+        if self.connections:
+            await asyncio.wait(list(self.connections), timeout=1)
+
+    def __exit__(self, exc_type, exc, tb):
+        asyncio.run_coroutine_threadsafe(self.shutdown(), self.loop).result(timeout=5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=5)
+        self.loop.close()
+
+def bench_collection(args):
+    collector = SystemDataCollector(collection_interval=1)
+    tracked = SystemDataCollector(collection_interval=1, process_tracker=ProcessTracker(top_n=5))
+    return [
+        measure("collect", collector.collect_system_metrics, repeat=args.repeat),
+        measure("collect_with_processes", tracked.collect_system_metrics, repeat=args.repeat)
+    ]
+
+def bench_scrape(args):
+    # 每个目标是同一桩服务上的不同路径，连接数受并发限制而不是目标数
+    with StubExporter(delay=args.scrape_delay) as stub:
+        targets = [{"name": f"target-{i:05d}", "url": f"{stub.url}/metrics/{i}"} for i in range(args.targets)]
+        collector = RemoteCollector(targets, timeout=10, concurrency=args.scrape_concurrency)
+        results = [measure(f"scrape_{args.targets}_targets", collector.scrape_once, items=args.targets,
+                           repeat=max(3, args.repeat // 5))]
+        stats = collector.stats()
+        if stats["failures"]:
+            print(f"scrape: {stats['failures']} failed scrapes ({stats['timeouts']} timeouts)")
+        return results
+
+def bench_storage(args):
+    records = SyntheticFleet(hosts=args.hosts, seed=args.seed).records(args.rows // args.hosts)
+    batch = records[:1000]
+
+    store = MetricsStore(max_records=len(records))
+    store.extend(records)
+    latest = to_epoch(records[-1]["timestamp"])
+    return [
+        measure("store_append", lambda s: [s.append(r) for r in batch], items=len(batch),
+                repeat=args.repeat, setup=lambda: MetricsStore(max_records=len(records))),
+        measure("store_extend", lambda s: s.extend(records), items=len(records),
+                repeat=max(3, args.repeat // 5), setup=lambda: MetricsStore(max_records=len(records))),
+        measure("store_read_recent", lambda: store.snapshot().records(100), items=100, repeat=args.repeat),
+        measure("store_range_1h_host", lambda: store.snapshot().range(latest - 3600, latest, host="host-000"),
+                items=1, repeat=args.repeat),
+        # 快照会缓存特征矩阵和DataFrame，每次先追加一条记录得到新快照，测量的是未命中缓存的构建
+        measure("store_feature_array", lambda s: s.feature_array(FEATURES, last=1000), items=1000,
+                repeat=args.repeat, setup=lambda: store.append(records[-1])),
+        measure("store_to_frame", lambda s: s.to_frame(), items=len(records),
+                repeat=max(3, args.repeat // 5), setup=lambda: store.append(records[-1]))
+    ]
+
+def bench_models(args):
+    df = make_dataset(args.rows, seed=args.seed)
+    values = df[FEATURES].values
+    analytics = PredictiveAnalytics()
+    detector = AnomalyDetector()
+    slow_repeat = max(1, args.repeat // 10)
+
+    results = [
+        measure("prepare_data", lambda: analytics.prepare_data(values, look_back=args.look_back),
+                items=len(values), repeat=max(3, args.repeat // 5)),
+        measure("train_anomaly", lambda: detector.train(df, save_model=False), items=len(df),
+                repeat=slow_repeat, warmup=0),
+        measure("train_prediction", lambda: analytics.train(df, feature_columns=FEATURES, look_back=args.look_back),
+                items=len(df), repeat=slow_repeat, warmup=0)
+    ]
+
+    recent = values[-100:]
+    results.append(measure("detect_anomalies", lambda: detector.detect_anomalies(recent), items=len(recent),
+                           repeat=args.repeat))
+    results.append(measure("forecast_next_days", lambda: analytics.forecast_next_days(
+        values[-args.look_back:], days=args.forecast_days, look_back=args.look_back),
+        items=args.forecast_days, repeat=args.repeat))
+
+    # 随机森林样本路径与各轻量后端（每个特征作为一条序列）的预测开销
+    results.append(measure("forecast_paths_forest", lambda: analytics.forecast_paths(
+        values[-args.look_back:], steps=args.forecast_days, look_back=args.look_back),
+        items=args.forecast_days, repeat=slow_repeat))
+    history = values[-360:].T
+    for name, backend in analytics.backends.items():
+        results.append(measure(f"forecast_{name}", lambda backend=backend: backend.sample_paths(
+            history, args.forecast_days, analytics.n_paths), items=args.forecast_days, repeat=args.repeat))
+    return results
+
+def bench_alerting(args):
+    with StubServer() as stub:
+        manager = AlertManager()
+        manager.config["alert_cooldown_minutes"] = 0
+        manager.config["webhook"].update({"enabled": True, "url": stub.url + "/webhook"})
+        manager.config["sms"].update({"enabled": True, "api_url": stub.url + "/sms"})
+        counter = [0]
+
+        def dispatch():
+            counter[0] += 1
+            manager.trigger_alert("cpu_high", f"host-{counter[0]}", "warning",
+                                  "CPU使用率过高", {"cpu_percent": 95.0})
+
+        return [measure("alert_dispatch", dispatch, repeat=args.repeat)]
+
+def bench_web(args):
+    import web.app as web_app
+
+    store = MetricsStore()
+    store.extend(SyntheticFleet(hosts=args.hosts, seed=args.seed).records(args.rows // args.hosts))
+    # 与AIOperationsController.recent_metrics一致：读取最新快照的最近limit条记录
+    web_app.controller = types.SimpleNamespace(metrics_store=store,
+                                               recent_metrics=lambda limit=100: store.snapshot().records(limit))
+    client = web_app.app.test_client()
+
+    def get(url):
+        # 错误页面的耗时没有意义，非200响应直接让测试失败
+        response = client.get(url)
+        if response.status_code != 200:
+            raise RuntimeError(f"GET {url} returned {response.status_code}")
+        return response
+
+    try:
+        return [
+            measure("api_metrics_100", lambda: get('/api/metrics?limit=100'), items=1, repeat=args.repeat),
+            measure("api_metrics_1000", lambda: get('/api/metrics?limit=1000'), items=1, repeat=args.repeat)
+        ]
+    finally:
+        web_app.controller = None
+
+SUITES = {
+    "collection": bench_collection,
+    "scrape": bench_scrape,
+    "storage": bench_storage,
+    "models": bench_models,
+    "alerting": bench_alerting,
+    "web": bench_web
+}
+
+def parse_arguments():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='运维系统各环节的吞吐、延迟和内存基准测试')
+    parser.add_argument('--suites', type=str, default=','.join(SUITES), help='要运行的测试组，逗号分隔')
+    parser.add_argument('--rows', type=int, default=20000, help='合成数据总行数')
+    parser.add_argument('--hosts', type=int, default=4, help='合成数据的主机数')
+    parser.add_argument('--repeat', type=int, default=20, help='每项测试的重复次数')
+    parser.add_argument('--look-back', type=int, default=6, help='预测模型的回看窗口')
+    parser.add_argument('--forecast-days', type=int, default=7, help='预测步数')
+    parser.add_argument('--targets', type=int, default=2000, help='远程采集测试的目标数')
+    parser.add_argument('--scrape-concurrency', type=int, default=200, help='远程采集的并发数')
+    parser.add_argument('--scrape-delay', type=float, default=0.005, help='导出器桩每个请求的响应延迟（秒）')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    parser.add_argument('--output', type=str, default=None, help='结果保存为JSON文件')
+    parser.add_argument('--baseline', type=str, default=None, help='与之前保存的JSON结果比较')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='p50延迟增加超过该比例视为回退')
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_arguments()
+
+    print(HEADER)
+    results = []
+    for suite in args.suites.split(','):
+        for result in SUITES[suite](args):
+            print(format_result(result))
+            results.append(result)
+
+    if args.output:
+        save_results(args.output, results, parameters=vars(args))
+
+    if args.baseline:
+        regressions = 0
+        print(f"\n{'benchmark':<24}{'base p50':>11}{'p50':>11}{'change':>9}")
+        for name, before, after, change, regressed in compare_results(load_results(args.baseline), results,
+                                                                        args.tolerance):
+            regressions += regressed
+            print(f"{name:<24}{before:>11.3f}{after:>11.3f}{change:>+8.1%}{'  REGRESSION' if regressed else ''}")
+        sys.exit(1 if regressions else 0)
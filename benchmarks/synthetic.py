@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+
+FEATURES = ['cpu_percent', 'memory_percent', 'disk_usage']
+
+# 注入异常的类型：CPU饱和、内存泄漏、磁盘写满、整体水平偏移
+ANOMALY_KINDS = ['cpu_saturation', 'memory_leak', 'disk_fill', 'level_shift']
+
+class SyntheticFleet:
+    """多主机合成指标生成器
+
+    每台主机的指标由基线、日/周周期、噪声、短时尖峰和缓慢漂移叠加而成，
+    并按anomaly_rate注入带标签的异常窗口（is_anomaly/anomaly_kind列），
+    相同seed生成的数据完全一致，可用于可复现的基准测试和检测效果评估。
+    """
+
+    def __init__(self, hosts=4, interval=60, seed=42, spike_rate=0.002, anomaly_rate=0.001,
+                 anomaly_length=(5, 30), drift_per_day=0.5, start=None):
+        self.hosts = hosts
+        self.interval = interval
+        self.seed = seed
+        self.spike_rate = spike_rate
+        self.anomaly_rate = anomaly_rate
+        self.anomaly_length = anomaly_length
+        self.drift_per_day = drift_per_day
+        self.start = start or datetime(2025, 1, 1)
+
+    def host_names(self):
+        return [f"host-{i:03d}" for i in range(self.hosts)]
+
+    def generate_host(self, host_index, rows):
+        """生成单台主机rows个采样点的DataFrame"""
+        rng = np.random.default_rng(self.seed + host_index)
+        t = np.arange(rows)
+        per_day = 86400 / self.interval
+        daily = np.sin(2 * np.pi * t / per_day)
+        weekly = np.sin(2 * np.pi * t / (per_day * 7))
+        days = t / per_day
+
+        # 每台主机的基线和周期幅度不同
+        cpu_base = rng.uniform(20, 50)
+        memory_base = rng.uniform(40, 65)
+        disk_base = rng.uniform(30, 60)
+
+        cpu = cpu_base + rng.uniform(10, 25) * daily + 5 * weekly + rng.normal(0, 4, rows)
+        memory = memory_base + rng.uniform(3, 8) * daily + self.drift_per_day * days + rng.normal(0, 1.5, rows)
+        disk = disk_base + self.drift_per_day * 0.5 * days + rng.normal(0, 0.2, rows)
+
+        # 短时尖峰（不标记为异常，用于检验误报）
+        spikes = rng.random(rows) < self.spike_rate
+        cpu[spikes] += rng.uniform(20, 40, spikes.sum())
+
+        is_anomaly = np.zeros(rows, dtype=bool)
+        anomaly_kind = np.full(rows, "", dtype=object)
+        n_anomalies = rng.binomial(rows, self.anomaly_rate) if rows else 0
+        for _ in range(n_anomalies):
+            length = int(rng.integers(self.anomaly_length[0], self.anomaly_length[1] + 1))
+            begin = int(rng.integers(0, max(1, rows - length)))
+            end = min(rows, begin + length)
+            kind = ANOMALY_KINDS[int(rng.integers(len(ANOMALY_KINDS)))]
+            if kind == 'cpu_saturation':
+                cpu[begin:end] = rng.uniform(92, 100, end - begin)
+            elif kind == 'memory_leak':
+                memory[begin:end] += np.linspace(5, 35, end - begin)
+            elif kind == 'disk_fill':
+                disk[begin:end] += np.linspace(10, 40, end - begin)
+            else:
+                cpu[begin:end] += 30
+                memory[begin:end] += 15
+            is_anomaly[begin:end] = True
+            anomaly_kind[begin:end] = kind
+
+        start = self.start
+        step = timedelta(seconds=self.interval)
+        timestamps = [(start + step * i).isoformat() for i in range(rows)]
+
+        return pd.DataFrame({
+            "timestamp": timestamps,
+            "host": self.host_names()[host_index],
+            "cpu_percent": np.clip(cpu, 0, 100).round(1),
+            "memory_percent": np.clip(memory, 0, 100).round(1),
+            "disk_usage": np.clip(disk, 0, 100).round(1),
+            "is_anomaly": is_anomaly,
+            "anomaly_kind": anomaly_kind
+        })
+
+    def generate(self, rows_per_host):
+        """生成所有主机的数据，按时间交错排列"""
+        frames = [self.generate_host(i, rows_per_host) for i in range(self.hosts)]
+        df = pd.concat(frames, ignore_index=True)
+        return df.sort_values(["timestamp", "host"], kind="stable").reset_index(drop=True)
+
+    def records(self, rows_per_host, labels=False):
+        """以采集器记录（dict）的形式返回数据，labels为False时去掉标签列"""
+        df = self.generate(rows_per_host)
+        if not labels:
+            df = df.drop(columns=["is_anomaly", "anomaly_kind"])
+        return df.to_dict("records")
+
+def make_dataset(rows, seed=42):
+    """单主机的合成数据（仅特征列），用于训练和预测基准"""
+    fleet = SyntheticFleet(hosts=1, seed=seed, anomaly_rate=0.0, spike_rate=0.0)
+    return fleet.generate_host(0, rows)[FEATURES]
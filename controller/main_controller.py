@@ -1,66 +1,281 @@
 import os
 import sys
 import time
-import logging
 import pandas as pd
 import numpy as np
 import json
-from datetime import datetime, timedelta
+import socket
+from datetime import datetime
 import threading
 
 # 添加项目根目录到Python路径
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from infrastructure.data_collector import SystemDataCollector
+from infrastructure.cpu_budget import CPUBudget
+from infrastructure.metrics_store import MetricsStore, DEFAULT_HOST
+from infrastructure.process_tracker import ProcessTracker
+from infrastructure.rollup import RollupStore, merge_points
+from infrastructure.state_snapshot import StateSnapshot
+from infrastructure.feature_store import FeatureStore
+from infrastructure.remote_collector import create_remote_collector
+from infrastructure.health_check import create_health_checker
+from infrastructure.config_watcher import ConfigWatcher
+from infrastructure.query import aggregate_records, rebucket_rollup, ROLLUP_AGGREGATIONS
+from infrastructure.instrumentation import Instrumentation, SamplingProfiler
 from models.anomaly_detection import AnomalyDetector
+from models.drift_detection import DriftMonitor
+from models.seasonal_baseline import SeasonalBaseline
 from remediation.auto_remediation import RemediationEngine
-from analytics.predictive_analytics import PredictiveAnalytics
+from analytics.predictive_analytics import PredictiveAnalytics, FORECAST_BACKENDS
 from alerting.alert_manager import AlertManager
+from alerting.alert_store import AlertStore
+from controller.scheduler import Scheduler
+from controller.pipeline import Pipeline
+from infrastructure.logging_setup import get_logger, logging_stats
+
+STAGE_METRIC = "aiops_stage_duration_seconds"
+
+# 只在构造组件时读取、修改后需要重启才能生效的配置项
+RESTART_CONFIG_KEYS = ("anomaly_model_path", "prediction_model_path", "alert_config_path", "data_path",
+                       "models", "training", "storage", "rollup", "pipeline", "process_tracking",
+                       "remediation", "profiling", "feature_store", "alert_store", "logging",
+                       "remote_collection", "health_checks")
+
+# 其余部分重载时即时应用、只有这些子项需要重启的配置（分箱数决定参考分布的结构，季节性决定时间槽）
+RESTART_CONFIG_SUBKEYS = {"drift_detection": ("bins",), "baseline": ("enabled", "seasonality")}
+
+def _format_duration(seconds):
+    """把秒数格式化为分钟、小时或天"""
+    if seconds < 3600:
+        return f"{seconds / 60:.0f}分钟"
+    if seconds < 2 * 86400:
+        return f"{seconds / 3600:.1f}小时"
+    return f"{seconds / 86400:.1f}天"
+
+def _deep_sizeof(obj):
+    """估算对象（含嵌套dict/list）占用的字节数"""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_sizeof(k) + _deep_sizeof(v) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(_deep_sizeof(v) for v in obj)
+    return size
+
+def service_events(down, recovered):
+    """把健康检查结果转换为告警事件
+    
+    仍处于宕机状态的服务每次检查都提交，重复告警由冷却期抑制，重复修复由限流和熔断抑制。
+    """
+    events = []
+    for service in down:
+        remediations = []
+        if service.unit and service.remediate:
+            remediations.append(("service_down", {"service_name": service.unit}))
+        events.append({
+            "alert_type": "service_down",
+            "resource_id": f"service:{service.name}",
+            "severity": "critical",
+            "message": f"服务 {service.name} 不可用（连续{service.consecutive_failures}次检查失败）",
+            "details": service.last_result,
+            "remediations": remediations
+        })
+    for service in recovered:
+        events.append({
+            "alert_type": "service_recovered",
+            "resource_id": f"service:{service.name}",
+            "severity": "info",
+            "message": f"服务 {service.name} 已恢复",
+            "details": service.last_result
+        })
+    return events
 
 class AIOperationsController:
-    def __init__(self, config_path=None):
+    def __init__(self, config_path=None, shard_id=None):
         self.logger = self._setup_logger()
+        self.config_path = config_path
         self.config = self._load_config(config_path)
         
+        # 分片模式下每个分片使用独立的模型和数据路径，数据由协调器推送而非本地采集
+        self.shard_id = shard_id
+        if shard_id is not None:
+            self._apply_shard_paths()
+        
+        # 自身指标与采样分析器
+        self.instrumentation = Instrumentation()
+        profiling_config = self.config.get("profiling", {})
+        self.profiler = SamplingProfiler(
+            interval=profiling_config.get("interval", 0.01),
+            output_path=profiling_config.get("output_path", "profile.folded")
+        )
+        
         # 初始化组件
+        process_config = self.config.get("process_tracking", {})
+        self.process_tracker = None
+        if process_config.get("enabled", True):
+            self.process_tracker = ProcessTracker(top_n=process_config.get("top_n", 5))
+        
         self.data_collector = SystemDataCollector(
-            collection_interval=self.config.get("collection_interval", 60)
+            collection_interval=self.config.get("collection_interval", 60),
+            process_tracker=self.process_tracker
         )
         
+        # 本机的主机名：分片模式下协调器用它标记本机采集的记录，修复操作只对本机的记录执行
+        self.hostname = socket.gethostname()
+        
+        # 远程目标（导出器、指标接口）由异步采集器并发抓取，分片模式下由协调器采集
+        self.remote_collector = None
+        if shard_id is None:
+            self.remote_collector = create_remote_collector(self.config, self.config.get("collection_interval", 60))
+        
+        # 本机服务健康检查（分片模式下由协调器检查，结果转发到分片的告警流水线）
+        self.health_checker = None
+        if shard_id is None:
+            self.health_checker = create_health_checker(self.config)
+        
+        # 模型训练的CPU预算
+        training_config = self.config.get("training", {})
+        self.cpu_budget = CPUBudget(
+            max_cores=training_config.get("max_cores"),
+            cpu_fraction=training_config.get("cpu_fraction", 0.5),
+            niceness=training_config.get("niceness", 10)
+        )
+        
+        # 模型参数（可用benchmarks/bench_quality.py评估不同配置的效果和开销）
+        model_config = self.config.get("models", {})
+        self.look_back = model_config.get("look_back", 24)
+        
         self.anomaly_detector = AnomalyDetector(
-            model_path=self.config.get("anomaly_model_path", "models/anomaly_model.pkl")
+            model_path=self.config.get("anomaly_model_path", "models/anomaly_model.pkl"),
+            cpu_budget=self.cpu_budget,
+            contamination=model_config.get("contamination", 0.05),
+            n_estimators=model_config.get("anomaly_estimators", 100),
+            features=model_config.get("anomaly_features")
         )
         
-        self.remediation_engine = RemediationEngine()
+        self.remediation_engine = RemediationEngine(config=self.config.get("remediation", {}))
         
         self.predictive_analytics = PredictiveAnalytics(
-            model_path=self.config.get("prediction_model_path", "models/prediction_model.h5")
+            model_path=self.config.get("prediction_model_path", "models/prediction_model.h5"),
+            cpu_budget=self.cpu_budget,
+            n_estimators=model_config.get("prediction_estimators", 100),
+            backend_params=self.config.get("forecast", {}).get("backend_params")
         )
         
+        # 告警历史持久化到SQLite，内存中只保留最近的告警
+        alert_store_config = self.config.get("alert_store", {})
+        alert_store = None
+        if alert_store_config.get("enabled", True):
+            alert_store = AlertStore(
+                alert_store_config.get("path", "data/alerts.db"),
+                retention_days=alert_store_config.get("retention_days", 180)
+            )
         self.alert_manager = AlertManager(
-            config_path=self.config.get("alert_config_path", "config/alerts.json")
+            config_path=self.config.get("alert_config_path", "config/alerts.json"),
+            store=alert_store,
+            history_limit=alert_store_config.get("history_limit", 1000)
         )
         
-        # 数据存储
-        self.metrics_data = []
-        self.metrics_df = None
-        self.data_lock = threading.Lock()
+        # 概念漂移监控（异常检测与预测模型各自维护参考分布）
+        drift_config = self.config.get("drift_detection", {})
+        self.anomaly_drift = self._create_drift_monitor(drift_config, "anomaly")
+        self.prediction_drift = self._create_drift_monitor(drift_config, "prediction")
+        self.last_forecast = None
+        self.forecast_summary = {}
+        
+        # 每个指标使用的预测后端（按交叉验证定期重新选择）
+        self.forecast_backends = None
+        self.forecast_backend_report = {}
+        self.forecast_backends_at = 0
+        
+        # 季节性基线：异常检测的第一阶段过滤，并提供动态阈值
+        baseline_config = self.config.get("baseline", {})
+        self.baseline = None
+        if baseline_config.get("enabled", True):
+            self.baseline = SeasonalBaseline(
+                seasonality=baseline_config.get("seasonality", "hour_of_week"),
+                alpha=baseline_config.get("alpha", 0.01),
+                z_threshold=baseline_config.get("z_threshold", 2.5),
+                min_samples=baseline_config.get("min_samples", 30),
+                min_std=baseline_config.get("min_std", 0.5)
+            )
+        
+        # 数据存储：单写者追加，读者使用不可变快照，无需全局锁
+        collection_interval = self.config.get("collection_interval", 60)
+        retention_days = self.config.get("data_retention_days", 30)
+        
+        # 降采样层级：原始数据只保留较短时间，长期数据由聚合层级保存
+        rollup_config = self.config.get("rollup", {})
+        self.rollups = None
+        if rollup_config.get("enabled", True):
+            self.rollups = RollupStore(
+                ['cpu_percent', 'memory_percent', 'disk_usage'],
+                tiers=[(tier["resolution"], tier.get("retention_days", retention_days) * 86400)
+                       for tier in rollup_config.get("tiers", [])]
+            )
+        
+        # 封存的数据块压缩保存，并可写入段文件
+        storage_config = self.config.get("storage", {})
+        self.metrics_store = MetricsStore(
+            max_records=int(self._raw_retention_seconds() / collection_interval),
+            lock=self.instrumentation.timed_lock("metrics_store"),
+            compress=storage_config.get("compress", True),
+            on_compress=self._persist_segment if storage_config.get("persist_segments", True) else None
+        )
+        self.saved_version = 0
+        self.detected_version = 0
+        self.save_lock = threading.Lock()
+        
+        # 特征存储：写入时增量计算派生特征和缩放值，检测与预测共用
+        feature_config = self.config.get("feature_store", {})
+        self.feature_store = FeatureStore(
+            capacity=max(feature_config.get("capacity", 720), self.look_back,
+                         self.config.get("forecast", {}).get("history_steps", 360)),
+            windows=feature_config.get("windows", [5, 15, 60]),
+            max_rows=feature_config.get("max_rows") or self.metrics_store.max_records
+        )
+        unknown = [f for f in self.anomaly_detector.features if f not in self.feature_store.columns]
+        if unknown:
+            raise ValueError(f"models.anomaly_features contains unknown feature columns: {unknown}")
+        
+        # 状态快照：重启时恢复指标窗口、模型、告警冷却和调度进度
+        state_config = self.config.get("state", {})
+        self.state_snapshot = None
+        if state_config.get("enabled", True):
+            self.state_snapshot = StateSnapshot(state_config.get("path", "data/state"))
         
         # 运行状态
         self.running = False
-        self.threads = []
+        self.scheduler = Scheduler(name="ai_ops_scheduler")
+        
+        # 配置文件变化时热更新
+        self.config_watcher = ConfigWatcher(logger=self.logger)
+        if self.config.get("config_reload", {}).get("enabled", True):
+            self.config_watcher.watch(self.config_path, self.reload_config)
+            self.config_watcher.watch(self.config.get("alert_config_path"), self.alert_manager.reload_config)
+        self._register_jobs()
+        self.pipeline = Pipeline(name="ai_ops_pipeline")
+        self._build_pipeline()
+        
+        self.alert_manager.history_lock = self.instrumentation.timed_lock("alert_history")
+        self._register_instrumentation()
     
     def _setup_logger(self):
-        logger = logging.getLogger("ai_ops_controller")
-        logger.setLevel(logging.INFO)
-        handler = logging.FileHandler("controller.log")
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        handler.setFormatter(formatter)
-        logger.addHandler(handler)
-        return logger
+        return get_logger("ai_ops_controller", "controller.log")
     
     def _load_config(self, config_path):
-        """加载配置"""
+        """加载配置（配置文件有误时使用默认配置）"""
+        try:
+            config = self._read_config(config_path)
+            if config_path:
+                self.logger.info(f"Configuration loaded from {config_path}")
+            return config
+        except Exception as e:
+            self.logger.error(f"Error loading configuration: {str(e)}")
+            return self._read_config(None)
+    
+    def _read_config(self, config_path):
+        """读取配置文件并与默认配置合并，文件无法解析时抛出异常"""
         default_config = {
             "collection_interval": 60,
             "anomaly_detection_interval": 300,
@@ -75,248 +290,1061 @@ class AIOperationsController:
                 "cpu_percent": 90,
                 "memory_percent": 85,
                 "disk_usage": 90
+            },
+            "drift_detection": {
+                "enabled": True,
+                "bins": 10,
+                "decay": 0.995,
+                "psi_threshold": 0.2,
+                "residual_threshold": 2.0,
+                "min_samples": 30,
+                "training_window": 1440
+            },
+            "storage": {
+                "compress": True,
+                "persist_segments": True,
+                "segment_dir": "data/segments"
+            },
+            "rollup": {
+                "enabled": True,
+                "raw_retention_hours": 48,
+                "tiers": [
+                    {"resolution": 60, "retention_days": 7},
+                    {"resolution": 3600, "retention_days": 30}
+                ]
+            },
+            "models": {
+                "contamination": 0.05,
+                "anomaly_estimators": 100,
+                "prediction_estimators": 100,
+                "look_back": 24,
+                "anomaly_features": ["cpu_percent", "memory_percent", "disk_usage"]
+            },
+            "feature_store": {
+                "capacity": 720,
+                "windows": [5, 15, 60],
+                "max_rows": None
+            },
+            "training": {
+                "max_cores": None,
+                "cpu_fraction": 0.5,
+                "niceness": 10
+            },
+            "scheduler": {
+                "jitter": 0
+            },
+            "forecast": {
+                "horizon_steps": 180,
+                "quantiles": [0.1, 0.5, 0.9],
+                "alert_probability": 0.5,
+                "history_steps": 360,
+                "backends": {
+                    "cpu_percent": "auto",
+                    "memory_percent": "auto",
+                    "disk_usage": "auto"
+                },
+                "candidates": ["linear", "holt_winters", "ridge", "forest"],
+                "selection_tolerance": 0.1,
+                "selection_folds": 3,
+                "selection_interval": 3600,
+                "backend_params": {
+                    "linear": {"window": 120},
+                    "holt_winters": {"alpha": 0.3, "beta": 0.05, "gamma": 0.1, "season_length": 0},
+                    "ridge": {"lags": 12, "l2": 0.01}
+                }
+            },
+            "baseline": {
+                "enabled": True,
+                "seasonality": "hour_of_week",
+                "alpha": 0.01,
+                "z_threshold": 2.5,
+                "min_samples": 30,
+                "min_std": 0.5,
+                "dynamic_thresholds": True,
+                "threshold_sigma": 4.0,
+                "threshold_floor_ratio": 0.6
+            },
+            "config_reload": {
+                "enabled": True,
+                "interval": 5
+            },
+            "state": {
+                "enabled": True,
+                "path": "data/state",
+                "snapshot_interval": 300,
+                "alert_history": 200
+            },
+            "alert_store": {
+                "enabled": True,
+                "path": "data/alerts.db",
+                "retention_days": 180,
+                "history_limit": 1000
+            },
+            "remote_collection": {
+                "enabled": False,
+                "interval": None,
+                "timeout": 5,
+                "concurrency": 200,
+                "jitter": 0.1,
+                "max_idle_connections": 256,
+                "max_buffer": 100000,
+                "targets": []
+            },
+            "health_checks": {
+                "enabled": False,
+                "interval": 30,
+                "timeout": 3,
+                "concurrency": 50,
+                "failure_threshold": 2,
+                "services": []
+            },
+            "profiling": {
+                "enabled": False,
+                "interval": 0.01,
+                "output_path": "profile.folded"
+            },
+            "process_tracking": {
+                "enabled": True,
+                "top_n": 5,
+                "min_culprit_cpu_percent": 20,
+                "terminate_memory_culprit": False
+            },
+            "remediation": {
+                "max_concurrency": 2,
+                "max_pending": 50,
+                "action_timeout": 60,
+                "cpu_action": "renice",
+                "renice_value": 19,
+                "temp_max_age_hours": 24,
+                "min_interval_seconds": 300,
+                "max_per_hour": 6,
+                "failure_threshold": 3,
+                "breaker_reset_seconds": 1800
+            },
+            "pipeline": {
+                "detect": {"workers": 1, "queue_size": 10, "policy": "drop_oldest"},
+                "alert": {"workers": 2, "queue_size": 1000, "policy": "drop_oldest"},
+                "remediate": {"workers": 1, "queue_size": 100, "policy": "drop_newest"}
             }
         }
         
         if config_path:
-            try:
-                with open(config_path, 'r') as f:
-                    loaded_config = json.load(f)
-                    # 合并配置
-                    for key, value in loaded_config.items():
-                        if key in default_config and isinstance(value, dict):
-                            default_config[key].update(value)
-                        else:
-                            default_config[key] = value
-                    self.logger.info(f"Configuration loaded from {config_path}")
-            except Exception as e:
-                self.logger.error(f"Error loading configuration: {str(e)}")
+            with open(config_path, 'r') as f:
+                loaded_config = json.load(f)
+            # 合并配置
+            for key, value in loaded_config.items():
+                if key in default_config and isinstance(value, dict):
+                    default_config[key].update(value)
+                else:
+                    default_config[key] = value
         
         return default_config
     
+    @staticmethod
+    def _validate_config(config):
+        """校验可热更新的配置项，不合法时抛出ValueError"""
+        intervals = {
+            "collection_interval": config.get("collection_interval"),
+            "anomaly_detection_interval": config.get("anomaly_detection_interval"),
+            "prediction_interval": config.get("prediction_interval"),
+            "state.snapshot_interval": config.get("state", {}).get("snapshot_interval", 300),
+            "config_reload.interval": config.get("config_reload", {}).get("interval", 5),
+            "health_checks.interval": config.get("health_checks", {}).get("interval", 30)
+        }
+        for key, value in intervals.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+                raise ValueError(f"{key} must be a positive number, got {value!r}")
+        
+        thresholds = config.get("thresholds")
+        if not isinstance(thresholds, dict):
+            raise ValueError("thresholds must be an object")
+        for metric, value in thresholds.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f"thresholds.{metric} must be a number, got {value!r}")
+        
+        retention = config.get("data_retention_days")
+        if isinstance(retention, bool) or not isinstance(retention, (int, float)) or retention <= 0:
+            raise ValueError(f"data_retention_days must be a positive number, got {retention!r}")
+        
+        forecast_config = config.get("forecast", {})
+        known_backends = set(FORECAST_BACKENDS) | {"forest", "auto"}
+        for metric, name in forecast_config.get("backends", {}).items():
+            if name not in known_backends:
+                raise ValueError(f"forecast.backends.{metric} must be one of {sorted(known_backends)}, got {name!r}")
+        for name in forecast_config.get("candidates", []):
+            if name not in known_backends - {"auto"}:
+                raise ValueError(f"forecast.candidates contains unknown backend {name!r}")
+        
+        names = set()
+        for i, target in enumerate(config.get("remote_collection", {}).get("targets", [])):
+            if not isinstance(target, dict) or not target.get("name") or not target.get("url"):
+                raise ValueError(f"remote_collection.targets[{i}] must have a name and a url")
+            if target.get("format", "prometheus") not in ("prometheus", "json"):
+                raise ValueError(f"remote_collection.targets[{i}].format must be prometheus or json")
+            if target["name"] in names:
+                raise ValueError(f"remote_collection.targets[{i}] duplicates target name {target['name']!r}")
+            names.add(target["name"])
+        
+        names = set()
+        for i, service in enumerate(config.get("health_checks", {}).get("services", [])):
+            if not isinstance(service, dict) or not service.get("name"):
+                raise ValueError(f"health_checks.services[{i}] must have a name")
+            if not (service.get("unit") or service.get("tcp") or service.get("http")):
+                raise ValueError(f"health_checks.services[{i}] must have a unit, tcp or http check")
+            if service["name"] in names:
+                raise ValueError(f"health_checks.services[{i}] duplicates service name {service['name']!r}")
+            names.add(service["name"])
+    
+    def _raw_retention_seconds(self):
+        """原始数据的保留时长：启用降采样层级时只保留较短时间"""
+        retention = self.config.get("data_retention_days", 30) * 86400
+        rollup_config = self.config.get("rollup", {})
+        if rollup_config.get("enabled", True):
+            retention = min(retention, rollup_config.get("raw_retention_hours", 48) * 3600)
+        return retention
+    
+    def reload_config(self, path=None):
+        """重新读取并校验配置，原子地替换配置并应用阈值、任务间隔和保留条数
+        
+        阈值等在每次使用时读取self.config，替换引用后立即生效；
+        模型、存储、流水线等在构造时使用的配置需要重启后生效。
+        """
+        try:
+            new_config = self._read_config(self.config_path)
+            if self.shard_id is not None:
+                self._apply_shard_paths(new_config)
+            self._validate_config(new_config)
+        except Exception as e:
+            self.logger.error(f"Configuration reload from {self.config_path} rejected: {str(e)}")
+            return False
+        
+        old_config = self.config
+        self.config = new_config
+        
+        # 调整任务间隔（不重启调度线程）
+        collection_interval = new_config["collection_interval"]
+        intervals = {
+            "collect": collection_interval,
+            "detect": new_config["anomaly_detection_interval"],
+            "predict": new_config["prediction_interval"],
+            "snapshot": new_config.get("state", {}).get("snapshot_interval", 300),
+            "config_reload": new_config.get("config_reload", {}).get("interval", 5),
+            "health_check": new_config.get("health_checks", {}).get("interval", 30)
+        }
+        for name, interval in intervals.items():
+            job = self.scheduler.jobs.get(name)
+            if job is not None and job.interval != interval:
+                self.scheduler.reschedule(name, interval)
+                self.logger.info(f"Job {name} interval changed from {job.interval} to {interval}")
+        self.data_collector.collection_interval = collection_interval
+        self.metrics_store.max_records = int(self._raw_retention_seconds() / collection_interval)
+        
+        # 调度抖动在下一次安排运行时生效（配置重载任务本身不加抖动）
+        jitter = new_config.get("scheduler", {}).get("jitter", 0)
+        for name, job in self.scheduler.jobs.items():
+            if name != "config_reload":
+                job.jitter = jitter
+        
+        # 漂移检测和季节性基线的阈值类参数直接替换，已有的统计保留
+        drift_config = new_config.get("drift_detection", {})
+        for monitor in (self.anomaly_drift, self.prediction_drift):
+            monitor.decay = drift_config.get("decay", 0.995)
+            monitor.psi_threshold = drift_config.get("psi_threshold", 0.2)
+            monitor.residual_threshold = drift_config.get("residual_threshold", 2.0)
+            monitor.min_samples = drift_config.get("min_samples", 30)
+        if self.baseline is not None:
+            baseline_config = new_config.get("baseline", {})
+            self.baseline.alpha = baseline_config.get("alpha", 0.01)
+            self.baseline.z_threshold = baseline_config.get("z_threshold", 2.5)
+            self.baseline.min_samples = baseline_config.get("min_samples", 30)
+            self.baseline.min_std = baseline_config.get("min_std", 0.5)
+        
+        # 预测后端参数或选择配置变化后，下一次预测时重新选择
+        if old_config.get("forecast") != new_config.get("forecast"):
+            self.predictive_analytics.set_backend_params(new_config.get("forecast", {}).get("backend_params"))
+            self.forecast_backends = None
+        
+        restart_keys = [key for key in RESTART_CONFIG_KEYS if old_config.get(key) != new_config.get(key)]
+        for key, subkeys in RESTART_CONFIG_SUBKEYS.items():
+            restart_keys += [f"{key}.{subkey}" for subkey in subkeys
+                             if old_config.get(key, {}).get(subkey) != new_config.get(key, {}).get(subkey)]
+        if restart_keys:
+            self.logger.warning(f"Changes to {', '.join(restart_keys)} take effect after restart")
+        self.logger.info(f"Configuration reloaded from {self.config_path}")
+        return True
+    
+    def _shard_path(self, path):
+        """在路径的目录下插入分片目录，如 models/anomaly_model.pkl -> models/shard-1/anomaly_model.pkl"""
+        return os.path.join(os.path.dirname(path), f"shard-{self.shard_id}", os.path.basename(path))
+    
+    def _apply_shard_paths(self, config=None):
+        config = self.config if config is None else config
+        for key, default in [("anomaly_model_path", "models/anomaly_model.pkl"),
+                             ("prediction_model_path", "models/prediction_model.h5"),
+                             ("data_path", "data/metrics.csv")]:
+            path = self._shard_path(config.get(key, default))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            config[key] = path
+        storage_config = config.setdefault("storage", {})
+        storage_config["segment_dir"] = os.path.join(storage_config.get("segment_dir", "data/segments"),
+                                                     f"shard-{self.shard_id}")
+        state_config = config.setdefault("state", {})
+        state_config["path"] = os.path.join(state_config.get("path", "data/state"), f"shard-{self.shard_id}")
+        alert_store_config = config.setdefault("alert_store", {})
+        alert_store_config["path"] = self._shard_path(alert_store_config.get("path", "data/alerts.db"))
+    
+    def _create_drift_monitor(self, drift_config, name):
+        """创建漂移监控器"""
+        return DriftMonitor(
+            bins=drift_config.get("bins", 10),
+            decay=drift_config.get("decay", 0.995),
+            psi_threshold=drift_config.get("psi_threshold", 0.2),
+            residual_threshold=drift_config.get("residual_threshold", 2.0),
+            min_samples=drift_config.get("min_samples", 30),
+            name=name
+        )
+    
+    def _needs_training(self, model_owner, drift_monitor):
+        """判断模型是否需要（重新）训练"""
+        # 仅在内存中没有模型时才从磁盘加载
+        if model_owner.model is None and not model_owner.load_model():
+            return True
+        
+        if not self.config.get("drift_detection", {}).get("enabled", True):
+            return False
+        
+        # 从磁盘加载的模型没有参考分布，以当前数据建立参考
+        snapshot = self.metrics_store.snapshot()
+        if not drift_monitor.has_reference() and len(snapshot) > 60:
+            features = ['cpu_percent', 'memory_percent', 'disk_usage']
+            drift_monitor.set_reference(snapshot.feature_array(features))
+        
+        return drift_monitor.should_retrain()
+    
+    def _training_data(self, snapshot):
+        """获取训练数据（漂移后只使用最近窗口，以适应新分布）"""
+        window = self.config.get("drift_detection", {}).get("training_window")
+        if window and window < len(snapshot):
+            return pd.DataFrame(snapshot.records(window))
+        return snapshot.to_frame()
+    
+    def get_drift_scores(self):
+        """获取各模型的漂移分数"""
+        return {
+            "anomaly": self.anomaly_drift.drift_scores(),
+            "prediction": self.prediction_drift.drift_scores()
+        }
+    
     def _save_metrics_to_csv(self):
-        """保存指标数据到CSV文件"""
-        if not self.metrics_data:
-            return
+        """将上次保存之后的新指标追加到CSV文件"""
+        with self.save_lock:
+            snapshot = self.metrics_store.snapshot()
+            new_records = snapshot.records_since(self.saved_version)
+            if not new_records:
+                return
+            
+            data_path = self.config.get("data_path", "data/metrics.csv")
+            
+            # 确保目录存在
+            os.makedirs(os.path.dirname(data_path), exist_ok=True)
+            
+            with self.instrumentation.timer(STAGE_METRIC, stage="save"):
+                df = pd.DataFrame(new_records)
+                df.to_csv(data_path, mode='a', index=False, header=not os.path.exists(data_path))
+            self.saved_version = snapshot.version
+            self.logger.info(f"{len(new_records)} metrics records appended to {data_path}")
+    
+    def _persist_segment(self, block):
+        """把压缩的数据块写入段文件（文件名为首条记录的微秒时间戳和记录数），并删除过期的段文件"""
+        segment_dir = self.config.get("storage", {}).get("segment_dir", "data/segments")
+        try:
+            os.makedirs(segment_dir, exist_ok=True)
+            first = block.times()[0]
+            path = os.path.join(segment_dir, f"{int(first * 1e6)}-{len(block)}.seg")
+            with open(path, 'wb') as f:
+                f.write(block.to_bytes())
+            self.logger.info(f"Segment of {len(block)} records ({block.nbytes} bytes) written to {path}")
+            
+            cutoff = time.time() - self.config.get("data_retention_days", 30) * 86400
+            for name in os.listdir(segment_dir):
+                if name.endswith(".seg") and int(name.split("-")[0]) / 1e6 < cutoff:
+                    os.remove(os.path.join(segment_dir, name))
+        except Exception as e:
+            self.logger.error(f"Error persisting segment: {str(e)}")
+    
+    def _model_version(self, model_owner):
+        """模型版本：模型文件的修改时间"""
+        path = model_owner.model_path
+        return {
+            "path": path,
+            "mtime": os.path.getmtime(path) if path and os.path.exists(path) else None
+        }
+    
+    def save_state(self):
+        """保存状态快照：内存中的指标窗口、降采样层级、模型版本、最近告警（冷却状态）和调度进度"""
+        if self.state_snapshot is None:
+            return False
+        try:
+            with self.instrumentation.timer(STAGE_METRIC, stage="snapshot"):
+                snapshot = self.metrics_store.snapshot()
+                state = {
+                    "version": snapshot.version,
+                    "models": {
+                        "anomaly": self._model_version(self.anomaly_detector),
+                        "prediction": self._model_version(self.predictive_analytics)
+                    },
+                    "alerts": self.recent_alerts(self.config.get("state", {}).get("alert_history", 200)),
+                    "scheduler": self.scheduler.due_times()
+                }
+                rollups = self.rollups.export() if self.rollups is not None else None
+                size = self.state_snapshot.save(snapshot.records(), snapshot.times(), state, rollups)
+            self.logger.info(f"State snapshot of {len(snapshot)} records ({size} bytes) "
+                             f"written to {self.state_snapshot.directory}")
+            return True
+        except Exception as e:
+            self.logger.error(f"Error saving state snapshot: {str(e)}")
+            return False
+    
+    def restore_state(self):
+        """启动时从快照恢复，使检测在启动后立即可用，不必等待重新采集和训练"""
+        if self.state_snapshot is None or len(self.metrics_store) > 0:
+            return False
+        try:
+            started = time.monotonic()
+            records, state = self.state_snapshot.load()
+            if state is None:
+                return False
+            
+            # 恢复的数据已经写过段文件和CSV，追加时不再回调
+            on_compress = self.metrics_store.on_compress
+            self.metrics_store.on_compress = None
+            try:
+                snapshot = self.metrics_store.extend(records)
+            finally:
+                self.metrics_store.on_compress = on_compress
+            first_version = snapshot.version - len(records)
+            
+            # 先恢复降采样层级封存的桶，重放原始窗口时只重建之后的桶
+            restored_buckets = 0
+            if self.rollups is not None:
+                restored_buckets = self.rollups.restore(self.state_snapshot.load_rollups() or {})
+            for i, record in enumerate(records):
+                self.feature_store.update(record, first_version + i + 1)
+                if self.rollups is not None:
+                    self.rollups.add(record)
+                if self.baseline is not None:
+                    self.baseline.update(record)
+            self.saved_version = snapshot.version
+            self.detected_version = snapshot.version
+            
+            # 提前加载模型，文件在快照之后被替换时记录日志
+            for name, model_owner in (("anomaly", self.anomaly_detector), ("prediction", self.predictive_analytics)):
+                saved = state.get("models", {}).get(name, {})
+                current = self._model_version(model_owner)
+                if saved.get("mtime") is not None and saved.get("mtime") != current["mtime"]:
+                    self.logger.info(f"{name} model at {current['path']} changed since the snapshot")
+                if model_owner.model is None:
+                    model_owner.load_model()
+            
+            # 没有告警存储时从快照恢复最近告警，冷却期内的告警不会在重启后重复发送
+            alerts = []
+            if self.alert_manager.store is None:
+                for alert in state.get("alerts", []):
+                    alert = dict(alert)
+                    alert["timestamp"] = datetime.fromisoformat(alert["timestamp"])
+                    alerts.append(alert)
+                self.alert_manager.restore_history(alerts)
+            
+            # 按快照中的进度继续调度，已有足够数据时检测无需等待预热
+            self.scheduler.resume(state.get("scheduler", {}))
+            if len(snapshot) > 10 and "detect" in self.scheduler.jobs:
+                self.scheduler.jobs["detect"].initial_delay = 0
+            
+            self.logger.info(f"State restored from {self.state_snapshot.directory}: {len(records)} records, "
+                             f"{len(alerts)} alerts, {restored_buckets} rollup buckets in {time.monotonic() - started:.3f}s "
+                             f"(snapshot age {time.time() - state.get('saved_at', time.time()):.0f}s)")
+            return True
+        except Exception as e:
+            self.logger.error(f"Error restoring state snapshot: {str(e)}")
+            return False
+    
+    def query_metrics(self, start=None, end=None, resolution=None, max_points=None):
+        """按时间范围查询指标，自动选择满足分辨率要求的聚合层级
         
-        data_path = self.config.get("data_path", "data/metrics.csv")
+        start/end为epoch秒，resolution为所需的最大点间隔（秒），
+        max_points限制返回的点数（最粗的层级仍超过时合并相邻的点）；都不指定时返回原始数据。
+        """
+        tier = None
+        if self.rollups is not None:
+            tier = self.rollups.choose_tier(start, end, resolution, max_points)
         
-        # 确保目录存在
-        os.makedirs(os.path.dirname(data_path), exist_ok=True)
+        if tier is not None:
+            return {
+                "tier": tier.name,
+                "resolution": tier.resolution,
+                "points": merge_points(self.rollups.query(tier, start, end), max_points)
+            }
         
-        with self.data_lock:
-            df = pd.DataFrame(self.metrics_data)
-            df.to_csv(data_path, index=False)
-            self.logger.info(f"Metrics data saved to {data_path}")
+        _, points = self.metrics_store.snapshot().range(start, end)
+        return {
+            "tier": "raw",
+            "resolution": self.config.get("collection_interval", 60),
+            "points": points
+        }
     
-    def _clean_old_data(self):
-        """清理旧数据"""
-        retention_days = self.config.get("data_retention_days", 30)
-        cutoff_date = datetime.now() - timedelta(days=retention_days)
+    def range_query(self, start=None, end=None, host=None, features=None, step=None, agg="mean"):
+        """按主机、指标和时间范围查询，step指定时按step秒分桶聚合
+        
+        原始数据通过时间索引查询；需要聚合且降采样层级能满足step时
+        （p95仅在原始数据不覆盖start时）改用层级数据合并，读取的点更少。
+        """
+        features = features or ['cpu_percent', 'memory_percent', 'disk_usage']
+        snapshot = self.metrics_store.snapshot()
         
-        with self.data_lock:
-            if self.metrics_df is not None and 'timestamp' in self.metrics_df.columns:
-                self.metrics_df['timestamp'] = pd.to_datetime(self.metrics_df['timestamp'])
-                self.metrics_df = self.metrics_df[self.metrics_df['timestamp'] >= cutoff_date]
-                self.logger.info(f"Cleaned data older than {cutoff_date}")
+        # 降采样层级不区分主机，只用于全部主机的聚合查询
+        if step and self.rollups is not None and host is None and agg in ROLLUP_AGGREGATIONS:
+            oldest = snapshot.oldest_time()
+            raw_covers = oldest is not None and start is not None and oldest <= start
+            tier = self.rollups.choose_tier(start, end, resolution=step)
+            if tier is not None and (agg != "p95" or not raw_covers):
+                points = self.rollups.query(tier, start, end)
+                return {
+                    "source": tier.name,
+                    "step": step,
+                    "points": rebucket_rollup(points, features, start, step, agg)
+                }
+        
+        times, records = snapshot.range(start, end, host)
+        if step:
+            points = aggregate_records(times, records, features, start, step, agg)
+        else:
+            points = [{"timestamp": r.get("timestamp"), **{f: r.get(f) for f in features}} for r in records]
+        return {
+            "source": "raw",
+            "step": step,
+            "points": points
+        }
     
     def _check_thresholds(self, metrics):
-        """检查指标是否超过阈值"""
+        """检查指标是否超过阈值
+        
+        基线建立后使用所在时间槽的动态阈值（均值 + threshold_sigma倍标准差），
+        但不低于静态阈值的threshold_floor_ratio倍，避免平时负载很低的主机频繁告警。
+        """
         thresholds = self.config.get("thresholds", {})
+        baseline_config = self.config.get("baseline", {})
+        dynamic = self.baseline is not None and baseline_config.get("dynamic_thresholds", True)
         alerts = []
         
         for metric, value in metrics.items():
             if metric in thresholds and isinstance(value, (int, float)):
                 threshold = thresholds[metric]
+                upper = None
+                if dynamic and metric in self.baseline.features:
+                    upper = self.baseline.threshold(metric, metrics, baseline_config.get("threshold_sigma", 4.0))
+                if upper is not None:
+                    threshold = round(max(upper, threshold * baseline_config.get("threshold_floor_ratio", 0.6)), 2)
                 if value >= threshold:
                     alerts.append({
                         "metric": metric,
                         "value": value,
-                        "threshold": threshold
+                        "threshold": threshold,
+                        "dynamic": upper is not None
                     })
         
         return alerts
     
-    def data_collection_thread(self):
-        """数据收集线程"""
-        self.logger.info("Starting data collection thread")
-        
-        while self.running:
-            try:
-                # 收集系统指标
+    def collect_metrics(self):
+        """数据收集任务"""
+        try:
+            # 收集系统指标
+            with self.instrumentation.timer(STAGE_METRIC, stage="collect"):
                 metrics = self.data_collector.collect_system_metrics()
+            
+            # 与远程采集器在上一个周期内抓取到的记录一起写入
+            records = [metrics]
+            if self.remote_collector is not None:
+                records += self.remote_collector.drain()
+            self.ingest(records)
+        except Exception as e:
+            self.logger.error(f"Error in data collection job: {str(e)}")
+    
+    def ingest(self, records):
+        """写入一批指标记录（本地采集或分片协调器推送）：检查阈值、存储并更新漂移统计"""
+        for metrics in records:
+            # 检查阈值（多主机数据的资源ID带上主机名）
+            threshold_alerts = self._check_thresholds(metrics)
+            for alert in threshold_alerts:
+                resource_id = f"{metrics['host']}:{alert['metric']}" if "host" in metrics else alert["metric"]
+                self.pipeline.submit("alert", {
+                    "alert_type": "threshold_exceeded",
+                    "resource_id": resource_id,
+                    "severity": "warning",
+                    "message": f"{resource_id} 超过阈值: {alert['value']} >= {alert['threshold']}",
+                    "details": alert
+                })
+            
+            # 存储指标（发布新快照）
+            snapshot = self.metrics_store.append(metrics)
+            self.feature_store.update(metrics, snapshot.version)
+            if self.rollups is not None:
+                self.rollups.add(metrics)
+            if self.baseline is not None:
+                self.baseline.update(metrics)
+            self.anomaly_drift.update(metrics)
+            self.prediction_drift.update(metrics)
+            
+            # 每100条数据保存一次
+            if snapshot.version % 100 == 0:
+                self._save_metrics_to_csv()
+        return len(records)
+    
+    def recent_metrics(self, limit=100):
+        """最近的limit条指标记录"""
+        return self.metrics_store.snapshot().records(limit)
+    
+    def recent_alerts(self, limit=50):
+        """最近的告警（副本，时间转换为ISO字符串，不修改告警历史）"""
+        return self.alert_manager.recent_alerts(limit)
+    
+    def query_alerts(self, start=None, end=None, alert_type=None, resource_id=None, severity=None,
+                     limit=50, offset=0):
+        """分页查询告警历史，返回 {"alerts": 本页告警（从旧到新）, "total": 符合条件的总数}"""
+        alerts, total = self.alert_manager.query_alerts(
+            start=start, end=end, alert_type=alert_type, resource_id=resource_id, severity=severity,
+            limit=limit, offset=offset
+        )
+        return {"alerts": alerts, "total": total}
+    
+    def get_status(self):
+        """系统状态汇总"""
+        return {
+            "status": "running" if self.running else "stopped",
+            "shard": self.shard_id,
+            "jobs": self.scheduler.stats(),
+            "pipeline": self.pipeline.stats(),
+            "remediation": self.remediation_engine.get_stats(),
+            "data_points": len(self.metrics_store),
+            "drift": self.get_drift_scores(),
+            "rollup": self.rollups.stats() if self.rollups is not None else None,
+            "baseline": self.baseline.stats() if self.baseline is not None else None,
+            "features": self.feature_store.stats(),
+            "remote_collection": self.remote_collector.stats() if self.remote_collector is not None else None,
+            "services": self.health_checker.stats() if self.health_checker is not None else None,
+            "logging": logging_stats(),
+            "forecast": self.forecast_summary,
+            "forecast_backends": {"selected": self.forecast_backends, "evaluation": self.forecast_backend_report},
+            "last_update": datetime.now().isoformat()
+        }
+    
+    def detect_anomalies(self):
+        """异常检测任务"""
+        try:
+            snapshot = self.metrics_store.snapshot()
+            features = ['cpu_percent', 'memory_percent', 'disk_usage']
+            
+            # 加载模型，仅在模型缺失或发生漂移时训练
+            if self._needs_training(self.anomaly_detector, self.anomaly_drift):
+                if len(snapshot) > 60:  # 确保有至少1小时的数据（假设每分钟采集一次）
+                    training_df = self._training_data(snapshot)
+                    
+                    # 训练数据的特征取自特征存储（与检测时使用的特征列一致）
+                    feature_df = self.feature_store.frame(snapshot.version - len(training_df), snapshot.version,
+                                                          self.anomaly_detector.features)
+                    
+                    # 特征存储中已没有这段数据时跳过训练：只用原始列训练的模型与检测时的特征列不一致
+                    if feature_df is None:
+                        self.logger.warning("Training window is no longer in the feature store, skipping anomaly training")
+                        trained = False
+                    else:
+                        # 训练模型（训练完成后才替换模型，检测不受影响）
+                        with self.instrumentation.timer(STAGE_METRIC, stage="train", model="anomaly"):
+                            trained = self.anomaly_detector.train(feature_df, save_model=True)
+                    if trained:
+                        self.anomaly_drift.set_reference(training_df[features].values)
+            
+            # 把上次检测之后的新数据交给检测阶段，每条数据只检测一次
+            if len(snapshot) > 10:  # 确保有足够的最近数据
+                if self.detected_version == 0:
+                    new_records = snapshot.records(10)
+                else:
+                    new_records = snapshot.records_since(self.detected_version)
                 
-                # 检查阈值
-                threshold_alerts = self._check_thresholds(metrics)
-                for alert in threshold_alerts:
-                    self.alert_manager.trigger_alert(
-                        alert_type="threshold_exceeded",
-                        resource_id=alert["metric"],
-                        severity="warning",
-                        message=f"{alert['metric']} 超过阈值: {alert['value']} >= {alert['threshold']}",
-                        details=alert
+                if new_records:
+                    self.pipeline.submit("detect", {"records": new_records, "version": snapshot.version})
+                    self.detected_version = snapshot.version
+        except Exception as e:
+            self.logger.error(f"Error in anomaly detection job: {str(e)}")
+    
+    def _detect_stage(self, batch):
+        """检测阶段：对一批数据（记录及最后一条的版本号）执行异常检测，输出告警事件"""
+        records = batch["records"]
+        features = self.anomaly_detector.features
+        
+        # 特征行在写入时已计算好；积压过久被覆盖时从记录中取原始特征
+        X = self.feature_store.rows(batch["version"] - len(records), batch["version"], features)
+        if X is None:
+            recent_data = pd.DataFrame(records)
+            if not all(f in recent_data.columns for f in features):
+                return None
+            X = recent_data[features].values
+        
+        # 第一阶段：只把偏离季节性基线的样本交给模型，正常数据不调用IsolationForest
+        candidates = list(range(len(records)))
+        if self.baseline is not None:
+            candidates = [i for i, record in enumerate(records) if self.baseline.is_suspicious(record)]
+            if not candidates:
+                return None
+        
+        with self.instrumentation.timer(STAGE_METRIC, stage="detect"):
+            anomalies = self.anomaly_detector.detect_anomalies(X[candidates])
+        if anomalies is None or len(anomalies) == 0:
+            return None
+        
+        events = []
+        for idx in anomalies:
+            anomaly_data = records[candidates[idx]]
+            host = anomaly_data.get("host", DEFAULT_HOST)
+            self.logger.warning(f"Anomaly detected: {anomaly_data}")
+            
+            # 根据异常类型确定修复操作，有采样时记录的嫌疑进程则直接作为目标；
+            # 修复操作在本机执行，远程主机的异常只告警
+            remediations = []
+            if self._is_local_host(host):
+                culprits = anomaly_data.get('top_process') or {}
+                if anomaly_data.get('cpu_percent', 0) > 90:
+                    remediations.append(("high_cpu", self._culprit_kwargs(culprits.get("cpu"), "cpu")))
+                if anomaly_data.get('memory_percent', 0) > 90:
+                    remediations.append(("memory_leak", self._culprit_kwargs(culprits.get("memory"), "memory")))
+                if anomaly_data.get('disk_usage', 0) > 90:
+                    remediations.append(("disk_full", {}))
+            
+            # 资源ID带上主机名（与阈值告警一致），不同主机的告警冷却和修复去重互不影响
+            events.append({
+                "alert_type": "anomaly_detected",
+                "resource_id": f"{anomaly_data['host']}:system" if "host" in anomaly_data else "system",
+                "severity": "critical",
+                "message": "系统异常行为检测",
+                "details": anomaly_data,
+                "remediations": remediations
+            })
+        return events
+    
+    def check_services(self):
+        """服务健康检查任务：宕机的服务发送告警并触发service_down修复，恢复时发送恢复通知"""
+        try:
+            with self.instrumentation.timer(STAGE_METRIC, stage="health_check"):
+                down, recovered = self.health_checker.check()
+            self.submit_events(service_events(down, recovered))
+        except Exception as e:
+            self.logger.error(f"Error in service health check job: {str(e)}")
+    
+    def submit_events(self, events):
+        """把告警事件提交到告警流水线（分片模式下协调器通过它转发服务健康检查的结果）"""
+        for event in events:
+            self.pipeline.submit("alert", event)
+        return len(events)
+    
+    def _is_local_host(self, host):
+        """记录是否来自本机（本地采集的记录没有host或为协调器设置的本机主机名）"""
+        return host in (DEFAULT_HOST, self.hostname)
+    
+    def _culprit_kwargs(self, culprit, kind):
+        """把嫌疑进程转换为修复参数，不满足条件时返回空参数（只记录Top进程）"""
+        process_config = self.config.get("process_tracking", {})
+        if not culprit or culprit.get("pid") == os.getpid():
+            return {}
+        if kind == "cpu" and culprit.get("cpu_percent", 0) < process_config.get("min_culprit_cpu_percent", 20):
+            return {}
+        if kind == "memory" and not process_config.get("terminate_memory_culprit", False):
+            return {}
+        return {"pid": culprit["pid"], "process_name": culprit.get("name")}
+    
+    def _alert_stage(self, event):
+        """告警阶段：发送告警，输出修复操作"""
+        with self.instrumentation.timer(STAGE_METRIC, stage="dispatch"):
+            self.alert_manager.trigger_alert(
+                alert_type=event["alert_type"],
+                resource_id=event["resource_id"],
+                severity=event["severity"],
+                message=event["message"],
+                details=event.get("details")
+            )
+        
+        if not self.config.get("auto_remediation", True):
+            return None
+        return [{"issue_type": issue_type, "kwargs": kwargs} for issue_type, kwargs in event.get("remediations", [])]
+    
+    def _remediate_stage(self, action):
+        """修复阶段：提交到修复执行器，不等待修复完成"""
+        self.remediation_engine.remediate_async(action["issue_type"], **action.get("kwargs", {}))
+        return None
+    
+    def _build_pipeline(self):
+        """构建 检测 -> 告警 -> 修复 流水线"""
+        pipeline_config = self.config.get("pipeline", {})
+        handlers = [
+            ("detect", self._detect_stage),
+            ("alert", self._alert_stage),
+            ("remediate", self._remediate_stage)
+        ]
+        for name, handler in handlers:
+            stage_config = pipeline_config.get(name, {})
+            self.pipeline.add_stage(
+                name, handler,
+                workers=stage_config.get("workers", 1),
+                queue_size=stage_config.get("queue_size", 100),
+                policy=stage_config.get("policy", "drop_oldest"),
+                block_timeout=stage_config.get("block_timeout", 1.0)
+            )
+    
+    def run_prediction(self):
+        """预测分析任务"""
+        try:
+            snapshot = self.metrics_store.snapshot()
+            features = ['cpu_percent', 'memory_percent', 'disk_usage']
+            forecast_config = self.config.get("forecast", {})
+            
+            # 加载模型，仅在有指标可能使用随机森林、且模型缺失或发生漂移时训练
+            if self._forest_required(features) and \
+                    self._needs_training(self.predictive_analytics, self.prediction_drift):
+                if len(snapshot) > 60:  # 确保有至少1小时的数据（假设每分钟采集一次）
+                    training_df = self._training_data(snapshot)
+                    
+                    # 训练模型（训练完成后才替换模型，预测不受影响）
+                    with self.instrumentation.timer(STAGE_METRIC, stage="train", model="prediction"):
+                        trained = self.predictive_analytics.train(
+                            training_df,
+                            feature_columns=features,
+                            look_back=self.look_back
+                        )
+                    if trained:
+                        self.prediction_drift.set_reference(training_df[features].values)
+                        self.last_forecast = None
+                        self.forecast_backends = None
+            
+            # 进行预测
+            if len(snapshot) > 30:  # 确保有足够的历史数据（至少30个采样点）
+                # 用上一次预测与实际值的差记录残差（预测的是版本号之后的下一条记录）
+                if self.last_forecast is not None:
+                    version, predicted = self.last_forecast
+                    actual = self.feature_store.rows(version, version + 1, features) \
+                        if version < snapshot.version else None
+                    if actual is not None:
+                        self.prediction_drift.update_residual(actual[0], predicted)
+                
+                # 从特征存储取各主机等长的最近历史，一次得到所有主机、所有指标的概率预测；
+                # 轻量后端使用较长的历史，随机森林只使用最后look_back个样本
+                history_steps = max(self.look_back, forecast_config.get("history_steps", 360))
+                hosts, batch = self.feature_store.window(history_steps, min_count=self.look_back)
+                if not hosts:
+                    return
+                
+                horizon = forecast_config.get("horizon_steps", 180)
+                backends = self._select_forecast_backends(batch, features, horizon)
+                with self.instrumentation.timer(STAGE_METRIC, stage="predict"):
+                    # 随机森林的输入直接取特征存储中已缩放的回看窗口
+                    scaled = None
+                    if "forest" in backends.values() and self.predictive_analytics.model is not None:
+                        scaled = self.feature_store.lag_matrix(hosts, self.look_back,
+                                                               self.predictive_analytics.scaler)
+                    paths = self.predictive_analytics.forecast_by_metric(
+                        batch, steps=horizon, look_back=self.look_back,  # 与训练使用相同的回看窗口
+                        backends=[backends[f] for f in features],
+                        scaled=scaled
                     )
                 
-                # 存储指标
-                with self.data_lock:
-                    self.metrics_data.append(metrics)
+                if paths is not None:
+                    levels = forecast_config.get("quantiles", [0.1, 0.5, 0.9])
+                    bands = self.predictive_analytics.quantiles(paths, levels)
+                    median = np.median(paths, axis=0)
+                    thresholds = [self.config.get("thresholds", {}).get(f, 90) for f in features]
+                    breach = self.predictive_analytics.time_to_threshold(paths, thresholds)
                     
-                    # 每100条数据保存一次
-                    if len(self.metrics_data) % 100 == 0:
-                        self._save_metrics_to_csv()
+                    # 单主机时记录下一个样本的预测中位数，供下次计算残差
+                    if len(hosts) == 1:
+                        self.last_forecast = (snapshot.version, median[0, 0])
+                    
+                    self.forecast_summary = self._summarize_forecast(hosts, features, batch, bands, levels,
+                                                                     breach, thresholds, backends)
+                    self._submit_breach_alerts(self.forecast_summary)
+                    
+                    # 绘制第一台主机的预测中位数和预测区间
+                    self.predictive_analytics.plot_forecast(
+                        batch[0],
+                        median[0],
+                        feature_index=0,  # CPU使用率
+                        feature_name="CPU Usage (%)",
+                        lower=bands[0][0],
+                        upper=bands[-1][0]
+                    )
+        except Exception as e:
+            self.logger.error(f"Error in prediction job: {str(e)}")
+    
+    def _forest_required(self, features):
+        """是否有指标指定使用随机森林，或自动选择的候选中包含随机森林"""
+        forecast_config = self.config.get("forecast", {})
+        configured = forecast_config.get("backends", {})
+        candidates = forecast_config.get("candidates", ["linear", "holt_winters", "ridge", "forest"])
+        return any(configured.get(f, "auto") == "forest" or
+                   (configured.get(f, "auto") == "auto" and "forest" in candidates) for f in features)
+    
+    def _select_forecast_backends(self, batch, features, horizon):
+        """返回 {指标: 后端名}；尚未选择、模型重新训练或超过selection_interval时重新交叉验证"""
+        forecast_config = self.config.get("forecast", {})
+        if self.forecast_backends is not None and \
+                time.time() - self.forecast_backends_at < forecast_config.get("selection_interval", 3600):
+            return self.forecast_backends
+        
+        selection, report = self.predictive_analytics.select_backends(
+            batch, features,
+            steps=horizon,
+            look_back=self.look_back,
+            candidates=forecast_config.get("candidates"),
+            configured=forecast_config.get("backends", {}),
+            folds=forecast_config.get("selection_folds", 3),
+            tolerance=forecast_config.get("selection_tolerance", 0.1)
+        )
+        if selection != self.forecast_backends:
+            self.logger.info(f"Forecast backends selected: {selection}")
+        self.forecast_backends = selection
+        self.forecast_backend_report = report
+        self.forecast_backends_at = time.time()
+        return selection
+    
+    def _summarize_forecast(self, hosts, features, batch, bands, levels, breach, thresholds, backends):
+        """整理每台主机、每个指标的预测：预测范围末尾的分位数和达到阈值的时间估计"""
+        interval = self.config.get("collection_interval", 60)
+        horizon = bands.shape[2]
+        summary = {}
+        for h, host in enumerate(hosts):
+            summary[host] = {}
+            for i, feature in enumerate(features):
+                steps_p50 = breach["steps_p50"][h, i]
+                steps_p10 = breach["steps_p10"][h, i]
+                summary[host][feature] = {
+                    "backend": backends[feature],
+                    "current": float(batch[h, -1, i]),
+                    "threshold": thresholds[i],
+                    "horizon_seconds": horizon * interval,
+                    "quantiles": {str(level): float(bands[q, h, -1, i]) for q, level in enumerate(levels)},
+                    "breach_probability": float(breach["probability"][h, i]),
+                    "breach_eta_seconds": None if np.isnan(steps_p50) else float(steps_p50 * interval),
+                    "breach_earliest_seconds": None if np.isnan(steps_p10) else float(steps_p10 * interval)
+                }
+        return summary
+    
+    def _submit_breach_alerts(self, summary):
+        """预测范围内达到阈值的概率不低于alert_probability时发送预测告警"""
+        min_probability = self.config.get("forecast", {}).get("alert_probability", 0.5)
+        for host, host_summary in summary.items():
+            for feature, item in host_summary.items():
+                if item["breach_probability"] < min_probability:
+                    continue
+                resource_id = feature if host == DEFAULT_HOST else f"{host}:{feature}"
+                probability = item["breach_probability"]
+                if item["breach_eta_seconds"] is not None:
+                    message = (f"预计约 {_format_duration(item['breach_eta_seconds'])} 后 {resource_id} "
+                               f"达到阈值 {item['threshold']}（概率 {probability:.0%}）")
+                    eta = f"~{item['breach_eta_seconds']:.0f}s"
+                else:
+                    message = (f"{resource_id} 可能在 {_format_duration(item['horizon_seconds'])} 内"
+                               f"达到阈值 {item['threshold']}（概率 {probability:.0%}）")
+                    eta = f"<{item['horizon_seconds']}s"
+                self.logger.warning(f"Prediction warning: {resource_id} may reach {item['threshold']} in {eta} "
+                                    f"(probability {probability:.0%})")
                 
-                # 休眠
-                time.sleep(self.config.get("collection_interval", 60))
-            except Exception as e:
-                self.logger.error(f"Error in data collection thread: {str(e)}")
-                time.sleep(10)  # 出错后短暂休眠
+                # 触发预测告警
+                self.pipeline.submit("alert", {
+                    "alert_type": "prediction_warning",
+                    "resource_id": resource_id,
+                    "severity": "warning",
+                    "message": message,
+                    "details": {"host": host, "feature": feature, **item}
+                })
     
-    def anomaly_detection_thread(self):
-        """异常检测线程"""
-        self.logger.info("Starting anomaly detection thread")
+    def _register_instrumentation(self):
+        """注册自身指标：阶段耗时、队列深度、任务统计和内存占用"""
+        inst = self.instrumentation
+        for stage in ("collect", "save", "predict", "detect", "dispatch", "snapshot"):
+            inst.histogram(STAGE_METRIC, "Duration of each processing stage", stage=stage)
         
-        # 等待收集足够的数据
-        time.sleep(self.config.get("collection_interval", 60) * 5)
+        def pipeline_stat(field):
+            return lambda: [((("stage", name),), stats[field]) for name, stats in self.pipeline.stats().items()]
         
-        while self.running:
-            try:
-                # 加载或训练模型
-                if not self.anomaly_detector.load_model():
-                    with self.data_lock:
-                        if len(self.metrics_data) > 60:  # 确保有至少1小时的数据（假设每分钟采集一次）
-                            # 创建临时CSV用于训练
-                            temp_df = pd.DataFrame(self.metrics_data)
-                            temp_path = "temp_training_data.csv"
-                            temp_df.to_csv(temp_path, index=False)
-                            
-                            # 训练模型
-                            self.anomaly_detector.train(temp_path, save_model=True)
-                            
-                            # 清理临时文件
-                            os.remove(temp_path)
-                
-                # 检测异常
-                with self.data_lock:
-                    if len(self.metrics_data) > 10:  # 确保有足够的最近数据
-                        recent_data = pd.DataFrame(self.metrics_data[-10:])
-                        features = ['cpu_percent', 'memory_percent', 'disk_usage']
-                        
-                        if all(f in recent_data.columns for f in features):
-                            X = recent_data[features].values
-                            anomalies = self.anomaly_detector.detect_anomalies(X)
-                            
-                            if anomalies is not None and len(anomalies) > 0:
-                                for idx in anomalies:
-                                    anomaly_data = recent_data.iloc[idx].to_dict()
-                                    self.logger.warning(f"Anomaly detected: {anomaly_data}")
-                                    
-                                    # 触发告警
-                                    self.alert_manager.trigger_alert(
-                                        alert_type="anomaly_detected",
-                                        resource_id="system",
-                                        severity="critical",
-                                        message="系统异常行为检测",
-                                        details=anomaly_data
-                                    )
-                                    
-                                    # 自动修复
-                                    if self.config.get("auto_remediation", True):
-                                        # 根据异常类型执行不同的修复操作
-                                        if anomaly_data.get('cpu_percent', 0) > 90:
-                                            self.remediation_engine.remediate("high_cpu")
-                                        
-                                        if anomaly_data.get('memory_percent', 0) > 90:
-                                            self.remediation_engine.remediate("memory_leak")
-                                        
-                                        if anomaly_data.get('disk_usage', 0) > 90:
-                                            self.remediation_engine.remediate("disk_full")
-                
-                # 休眠
-                time.sleep(self.config.get("anomaly_detection_interval", 300))
-            except Exception as e:
-                self.logger.error(f"Error in anomaly detection thread: {str(e)}")
-                time.sleep(30)  # 出错后短暂休眠
+        def job_stat(field):
+            return lambda: [((("job", name),), stats[field]) for name, stats in self.scheduler.stats().items()]
+        
+        inst.register_callback("aiops_pipeline_queue_depth", "gauge", "Items waiting in each pipeline stage queue",
+                               pipeline_stat("queue_depth"))
+        inst.register_callback("aiops_pipeline_processed_total", "counter", "Items processed by each pipeline stage",
+                               pipeline_stat("processed"))
+        inst.register_callback("aiops_pipeline_dropped_total", "counter", "Items dropped by each pipeline stage",
+                               pipeline_stat("dropped"))
+        inst.register_callback("aiops_job_runs_total", "counter", "Runs of each scheduled job",
+                               job_stat("runs"))
+        inst.register_callback("aiops_job_overruns_total", "counter", "Ticks skipped because the job was still running",
+                               job_stat("overruns"))
+        inst.register_callback("aiops_job_last_latency_seconds", "gauge", "Delay between scheduled and actual start",
+                               job_stat("last_latency"))
+        inst.register_callback("aiops_metrics_records", "gauge", "Records held in the in-memory metrics store",
+                               lambda: [((), len(self.metrics_store))])
+        inst.register_callback("aiops_metrics_memory_bytes", "gauge", "Estimated memory used by in-memory metrics records",
+                               self._metrics_memory_estimate)
+        inst.register_callback("aiops_baseline_samples_total", "counter",
+                               "Samples scored by the seasonal baseline, by whether they reached the model",
+                               self._baseline_samples)
+        inst.register_callback("aiops_remediation_total", "counter", "Remediation decisions and outcomes by status",
+                               lambda: [((("status", status),), count) for status, count in
+                                        self.remediation_engine.get_stats()["counters"].items()])
+    
+    def _baseline_samples(self):
+        if self.baseline is None:
+            return []
+        stats = self.baseline.stats()
+        return [((("result", "passed"),), stats["suspicious"]),
+                ((("result", "filtered"),), stats["scored"] - stats["suspicious"])]
+    
+    def _metrics_memory_estimate(self):
+        """估算内存中指标数据的占用：压缩块按编码后的大小，未压缩记录按最近一条记录的大小"""
+        snapshot = self.metrics_store.snapshot()
+        records = snapshot.records(1)
+        if not records:
+            return [((), 0)]
+        compressed_records, compressed_bytes = snapshot.compressed_stats()
+        return [((), compressed_bytes + _deep_sizeof(records[0]) * (len(snapshot) - compressed_records))]
     
-    def prediction_thread(self):
-        """预测分析线程"""
-        self.logger.info("Starting prediction thread")
+    def _register_jobs(self):
+        """注册周期任务"""
+        collection_interval = self.config.get("collection_interval", 60)
+        jitter = self.config.get("scheduler", {}).get("jitter", 0)
         
-        # 等待收集足够的数据（1小时）
-        time.sleep(self.config.get("collection_interval", 60))
+        # 分片只处理协调器推送的数据，不在本地采集
+        if self.shard_id is None:
+            self.scheduler.add_job("collect", self.collect_metrics, collection_interval, jitter=jitter)
         
-        while self.running:
-            try:
-                # 加载或训练模型
-                if not self.predictive_analytics.load_model():
-                    with self.data_lock:
-                        if len(self.metrics_data) > 60:  # 确保有至少1小时的数据（假设每分钟采集一次）
-                            # 创建临时CSV用于训练
-                            temp_df = pd.DataFrame(self.metrics_data)
-                            temp_path = "temp_prediction_data.csv"
-                            temp_df.to_csv(temp_path, index=False)
-                            
-                            # 训练模型
-                            feature_columns = ['cpu_percent', 'memory_percent', 'disk_usage']
-                            self.predictive_analytics.train(
-                                temp_path, 
-                                feature_columns=feature_columns,
-                                look_back=24
-                            )
-                            
-                            # 清理临时文件
-                            os.remove(temp_path)
-                
-                # 进行预测
-                with self.data_lock:
-                    if len(self.metrics_data) > 30:  # 确保有足够的历史数据（至少30分钟）
-                        df = pd.DataFrame(self.metrics_data)
-                        features = ['cpu_percent', 'memory_percent', 'disk_usage']
-                        
-                        if all(f in df.columns for f in features):
-                            # 获取最近的数据
-                            recent_data = df[features].values
-                            
-                            # 预测未来1小时
-                            forecast = self.predictive_analytics.forecast_next_days(
-                                recent_data, days=1, look_back=6  # 使用最近6个数据点进行预测
-                            )
-                            
-                            if forecast is not None:
-                                # 检查预测结果是否有潜在问题
-                                for day, day_forecast in enumerate(forecast):
-                                    for i, feature in enumerate(features):
-                                        threshold = self.config.get("thresholds", {}).get(feature, 90)
-                                        if day_forecast[i] > threshold * 0.9:  # 接近阈值的90%
-                                            self.logger.warning(f"Prediction warning: {feature} may reach {day_forecast[i]} in {day+1} days")
-                                            
-                                            # 触发预测告警
-                                            self.alert_manager.trigger_alert(
-                                                alert_type="prediction_warning",
-                                                resource_id=feature,
-                                                severity="warning",
-                                                message=f"预测 {day+1} 天后 {feature} 可能达到 {day_forecast[i]:.2f}%",
-                                                details={
-                                                    "feature": feature,
-                                                    "current_value": recent_data[-1][i],
-                                                    "predicted_value": float(day_forecast[i]),
-                                                    "days_ahead": day + 1,
-                                                    "threshold": threshold
-                                                }
-                                            )
-                                
-                                # 绘制预测图表
-                                self.predictive_analytics.plot_forecast(
-                                    recent_data[-30:],  # 最近30天的历史数据
-                                    forecast,
-                                    feature_index=0,  # CPU使用率
-                                    feature_name="CPU Usage (%)"
-                                )
-                
-                # 休眠
-                time.sleep(self.config.get("prediction_interval", 3600))
-            except Exception as e:
-                self.logger.error(f"Error in prediction thread: {str(e)}")
-                time.sleep(60)  # 出错后短暂休眠
+        # 等待收集足够的数据后再开始检测和预测
+        self.scheduler.add_job("detect", self.detect_anomalies,
+                               self.config.get("anomaly_detection_interval", 300),
+                               initial_delay=collection_interval * 5, jitter=jitter)
+        self.scheduler.add_job("predict", self.run_prediction,
+                               self.config.get("prediction_interval", 3600),
+                               initial_delay=collection_interval, jitter=jitter)
+        
+        state_config = self.config.get("state", {})
+        if self.state_snapshot is not None:
+            snapshot_interval = state_config.get("snapshot_interval", 300)
+            self.scheduler.add_job("snapshot", self.save_state, snapshot_interval,
+                                   initial_delay=snapshot_interval, jitter=jitter)
+        
+        if self.health_checker is not None:
+            self.scheduler.add_job("health_check", self.check_services,
+                                   self.config.get("health_checks", {}).get("interval", 30), jitter=jitter)
+        
+        if self.config_watcher.files:
+            reload_interval = self.config.get("config_reload", {}).get("interval", 5)
+            self.scheduler.add_job("config_reload", self.config_watcher.check, reload_interval,
+                                   initial_delay=reload_interval)
     
     def start(self):
         """启动AI运维系统"""
@@ -327,19 +1355,18 @@ class AIOperationsController:
         self.running = True
         self.logger.info("Starting AI Operations System")
         
-        # 创建并启动线程
-        threads = [
-            threading.Thread(target=self.data_collection_thread),
-            threading.Thread(target=self.anomaly_detection_thread),
-            threading.Thread(target=self.prediction_thread)
-        ]
+        if self.config.get("profiling", {}).get("enabled", False):
+            self.profiler.start()
+        
+        # 从状态快照恢复（热启动）
+        self.restore_state()
         
-        for thread in threads:
-            thread.daemon = True
-            thread.start()
-            self.threads.append(thread)
+        self.pipeline.start()
+        self.scheduler.start()
+        if self.remote_collector is not None:
+            self.remote_collector.start()
         
-        self.logger.info("All threads started")
+        self.logger.info("All jobs scheduled")
     
     def stop(self):
         """停止AI运维系统"""
@@ -350,18 +1377,36 @@ class AIOperationsController:
         self.logger.info("Stopping AI Operations System")
         self.running = False
         
-        # 等待所有线程结束，增加等待时间
-        for i, thread in enumerate(self.threads):
-            self.logger.info(f"Waiting for thread {i} to terminate...")
-            thread.join(timeout=10)  # 增加超时时间
-            if thread.is_alive():
-                self.logger.warning(f"Thread {i} did not terminate within timeout")
+        if self.remote_collector is not None:
+            self.remote_collector.stop()
+        
+        # 调度器的等待可立即中断，只需等待正在执行的任务完成
+        if not self.scheduler.stop(timeout=10):
+            self.logger.warning("Some jobs did not finish within timeout")
+        
+        # 停止流水线，未处理的事件被丢弃
+        if not self.pipeline.stop(timeout=10):
+            self.logger.warning("Some pipeline stages did not finish within timeout")
         
-        # 清空线程列表
-        self.threads = []
+        # 取消尚未完成的修复操作并关闭执行线程池
+        self.remediation_engine.shutdown()
         
-        # 保存数据
+        # 结束专用训练线程
+        self.cpu_budget.close()
+        
+        # 停止采样分析器并写出折叠栈
+        self.profiler.stop()
+        
+        # 保存数据和状态快照
         self._save_metrics_to_csv()
+        self.save_state()
+        
+        # 关闭健康检查的事件循环和keep-alive连接（检查结果仍可读取）
+        if self.health_checker is not None:
+            self.health_checker.close()
+        
+        # 快照中的最近告警读取完成后再关闭告警存储（Web接口重新启动时会创建新的控制器）
+        self.alert_manager.close()
         
         self.logger.info("System stopped")
-        return True
\ No newline at end of file
+        return True
@@ -0,0 +1,219 @@
+import os
+import sys
+import time
+import queue
+import threading
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from infrastructure.logging_setup import get_logger
+
+_STOP = object()
+
+class Stage:
+    """流水线中的一个处理阶段
+
+    每个阶段有一个有界队列和若干工作线程；handler返回的结果被转发到下一阶段。
+    队列满时按policy处理：block（阻塞等待block_timeout秒后丢弃）、
+    drop_newest（丢弃新数据）、drop_oldest（丢弃队列中最旧的数据）。
+    """
+
+    POLICIES = ("block", "drop_newest", "drop_oldest")
+
+    def __init__(self, name, handler, workers=1, queue_size=100, policy="block", block_timeout=1.0):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown drop policy: {policy}")
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.next_stage = None
+        self.threads = []
+        self._stopping = threading.Event()
+
+        self._stats_lock = threading.Lock()
+        self.submitted = 0
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.busy = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.total_service = 0.0
+        self.started_at = None
+
+    def submit(self, item):
+        """提交数据到本阶段，返回是否入队"""
+        entry = (time.monotonic(), item)
+        with self._stats_lock:
+            self.submitted += 1
+
+        try:
+            if self.policy == "block":
+                self.queue.put(entry, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(entry)
+            return True
+        except queue.Full:
+            pass
+
+        if self.policy == "drop_oldest":
+            try:
+                self.queue.get_nowait()
+                self.queue.task_done()
+                self.queue.put_nowait(entry)
+                with self._stats_lock:
+                    self.dropped += 1
+                return True
+            except (queue.Empty, queue.Full):
+                pass
+
+        with self._stats_lock:
+            self.dropped += 1
+        return False
+
+    def _worker(self, logger, stopping):
+        while not stopping.is_set():
+            entry = self.queue.get()
+            try:
+                if entry is _STOP:
+                    return
+                enqueued_at, item = entry
+                with self._stats_lock:
+                    self.busy += 1
+                start = time.monotonic()
+                try:
+                    results = self.handler(item)
+                except Exception as e:
+                    results = None
+                    with self._stats_lock:
+                        self.errors += 1
+                    logger.error(f"Error in pipeline stage {self.name}: {str(e)}")
+
+                end = time.monotonic()
+                with self._stats_lock:
+                    self.busy -= 1
+                    self.processed += 1
+                    self.total_service += end - start
+                    self.total_latency += end - enqueued_at
+                    self.max_latency = max(self.max_latency, end - enqueued_at)
+
+                if results and self.next_stage is not None:
+                    for result in results:
+                        self.next_stage.submit(result)
+            finally:
+                self.queue.task_done()
+
+    def start(self, logger):
+        self.started_at = time.monotonic()
+        # 每次启动使用新的停止事件，上次未按时退出的工作线程仍会在处理完当前数据后退出
+        self._stopping = threading.Event()
+        self.threads = [
+            threading.Thread(target=self._worker, args=(logger, self._stopping), name=f"stage-{self.name}-{i}",
+                             daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def _drain(self):
+        while True:
+            try:
+                self.queue.get_nowait()
+                self.queue.task_done()
+            except queue.Empty:
+                break
+
+    def stop(self, timeout):
+        """丢弃未处理的数据并停止工作线程
+
+        先设置停止事件，再向空闲的工作线程发送停止标记；上一阶段仍在转发结果时队列可能再次填满，
+        停止标记入队超时后不再等待，忙碌的工作线程处理完当前数据后按停止事件退出。
+        """
+        deadline = time.monotonic() + timeout
+        self._stopping.set()
+        self._drain()
+        for _ in self.threads:
+            try:
+                self.queue.put(_STOP, timeout=min(self.block_timeout, max(0, deadline - time.monotonic())))
+            except queue.Full:
+                break
+
+        for thread in self.threads:
+            thread.join(timeout=max(0, deadline - time.monotonic()))
+        alive = any(thread.is_alive() for thread in self.threads)
+        self.threads = []
+        # 未被消费的停止标记不能留给下次启动的工作线程
+        self._drain()
+        return not alive
+
+    def stats(self):
+        """返回阶段统计"""
+        with self._stats_lock:
+            uptime = time.monotonic() - self.started_at if self.started_at else 0
+            return {
+                "workers": self.workers,
+                "policy": self.policy,
+                "queue_depth": self.queue.qsize(),
+                "queue_size": self.queue.maxsize,
+                "busy": self.busy,
+                "submitted": self.submitted,
+                "processed": self.processed,
+                "dropped": self.dropped,
+                "errors": self.errors,
+                "throughput_per_second": self.processed / uptime if uptime else 0.0,
+                "avg_latency": self.total_latency / self.processed if self.processed else None,
+                "avg_service_time": self.total_service / self.processed if self.processed else None,
+                "max_latency": self.max_latency
+            }
+
+class Pipeline:
+    """由有界队列串联的多阶段流水线
+
+    慢阶段只会让自己的队列积压并按丢弃策略处理，不会阻塞上游阶段的线程
+    （block策略最多阻塞block_timeout秒），吞吐由最慢阶段的并行度决定。
+    """
+
+    def __init__(self, name="pipeline"):
+        self.name = name
+        self.logger = self._setup_logger()
+        self.stages = {}
+        self._order = []
+
+    def _setup_logger(self):
+        return get_logger("ai_ops_pipeline", "controller.log")
+
+    def add_stage(self, name, handler, workers=1, queue_size=100, policy="block", block_timeout=1.0):
+        """追加阶段，前一个阶段的输出自动连接到该阶段"""
+        stage = Stage(name, handler, workers, queue_size, policy, block_timeout)
+        if self._order:
+            self.stages[self._order[-1]].next_stage = stage
+        self.stages[name] = stage
+        self._order.append(name)
+        return stage
+
+    def submit(self, stage_name, item):
+        """向指定阶段提交数据"""
+        return self.stages[stage_name].submit(item)
+
+    def start(self):
+        for name in self._order:
+            self.stages[name].start(self.logger)
+        self.logger.info(f"Pipeline started: {' -> '.join(self._order)}")
+
+    def stop(self, timeout=10):
+        """按顺序停止各阶段"""
+        stopped = True
+        for name in self._order:
+            if not self.stages[name].stop(timeout):
+                self.logger.warning(f"Pipeline stage {name} did not stop within timeout")
+                stopped = False
+        self.logger.info("Pipeline stopped")
+        return stopped
+
+    def stats(self):
+        """返回各阶段统计"""
+        return {name: self.stages[name].stats() for name in self._order}
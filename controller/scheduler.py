@@ -0,0 +1,228 @@
+import os
+import sys
+import time
+import heapq
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from infrastructure.logging_setup import get_logger
+
+class PeriodicJob:
+    """周期任务及其运行统计"""
+
+    def __init__(self, name, func, interval, initial_delay=0, jitter=0):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.initial_delay = initial_delay
+        self.jitter = jitter
+
+        self.next_run = None
+        self.future = None
+
+        self.runs = 0
+        self.failures = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.last_duration = None
+        self.max_duration = 0.0
+        self.total_duration = 0.0
+        self.last_latency = None
+        self.max_latency = 0.0
+
+    def stats(self):
+        """返回运行统计"""
+        return {
+            "interval": self.interval,
+            "runs": self.runs,
+            "failures": self.failures,
+            "overruns": self.overruns,
+            "skipped": self.skipped,
+            "running": self.future is not None and not self.future.done(),
+            "last_duration": self.last_duration,
+            "max_duration": self.max_duration,
+            "avg_duration": self.total_duration / self.runs if self.runs else None,
+            "last_latency": self.last_latency,
+            "max_latency": self.max_latency
+        }
+
+class Scheduler:
+    """基于单调时钟的周期任务调度器
+
+    调度线程按最小堆等待下一个到期任务，等待通过Event实现，stop()可立即唤醒；
+    任务按固定频率对齐到 start + n * interval，执行时间不会造成节奏漂移；
+    任务在线程池中执行，上一次仍在运行时本次触发记为overrun并跳过，
+    调度线程落后时错过的周期记为skipped。
+    """
+
+    def __init__(self, name="scheduler"):
+        self.name = name
+        self.logger = self._setup_logger()
+        self.jobs = {}
+        self._heap = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self.stop_event = threading.Event()
+        self._thread = None
+        self._executor = None
+
+    def _setup_logger(self):
+        return get_logger("ai_ops_scheduler", "controller.log")
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def add_job(self, name, func, interval, initial_delay=0, jitter=0):
+        """注册周期任务（interval、initial_delay和jitter单位为秒）"""
+        job = PeriodicJob(name, func, interval, initial_delay, jitter)
+        with self._lock:
+            self.jobs[name] = job
+            if self.running:
+                self._schedule_first(job, time.monotonic())
+        self._wakeup.set()
+        return job
+
+    def _schedule_first(self, job, now):
+        job.next_run = now + job.initial_delay
+        heapq.heappush(self._heap, (job.next_run + self._jitter(job), job.name))
+
+    def _schedule_next(self, job, now):
+        # 固定频率：跳过已经错过的周期，保持与起始时间对齐
+        job.next_run += job.interval
+        if job.next_run <= now:
+            missed = int((now - job.next_run) // job.interval) + 1
+            job.skipped += missed
+            job.next_run += missed * job.interval
+            self.logger.warning(f"Job {job.name} fell behind, skipped {missed} tick(s)")
+        heapq.heappush(self._heap, (job.next_run + self._jitter(job), job.name))
+
+    @staticmethod
+    def _jitter(job):
+        return random.uniform(0, job.jitter) if job.jitter else 0.0
+
+    def start(self):
+        """启动调度器"""
+        if self.running:
+            return
+        self.stop_event.clear()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, len(self.jobs)),
+                                            thread_name_prefix=self.name)
+        now = time.monotonic()
+        with self._lock:
+            self._heap = []
+            for job in self.jobs.values():
+                self._schedule_first(job, now)
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        self.logger.info(f"Scheduler started with {len(self.jobs)} job(s)")
+
+    def stop(self, timeout=10):
+        """停止调度器，立即唤醒等待；等待正在运行的任务最多timeout秒"""
+        if self._thread is None:
+            return True
+        self.stop_event.set()
+        self._wakeup.set()
+        self._thread.join(timeout=timeout)
+
+        deadline = time.monotonic() + timeout
+        for job in self.jobs.values():
+            if job.future is not None:
+                try:
+                    job.future.result(timeout=max(0, deadline - time.monotonic()))
+                except Exception:
+                    pass
+        self._executor.shutdown(wait=False)
+
+        stopped = not self._thread.is_alive() and not any(
+            job.future is not None and not job.future.done() for job in self.jobs.values())
+        self._thread = None
+        self.logger.info("Scheduler stopped" if stopped else "Scheduler stopped with jobs still running")
+        return stopped
+
+    def wait(self, seconds):
+        """供任务内部使用的可中断等待，停止时立即返回True"""
+        return self.stop_event.wait(seconds)
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            # 先清除唤醒标志再计算等待时间，避免丢失add_job/stop的唤醒
+            self._wakeup.clear()
+            with self._lock:
+                if self._heap:
+                    due, name = self._heap[0]
+                    delay = due - time.monotonic()
+                else:
+                    delay = None
+
+                if delay is not None and delay <= 0:
+                    heapq.heappop(self._heap)
+                    job = self.jobs.get(name)
+                    if job is not None:
+                        self._dispatch(job, due)
+                    continue
+
+            self._wakeup.wait(delay)
+
+    def _dispatch(self, job, scheduled):
+        now = time.monotonic()
+        if job.future is not None and not job.future.done():
+            # 上一次执行仍未结束，跳过本次触发
+            job.overruns += 1
+            self.logger.warning(f"Job {job.name} overrun, skipping this tick")
+        else:
+            job.future = self._executor.submit(self._execute, job, scheduled)
+        self._schedule_next(job, now)
+
+    def _execute(self, job, scheduled):
+        start = time.monotonic()
+        job.last_latency = start - scheduled
+        job.max_latency = max(job.max_latency, job.last_latency)
+        try:
+            job.func()
+        except Exception as e:
+            job.failures += 1
+            self.logger.error(f"Error in job {job.name}: {str(e)}")
+        finally:
+            duration = time.monotonic() - start
+            job.runs += 1
+            job.last_duration = duration
+            job.max_duration = max(job.max_duration, duration)
+            job.total_duration += duration
+
+    def reschedule(self, name, interval):
+        """修改任务间隔，立即生效：下一次运行不晚于 now + interval"""
+        with self._lock:
+            job = self.jobs[name]
+            job.interval = interval
+            if self.running and job.next_run is not None:
+                now = time.monotonic()
+                if job.next_run > now + interval:
+                    job.next_run = now + interval
+                    self._heap = [entry for entry in self._heap if entry[1] != name]
+                    heapq.heapify(self._heap)
+                    heapq.heappush(self._heap, (job.next_run + self._jitter(job), name))
+        self._wakeup.set()
+
+    def due_times(self):
+        """各任务下一次运行的墙钟时间（epoch秒），用于保存调度进度"""
+        offset = time.time() - time.monotonic()
+        with self._lock:
+            return {name: job.next_run + offset for name, job in self.jobs.items() if job.next_run is not None}
+
+    def resume(self, due_times):
+        """按保存的下一次运行时间缩短尚未启动的任务的首次延迟（不会晚于原定延迟）"""
+        now = time.time()
+        with self._lock:
+            for name, due in due_times.items():
+                job = self.jobs.get(name)
+                if job is not None:
+                    job.initial_delay = min(job.initial_delay, max(0.0, due - now))
+
+    def stats(self):
+        """返回所有任务的运行统计"""
+        return {name: job.stats() for name, job in self.jobs.items()}
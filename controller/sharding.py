@@ -0,0 +1,414 @@
+import os
+import sys
+import json
+import time
+import socket
+import bisect
+import hashlib
+import threading
+import multiprocessing
+from multiprocessing.connection import Listener, Client
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from controller.main_controller import AIOperationsController, service_events
+from controller.scheduler import Scheduler
+from infrastructure.data_collector import SystemDataCollector
+from infrastructure.remote_collector import create_remote_collector
+from infrastructure.metrics_store import DEFAULT_HOST
+from infrastructure.health_check import create_health_checker
+from infrastructure.instrumentation import Instrumentation, SamplingProfiler
+from infrastructure.logging_setup import configure_logging, get_logger
+
+# 分片工作进程允许远程调用的控制器方法
+SHARD_METHODS = ("ingest", "get_status", "recent_alerts", "query_alerts", "recent_metrics", "range_query",
+                 "query_metrics", "submit_events")
+
+DEFAULT_SHARDING_CONFIG = {
+    "enabled": False,
+    "workers": 2,
+    "host": "127.0.0.1",
+    "base_port": 6100,
+    "authkey": "ai-ops-shard",
+    "replicas": 100,
+    "remote_workers": []
+}
+
+def load_sharding_config(config_path=None):
+    """读取配置文件中的sharding部分（与默认值合并）"""
+    config = dict(DEFAULT_SHARDING_CONFIG)
+    if config_path and os.path.exists(config_path):
+        with open(config_path, 'r') as f:
+            config.update(json.load(f).get("sharding", {}))
+    return config
+
+def _hash(key):
+    return int(hashlib.md5(key.encode("utf-8")).hexdigest()[:16], 16)
+
+def _parse_address(address):
+    host, port = address.rsplit(":", 1)
+    return host, int(port)
+
+class HashRing:
+    """一致性哈希环
+
+    每个节点在环上放置replicas个虚拟节点，增删节点时只有相邻区间的主机需要迁移。
+    """
+    
+    def __init__(self, nodes=(), replicas=100):
+        self.replicas = replicas
+        self._keys = []
+        self._nodes = {}
+        for node in nodes:
+            self.add(node)
+    
+    def add(self, node):
+        for i in range(self.replicas):
+            key = _hash(f"{node}#{i}")
+            bisect.insort(self._keys, key)
+            self._nodes[key] = node
+    
+    def remove(self, node):
+        for i in range(self.replicas):
+            key = _hash(f"{node}#{i}")
+            index = bisect.bisect_left(self._keys, key)
+            if index < len(self._keys) and self._keys[index] == key:
+                del self._keys[index]
+                del self._nodes[key]
+    
+    def get(self, key):
+        """返回负责key（主机名）的节点"""
+        if not self._keys:
+            return None
+        index = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._nodes[self._keys[index]]
+    
+    def nodes(self):
+        return sorted(set(self._nodes.values()))
+
+def run_shard_worker(shard_id, address, config_path=None, authkey=b"ai-ops-shard"):
+    """分片工作进程：运行一个只处理本分片主机的控制器，并在address上接受协调器的调用"""
+    # 每个分片进程写入自己的日志目录，避免多个进程同时滚动同一个文件
+    configure_logging(config_path, process_name=f"shard-{shard_id}")
+    controller = AIOperationsController(config_path=config_path, shard_id=shard_id)
+    controller.start()
+    listener = Listener(address, authkey=authkey)
+    stopped = threading.Event()
+    
+    def serve(conn):
+        with conn:
+            while True:
+                try:
+                    method, kwargs = conn.recv()
+                except (EOFError, OSError):
+                    return
+                if method == "stop":
+                    controller.stop()
+                    conn.send((True, None))
+                    stopped.set()
+                    return
+                if method not in SHARD_METHODS:
+                    conn.send((False, f"unknown method: {method}"))
+                    continue
+                try:
+                    conn.send((True, getattr(controller, method)(**kwargs)))
+                except Exception as e:
+                    conn.send((False, str(e)))
+    
+    def accept_loop():
+        while not stopped.is_set():
+            try:
+                conn = listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=serve, args=(conn,), daemon=True).start()
+    
+    threading.Thread(target=accept_loop, name=f"shard-{shard_id}-listener", daemon=True).start()
+    controller.logger.info(f"Shard {shard_id} listening on {address[0]}:{address[1]}")
+    try:
+        stopped.wait()
+    except KeyboardInterrupt:
+        controller.stop()
+    listener.close()
+
+class ShardClient:
+    """到一个分片工作进程的连接（按需连接，断开后自动重连一次）"""
+    
+    def __init__(self, name, address, authkey):
+        self.name = name
+        self.address = address
+        self.authkey = authkey
+        self._conn = None
+        self._lock = threading.Lock()
+    
+    def connect(self, timeout=30):
+        """等待工作进程开始监听"""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                with self._lock:
+                    self._conn = Client(self.address, authkey=self.authkey)
+                return True
+            except (ConnectionRefusedError, FileNotFoundError, OSError):
+                if time.monotonic() >= deadline:
+                    return False
+                time.sleep(0.2)
+    
+    def call(self, method, **kwargs):
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._conn is None:
+                        self._conn = Client(self.address, authkey=self.authkey)
+                    self._conn.send((method, kwargs))
+                    ok, result = self._conn.recv()
+                    break
+                except (EOFError, OSError):
+                    self._conn = None
+                    if attempt == 1:
+                        raise
+        if not ok:
+            raise RuntimeError(f"{self.name}.{method} failed: {result}")
+        return result
+    
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+class ShardCoordinator:
+    """分片模式的协调器
+
+    按主机名一致性哈希把指标分配给N个控制器工作进程（本机启动或其他节点上已运行的），
+    每个分片拥有自己的数据和模型；协调器负责采集本机指标、路由写入和查询，
+    并汇总各分片的状态和告警，对web/app.py提供与AIOperationsController相同的接口。
+    """
+    
+    def __init__(self, config_path=None, workers=None):
+        self.config_path = config_path
+        self.config = load_sharding_config(config_path)
+        if workers is not None:
+            self.config["workers"] = workers
+        self.logger = self._setup_logger()
+        self.authkey = self.config["authkey"].encode("utf-8")
+        self.hostname = socket.gethostname()
+        self.running = False
+        self.processes = []
+        
+        # 本机启动的分片 + 配置中的远程分片
+        self.shards = {}
+        for i in range(self.config["workers"]):
+            address = (self.config["host"], self.config["base_port"] + i)
+            self.shards[f"shard-{i}"] = ShardClient(f"shard-{i}", address, self.authkey)
+        for address in self.config.get("remote_workers", []):
+            self.shards[address] = ShardClient(address, _parse_address(address), self.authkey)
+        self.ring = HashRing(self.shards, replicas=self.config["replicas"])
+        
+        # 协调器自身的指标和采样分析器（与单进程模式的接口一致）
+        self.instrumentation = Instrumentation()
+        self.profiler = SamplingProfiler()
+        self.process_tracker = None
+        self.shard_up = {name: 0 for name in self.shards}
+        self.instrumentation.register_callback("aiops_shard_up", "gauge", "Whether each shard answered the last call",
+                                               lambda: [((("shard", name),), up) for name, up in self.shard_up.items()])
+        
+        # 本机指标由协调器采集后路由到对应分片
+        collection_interval = self._controller_config().get("collection_interval", 60)
+        self.data_collector = SystemDataCollector(collection_interval=collection_interval)
+        self.remote_collector = create_remote_collector(self._controller_config(), collection_interval)
+        self.scheduler = Scheduler(name="shard_coordinator")
+        self.scheduler.add_job("collect", self.collect_metrics, collection_interval)
+        
+        # 本机服务由协调器检查，告警和修复转发给本机的第一个分片（修复需要在本机执行）
+        self.health_checker = None
+        health_checker = create_health_checker(self._controller_config())
+        if health_checker is not None and self.config["workers"] < 1:
+            self.logger.warning("Service health checks need a local shard, skipping them")
+            health_checker.close()
+        elif health_checker is not None:
+            self.health_checker = health_checker
+            self.scheduler.add_job("health_check", self.check_services,
+                                   self._controller_config().get("health_checks", {}).get("interval", 30))
+    
+    def _setup_logger(self):
+        return get_logger("shard_coordinator", "controller.log")
+    
+    def _controller_config(self):
+        if self.config_path and os.path.exists(self.config_path):
+            with open(self.config_path, 'r') as f:
+                return json.load(f)
+        return {}
+    
+    def start(self):
+        """启动本机分片进程并等待它们开始监听"""
+        if self.running:
+            self.logger.warning("Coordinator is already running")
+            return False
+        
+        context = multiprocessing.get_context("spawn")
+        for i in range(self.config["workers"]):
+            name = f"shard-{i}"
+            process = context.Process(target=run_shard_worker, name=name,
+                                      args=(i, self.shards[name].address, self.config_path, self.authkey))
+            process.daemon = True
+            process.start()
+            self.processes.append(process)
+        
+        for name, client in self.shards.items():
+            if client.connect(timeout=60):
+                self.shard_up[name] = 1
+                self.logger.info(f"Connected to {name} at {client.address}")
+            else:
+                self.logger.error(f"Shard {name} at {client.address} is not reachable")
+        
+        self.running = True
+        self.scheduler.start()
+        if self.remote_collector is not None:
+            self.remote_collector.start()
+        self.logger.info(f"Coordinator started with {len(self.shards)} shards")
+        return True
+    
+    def stop(self):
+        if not self.running:
+            self.logger.warning("Coordinator is not running")
+            return False
+        self.running = False
+        if self.remote_collector is not None:
+            self.remote_collector.stop()
+        self.scheduler.stop(timeout=10)
+        
+        # 只停止本机启动的分片，远程分片由各自节点管理
+        for i in range(self.config["workers"]):
+            client = self.shards[f"shard-{i}"]
+            try:
+                client.call("stop")
+            except Exception as e:
+                self.logger.error(f"Error stopping {client.name}: {str(e)}")
+            client.close()
+        for process in self.processes:
+            process.join(timeout=15)
+            if process.is_alive():
+                process.terminate()
+        self.processes = []
+        if self.health_checker is not None:
+            self.health_checker.close()
+        self.logger.info("Coordinator stopped")
+        return True
+    
+    def shard_for(self, host):
+        return self.ring.get(host or DEFAULT_HOST)
+    
+    def collect_metrics(self):
+        """采集本机指标和远程目标的记录，路由到负责各主机的分片"""
+        try:
+            metrics = self.data_collector.collect_system_metrics()
+            metrics["host"] = self.hostname
+            records = [metrics]
+            if self.remote_collector is not None:
+                records += self.remote_collector.drain()
+            self.ingest(records)
+        except Exception as e:
+            self.logger.error(f"Error in coordinator collection: {str(e)}")
+    
+    def check_services(self):
+        """检查本机服务，把告警事件转发到本机的第一个分片"""
+        try:
+            down, recovered = self.health_checker.check()
+            events = service_events(down, recovered)
+            if events:
+                self.shards["shard-0"].call("submit_events", events=events)
+        except Exception as e:
+            self.logger.error(f"Error in coordinator service health check: {str(e)}")
+    
+    def ingest(self, records):
+        """按主机把记录分组后写入各自的分片"""
+        batches = {}
+        for record in records:
+            batches.setdefault(self.shard_for(record.get("host")), []).append(record)
+        written = 0
+        for name, batch in batches.items():
+            try:
+                written += self.shards[name].call("ingest", records=batch)
+            except Exception as e:
+                self.logger.error(f"Error ingesting {len(batch)} records into {name}: {str(e)}")
+        return written
+    
+    def _call_all(self, method, **kwargs):
+        """调用所有分片，返回 {分片: 结果}，失败的分片结果为 {"error": ...}"""
+        results = {}
+        for name, client in self.shards.items():
+            try:
+                results[name] = client.call(method, **kwargs)
+                self.shard_up[name] = 1
+            except Exception as e:
+                results[name] = {"error": str(e)}
+                self.shard_up[name] = 0
+        return results
+    
+    def get_status(self):
+        shards = self._call_all("get_status")
+        return {
+            "status": "running" if self.running else "stopped",
+            "mode": "sharded",
+            "shards": shards,
+            "data_points": sum(s.get("data_points", 0) for s in shards.values()),
+            "remote_collection": self.remote_collector.stats() if self.remote_collector is not None else None,
+            "services": self.health_checker.stats() if self.health_checker is not None else None,
+            "last_update": time.strftime("%Y-%m-%dT%H:%M:%S")
+        }
+    
+    def _merge_recent(self, method, limit):
+        merged = []
+        for result in self._call_all(method, limit=limit).values():
+            if isinstance(result, list):
+                merged.extend(result)
+        merged.sort(key=lambda item: str(item.get("timestamp")))
+        return merged[-limit:]
+    
+    def recent_alerts(self, limit=50):
+        return self._merge_recent("recent_alerts", limit)
+    
+    def recent_metrics(self, limit=100):
+        return self._merge_recent("recent_metrics", limit)
+    
+    def query_alerts(self, start=None, end=None, alert_type=None, resource_id=None, severity=None,
+                     limit=50, offset=0):
+        """每个分片取最新的offset + limit条，合并后按时间截取本页"""
+        results = self._call_all("query_alerts", start=start, end=end, alert_type=alert_type,
+                                 resource_id=resource_id, severity=severity, limit=offset + limit, offset=0)
+        merged, total = [], 0
+        for result in results.values():
+            merged.extend(result.get("alerts", []))
+            total += result.get("total", 0)
+        merged.sort(key=lambda alert: str(alert.get("timestamp")), reverse=True)
+        return {"alerts": merged[offset:offset + limit][::-1], "total": total}
+    
+    def range_query(self, start=None, end=None, host=None, features=None, step=None, agg="mean"):
+        """指定主机时只查询负责该主机的分片；不指定时原始数据合并，聚合结果按分片返回"""
+        kwargs = {"start": start, "end": end, "host": host, "features": features, "step": step, "agg": agg}
+        if host:
+            name = self.shard_for(host)
+            try:
+                result = self.shards[name].call("range_query", **kwargs)
+                self.shard_up[name] = 1
+            except Exception as e:
+                self.shard_up[name] = 0
+                self.logger.error(f"Error querying {name} for host {host}: {str(e)}")
+                return {"source": None, "step": step, "points": [], "error": str(e), "shard": name}
+            return {**result, "shard": name}
+        
+        results = self._call_all("range_query", **kwargs)
+        if step:
+            return {"source": "sharded", "step": step, "shards": results}
+        points = [p for r in results.values() for p in r.get("points", [])]
+        points.sort(key=lambda p: str(p.get("timestamp")))
+        return {"source": "raw", "step": None, "points": points}
+    
+    def query_metrics(self, start=None, end=None, resolution=None, max_points=None):
+        return {
+            "tier": "sharded",
+            "shards": self._call_all("query_metrics", start=start, end=end,
+                                     resolution=resolution, max_points=max_points)
+        }
@@ -0,0 +1,240 @@
+import json
+import zlib
+import struct
+import numpy as np
+from datetime import datetime
+
+SEGMENT_MAGIC = b"AIOPSEG1"
+
+# 整数按数值范围选用最小的类型保存
+_INT_TYPES = [(0, np.int8), (1, np.int16), (2, np.int32), (3, np.int64)]
+
+def _pack_ints(values):
+    """用能容纳所有值的最小整数类型打包，首字节为类型编号"""
+    values = np.asarray(values, dtype=np.int64)
+    low = values.min() if len(values) else 0
+    high = values.max() if len(values) else 0
+    for code, dtype in _INT_TYPES:
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return bytes([code]) + values.astype(dtype).tobytes()
+    raise ValueError("value out of int64 range")
+
+def _unpack_ints(data):
+    dtype = dict(_INT_TYPES)[data[0]]
+    return np.frombuffer(data, dtype=dtype, offset=1).astype(np.int64)
+
+def encode_timestamps(times):
+    """时间戳（epoch秒）按微秒做delta-of-delta编码：规律采样时几乎全是很小的值"""
+    micros = np.round(np.asarray(times, dtype=float) * 1e6).astype(np.int64)
+    if len(micros) == 0:
+        return b""
+    deltas = np.diff(micros)
+    dod = np.diff(deltas)
+    head = struct.pack("<qq", micros[0], deltas[0] if len(deltas) else 0)
+    return head + zlib.compress(_pack_ints(dod))
+
+def decode_timestamps(data, count):
+    if count == 0:
+        return np.empty(0)
+    first, first_delta = struct.unpack_from("<qq", data)
+    micros = np.empty(count, dtype=np.int64)
+    micros[0] = first
+    if count > 1:
+        dod = _unpack_ints(zlib.decompress(data[16:]))
+        deltas = first_delta + np.concatenate(([0], np.cumsum(dod)))
+        micros[1:] = first + np.cumsum(deltas)
+    return micros / 1e6
+
+def encode_floats(values):
+    """浮点列编码：两位小数内可无损量化的（如百分比）用定点差分，否则用XOR编码
+
+    返回 (编码名, 字节串)。XOR编码把每个值与前一个值的二进制异或，
+    变化小的序列高位大多为0，再经zlib压缩。
+    """
+    values = np.asarray(values, dtype=float)
+    if len(values) and not np.isnan(values).any():
+        scaled = np.round(values * 100)
+        if np.abs(scaled).max() < 2 ** 62 and np.array_equal(scaled / 100, values):
+            ints = scaled.astype(np.int64)
+            return "fixed2", zlib.compress(_pack_ints(np.concatenate((ints[:1], np.diff(ints)))))
+    bits = values.view(np.uint64)
+    xored = bits ^ np.concatenate((np.zeros(1, dtype=np.uint64), bits[:-1]))
+    return "xor", zlib.compress(xored.tobytes())
+
+def decode_floats(codec, data):
+    if codec == "fixed2":
+        return np.cumsum(_unpack_ints(zlib.decompress(data))) / 100
+    xored = np.frombuffer(zlib.decompress(data), dtype=np.uint64)
+    return np.bitwise_xor.accumulate(xored).view(np.float64)
+
+def encode_ints(values):
+    """整数计数器（如网络字节数）做差分编码"""
+    values = np.asarray(values, dtype=np.int64)
+    return zlib.compress(_pack_ints(np.concatenate((values[:1], np.diff(values)))))
+
+def decode_ints(data):
+    return np.cumsum(_unpack_ints(zlib.decompress(data)))
+
+class CompressedBlock:
+    """压缩的指标数据块
+
+    时间戳用delta-of-delta编码，数值列按类型使用定点差分、XOR或整数差分编码，
+    字符串列（如host）做字典编码，网络计数器等嵌套的整数字典展开为独立的列。
+    其他字段（如采样时的Top进程）不保存。按列解码直接得到NumPy数组。
+    """
+
+    def __init__(self, count, timestamps, columns, numeric_timestamps=False):
+        self.count = count
+        self.timestamps = timestamps
+        self.columns = columns
+        self.numeric_timestamps = numeric_timestamps
+
+    @classmethod
+    def encode(cls, records, times):
+        """编码一组记录，times为对应的epoch秒"""
+        columns = {}
+        keys = []
+        for record in records:
+            for key in record:
+                if key not in keys:
+                    keys.append(key)
+
+        for key in keys:
+            if key == "timestamp":
+                continue
+            values = [record.get(key) for record in records]
+            present = [v for v in values if v is not None]
+            if not present:
+                continue
+            if all(isinstance(v, bool) for v in present):
+                codes = [0 if v is None else int(v) + 1 for v in values]
+                columns[key] = ("bool", zlib.compress(_pack_ints(codes)))
+            elif all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in present):
+                if len(present) == len(values) and all(isinstance(v, int) for v in present):
+                    columns[key] = ("int", encode_ints(values))
+                else:
+                    codec, data = encode_floats([np.nan if v is None else v for v in values])
+                    columns[key] = (codec, data)
+            elif all(isinstance(v, str) for v in present):
+                labels = sorted(set(present))
+                index = {label: i + 1 for i, label in enumerate(labels)}
+                codes = [index[v] if v is not None else 0 for v in values]
+                columns[key] = ("dict", (labels, zlib.compress(_pack_ints(codes))))
+            elif all(isinstance(v, dict) for v in present) and len(present) == len(values):
+                # 嵌套的整数字典（如network_io）展开为 key.field 列
+                fields = set(present[0])
+                if all(set(v) == fields and all(isinstance(x, int) for x in v.values()) for v in present):
+                    for field in sorted(fields):
+                        columns[f"{key}.{field}"] = ("int", encode_ints([v[field] for v in values]))
+
+        numeric = all(isinstance(r.get("timestamp"), (int, float)) for r in records)
+        return cls(len(records), encode_timestamps(times), columns, numeric_timestamps=numeric)
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def nbytes(self):
+        """编码后的字节数"""
+        total = len(self.timestamps)
+        for codec, data in self.columns.values():
+            if codec == "dict":
+                labels, codes = data
+                total += len(codes) + sum(len(label) for label in labels)
+            else:
+                total += len(data)
+        return total
+
+    def times(self):
+        return decode_timestamps(self.timestamps, self.count)
+
+    def column(self, name):
+        """解码一列，缺失的列返回NaN"""
+        if name not in self.columns:
+            return np.full(self.count, np.nan)
+        codec, data = self.columns[name]
+        if codec == "int":
+            return decode_ints(data)
+        if codec == "dict":
+            labels, codes = data
+            lookup = np.array([None] + list(labels), dtype=object)
+            return lookup[_unpack_ints(zlib.decompress(codes))]
+        if codec == "bool":
+            lookup = np.array([None, False, True], dtype=object)
+            return lookup[_unpack_ints(zlib.decompress(data))]
+        return decode_floats(codec, data)
+
+    def feature_array(self, features):
+        """指定特征的二维数组，不经过字典记录"""
+        return np.column_stack([self.column(f).astype(float) for f in features]) if features \
+            else np.empty((self.count, 0))
+
+    def records(self, indices=None):
+        """还原为记录列表，indices指定时只还原这些行
+
+        列编码按块整体压缩，解码后先取出所需的行，再转换为Python对象和记录。
+        """
+        rows = None if indices is None else np.asarray(indices, dtype=np.int64)
+        times = self.times() if rows is None else self.times()[rows]
+        if self.numeric_timestamps:
+            stamps = times.tolist()
+        else:
+            stamps = [datetime.fromtimestamp(t).isoformat() for t in times.tolist()]
+        flat, nested = [], []
+        for name in self.columns:
+            values = self.column(name)
+            values = (values if rows is None else values[rows]).tolist()
+            if "." in name:
+                nested.append((*name.split(".", 1), values))
+            else:
+                flat.append((name, values))
+
+        result = []
+        for i in range(len(stamps)):
+            record = {"timestamp": stamps[i]}
+            for name, values in flat:
+                value = values[i]
+                # 跳过缺失值（None或NaN）
+                if value is not None and value == value:
+                    record[name] = value
+            for parent, field, values in nested:
+                record.setdefault(parent, {})[field] = values[i]
+            result.append(record)
+        return result
+
+    def to_bytes(self):
+        """序列化为段文件内容：魔数 + 元数据长度 + JSON元数据 + 各列数据"""
+        meta = {"count": self.count, "numeric_timestamps": self.numeric_timestamps, "columns": []}
+        payloads = [self.timestamps]
+        meta["timestamps"] = len(self.timestamps)
+        for name, (codec, data) in self.columns.items():
+            if codec == "dict":
+                labels, data = data
+                meta["columns"].append({"name": name, "codec": codec, "labels": labels, "size": len(data)})
+            else:
+                meta["columns"].append({"name": name, "codec": codec, "size": len(data)})
+            payloads.append(data)
+        header = json.dumps(meta).encode("utf-8")
+        return SEGMENT_MAGIC + struct.pack("<I", len(header)) + header + b"".join(payloads)
+
+    @classmethod
+    def from_bytes(cls, blob):
+        if blob[:len(SEGMENT_MAGIC)] != SEGMENT_MAGIC:
+            raise ValueError("not a metrics segment")
+        offset = len(SEGMENT_MAGIC)
+        (header_size,) = struct.unpack_from("<I", blob, offset)
+        offset += 4
+        meta = json.loads(blob[offset:offset + header_size].decode("utf-8"))
+        offset += header_size
+
+        timestamps = blob[offset:offset + meta["timestamps"]]
+        offset += meta["timestamps"]
+        columns = {}
+        for column in meta["columns"]:
+            data = blob[offset:offset + column["size"]]
+            offset += column["size"]
+            if column["codec"] == "dict":
+                data = (column["labels"], data)
+            columns[column["name"]] = (column["codec"], data)
+        return cls(meta["count"], timestamps, columns, numeric_timestamps=meta["numeric_timestamps"])
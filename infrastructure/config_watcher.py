@@ -0,0 +1,41 @@
+import os
+import logging
+
+class ConfigWatcher:
+    """配置文件变化检测
+
+    按修改时间和文件大小轮询，check()由调度器周期调用，不需要额外的线程；
+    文件变化时调用注册的回调，回调负责读取、校验并应用新配置。
+    """
+
+    def __init__(self, logger=None):
+        self.logger = logger or logging.getLogger("config_watcher")
+        self.files = {}
+
+    @staticmethod
+    def _signature(path):
+        try:
+            stat = os.stat(path)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def watch(self, path, callback):
+        """监视path，变化时调用callback(path)"""
+        if path:
+            self.files[path] = [self._signature(path), callback]
+
+    def check(self):
+        """检查所有文件，返回发生变化的文件列表（文件暂时不存在时不触发）"""
+        changed = []
+        for path, entry in self.files.items():
+            signature = self._signature(path)
+            if signature is None or signature == entry[0]:
+                continue
+            entry[0] = signature
+            changed.append(path)
+            try:
+                entry[1](path)
+            except Exception as e:
+                self.logger.error(f"Error reloading {path}: {str(e)}")
+        return changed
@@ -0,0 +1,126 @@
+import sys
+import os
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from infrastructure.logging_setup import get_logger
+
+class CPUBudget:
+    """模型训练的CPU预算
+
+    根据cgroup配额、CPU亲和性和配置计算训练可用的并行度(n_jobs)，
+    训练在调高了nice值的专用线程中执行，避免监控程序抢占业务负载的CPU。
+    Linux下nice按线程生效且无权限时不能再调低，因此不在调度器等共享线程池的线程中调整。
+    """
+
+    def __init__(self, max_cores=None, cpu_fraction=0.5, niceness=10):
+        self.max_cores = max_cores
+        self.cpu_fraction = cpu_fraction
+        self.niceness = niceness
+        self.logger = self._setup_logger()
+        self._executor = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _setup_logger(self):
+        return get_logger("cpu_budget", "system_metrics.log")
+
+    @staticmethod
+    def _cgroup_cpu_limit():
+        """读取cgroup的CPU配额（核数），未限制时返回None"""
+        # cgroup v2
+        try:
+            with open("/sys/fs/cgroup/cpu.max", 'r') as f:
+                quota, period = f.read().split()[:2]
+                if quota != "max":
+                    return int(quota) / int(period)
+                return None
+        except (OSError, ValueError):
+            pass
+
+        # cgroup v1
+        try:
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us", 'r') as f:
+                quota = int(f.read().strip())
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us", 'r') as f:
+                period = int(f.read().strip())
+            if quota > 0 and period > 0:
+                return quota / period
+        except (OSError, ValueError):
+            pass
+
+        return None
+
+    def available_cores(self):
+        """当前进程实际可用的CPU核数（考虑亲和性和cgroup配额）"""
+        if hasattr(os, "sched_getaffinity"):
+            cores = len(os.sched_getaffinity(0))
+        else:
+            cores = os.cpu_count() or 1
+
+        cgroup_limit = self._cgroup_cpu_limit()
+        if cgroup_limit is not None:
+            cores = min(cores, max(1, int(math.ceil(cgroup_limit))))
+
+        return cores
+
+    def n_jobs(self):
+        """训练使用的并行度"""
+        cores = max(1, int(self.available_cores() * self.cpu_fraction))
+        if self.max_cores:
+            cores = min(cores, self.max_cores)
+        return cores
+
+    def apply_niceness(self):
+        """提高当前线程的nice值（Linux下nice按线程生效，随后创建的工作线程会继承）
+
+        只在专用训练线程启动时调用一次，见run()。
+        """
+        if not self.niceness or not hasattr(os, "nice"):
+            return False
+
+        try:
+            current = os.nice(0)
+            if current < self.niceness:
+                os.nice(self.niceness - current)
+                self.logger.info(f"Training niceness set to {self.niceness}")
+            return True
+        except OSError as e:
+            self.logger.warning(f"Failed to set niceness: {str(e)}")
+            return False
+
+    def _init_training_thread(self):
+        self._local.training = True
+        self.apply_niceness()
+
+    def run(self, func, *args, **kwargs):
+        """在专用训练线程中执行func并等待结果（已在训练线程中时直接执行）"""
+        if getattr(self._local, "training", False):
+            return func(*args, **kwargs)
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="training",
+                                                    initializer=self._init_training_thread)
+            future = self._executor.submit(func, *args, **kwargs)
+        return future.result()
+
+    def close(self):
+        """结束专用训练线程（等待正在进行的训练完成），之后的run()会重新创建"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def to_dict(self):
+        """返回预算信息"""
+        return {
+            "available_cores": self.available_cores(),
+            "n_jobs": self.n_jobs(),
+            "cpu_fraction": self.cpu_fraction,
+            "max_cores": self.max_cores,
+            "niceness": self.niceness
+        }
@@ -1,31 +1,43 @@
+import os
+import sys
 import time
 import psutil
-import logging
 from datetime import datetime
 
+# 添加项目根目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from infrastructure.logging_setup import get_logger
+
 class SystemDataCollector:
-    def __init__(self, collection_interval=60):
+    def __init__(self, collection_interval=60, process_tracker=None):
         self.collection_interval = collection_interval
+        self.process_tracker = process_tracker
         self.logger = self._setup_logger()
         
+        # 预热CPU计数，之后按两次采集之间的差值计算，无需阻塞等待
+        psutil.cpu_percent(interval=None)
+        
     def _setup_logger(self):
-        logger = logging.getLogger("system_collector")
-        logger.setLevel(logging.INFO)
-        handler = logging.FileHandler("system_metrics.log")
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        handler.setFormatter(formatter)
-        logger.addHandler(handler)
-        return logger
+        return get_logger("system_collector", "system_metrics.log")
     
     def collect_system_metrics(self):
         """收集系统基础指标"""
         metrics = {
             "timestamp": datetime.now().isoformat(),
-            "cpu_percent": psutil.cpu_percent(interval=1),
+            "cpu_percent": psutil.cpu_percent(interval=None),
             "memory_percent": psutil.virtual_memory().percent,
             "disk_usage": psutil.disk_usage('/').percent,
             "network_io": psutil.net_io_counters()._asdict()
         }
+        
+        # 与系统指标同时采样进程Top-N，记录当时的嫌疑进程
+        if self.process_tracker is not None:
+            try:
+                self.process_tracker.sample()
+                metrics["top_process"] = self.process_tracker.culprits()
+            except Exception as e:
+                self.logger.error(f"Error sampling processes: {str(e)}")
         return metrics
     
     def start_collection(self):
@@ -34,7 +46,7 @@ class SystemDataCollector:
         try:
             while True:
                 metrics = self.collect_system_metrics()
-                self.logger.info(f"Collected metrics: {metrics}")
+                self.logger.debug("Collected metrics", extra={"metrics": metrics})
                 time.sleep(self.collection_interval)
         except KeyboardInterrupt:
             self.logger.info("Data collection stopped by user")
@@ -0,0 +1,184 @@
+import os
+import sys
+import threading
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from infrastructure.metrics_store import DEFAULT_HOST, to_epoch
+
+ROLLING_STATS = ("mean", "std", "min", "max")
+
+class _HostWindow:
+    """单台主机最近capacity个样本的窗口
+
+    缓冲区长度为2倍容量，每个样本同时写入i和i + capacity两个位置，
+    任意不超过容量的最近窗口都是缓冲区上连续的一段，读取时不需要拼接。
+    """
+
+    def __init__(self, capacity, n_features):
+        self.capacity = capacity
+        self.values = np.full((2 * capacity, n_features), np.nan)
+        self.scaled = np.full((2 * capacity, n_features), np.nan, dtype=np.float32)
+        self.times = np.zeros(2 * capacity)
+        self.count = 0
+
+    def append(self, values, timestamp, scale):
+        i = self.count % self.capacity
+        self.values[i] = self.values[i + self.capacity] = values
+        self.times[i] = self.times[i + self.capacity] = timestamp
+        if scale is not None:
+            self.scaled[i] = self.scaled[i + self.capacity] = values * scale[0] + scale[1]
+        self.count += 1
+
+    def last(self, count, buffer=None):
+        """最近count个样本的视图（不足时返回全部）"""
+        buffer = self.values if buffer is None else buffer
+        count = min(count, self.count, self.capacity)
+        end = (self.count - 1) % self.capacity + self.capacity + 1
+        return buffer[end - count:end]
+
+    def previous(self):
+        """最新样本的 (数值, 时间)，没有样本时返回 (None, None)"""
+        if self.count == 0:
+            return None, None
+        i = (self.count - 1) % self.capacity
+        return self.values[i], self.times[i]
+
+class FeatureStore:
+    """异常检测与预测共享的增量特征存储
+
+    每条记录写入时计算一次派生特征：原始值、变化率（每秒）以及多个窗口的滚动均值、
+    标准差、最小值和最大值，按记录的版本号（与MetricsStore一致）保存在环形数组中，
+    检测阶段直接按版本号取出特征行，不再从记录构建DataFrame。
+    每台主机另保存最近的原始值和按预测模型scaler缩放后的值，预测直接取出
+    等长的历史窗口和回看窗口，不再逐条转换记录和重复调用scaler。
+    """
+
+    def __init__(self, features=None, capacity=720, windows=(5, 15, 60), max_rows=2880):
+        self.features = features or ['cpu_percent', 'memory_percent', 'disk_usage']
+        self.windows = sorted(windows)
+        self.capacity = max(capacity, self.windows[-1] if self.windows else 1)
+        self.columns = list(self.features) + [f"{f}_rate" for f in self.features]
+        for window in self.windows:
+            self.columns += [f"{f}_{stat}_{window}" for stat in ROLLING_STATS for f in self.features]
+        self._column_index = {name: i for i, name in enumerate(self.columns)}
+
+        self._lock = threading.Lock()
+        self._hosts = {}
+        self._rows = np.full((max_rows, len(self.columns)), np.nan)
+        self._row_versions = np.full(max_rows, -1, dtype=np.int64)
+        self.scaler = None
+        self._scale = None
+        self.updates = 0
+
+    def _derive(self, window, values, timestamp, previous):
+        """计算一条记录的派生特征（记录已写入window，previous为写入前的最新样本）"""
+        row = np.empty(len(self.columns))
+        n = len(self.features)
+        row[:n] = values
+
+        previous_values, previous_time = previous
+        if previous_values is not None and timestamp > previous_time:
+            row[n:2 * n] = (values - previous_values) / (timestamp - previous_time)
+        else:
+            row[n:2 * n] = 0.0
+
+        # 各窗口是最大窗口的后缀，只取一次视图
+        recent = window.last(self.windows[-1]) if self.windows else None
+        offset = 2 * n
+        for size in self.windows:
+            part = recent[-size:]
+            row[offset:offset + n] = part.mean(axis=0)
+            row[offset + n:offset + 2 * n] = part.std(axis=0)
+            row[offset + 2 * n:offset + 3 * n] = part.min(axis=0)
+            row[offset + 3 * n:offset + 4 * n] = part.max(axis=0)
+            offset += 4 * n
+        return row
+
+    def update(self, record, version=None):
+        """写入一条记录；version为该记录在MetricsStore中的版本号"""
+        values = np.array([np.nan if record.get(f) is None else record[f] for f in self.features], dtype=float)
+        timestamp = to_epoch(record["timestamp"])
+        host = record.get("host", DEFAULT_HOST)
+        with self._lock:
+            window = self._hosts.get(host)
+            if window is None:
+                window = self._hosts[host] = _HostWindow(self.capacity, len(self.features))
+
+            # 缺失值沿用该主机的上一个值，窗口内不含NaN
+            previous = window.previous()
+            if previous[0] is not None:
+                values = np.where(np.isnan(values), previous[0], values)
+            window.append(values, timestamp, self._scale)
+            row = self._derive(window, values, timestamp, previous)
+
+            if version is not None:
+                index = version % len(self._rows)
+                self._rows[index] = row
+                self._row_versions[index] = version
+            self.updates += 1
+
+    def set_scaler(self, scaler):
+        """使用新的MinMaxScaler，重新缩放所有主机窗口（模型重新训练或加载后调用一次）"""
+        with self._lock:
+            if scaler is self.scaler:
+                return
+            self.scaler = scaler
+            self._scale = (scaler.scale_, scaler.min_)
+            for window in self._hosts.values():
+                window.scaled[:] = window.values * self._scale[0] + self._scale[1]
+
+    def rows(self, after_version, until_version, columns=None):
+        """版本号在 (after_version, until_version] 的特征行，有记录已被覆盖时返回None"""
+        versions = np.arange(after_version + 1, until_version + 1)
+        with self._lock:
+            indices = versions % len(self._rows)
+            if not np.array_equal(self._row_versions[indices], versions):
+                return None
+            rows = self._rows[indices]
+        if columns is not None:
+            rows = rows[:, [self._column_index[c] for c in columns]]
+        return rows
+
+    def frame(self, after_version, until_version, columns=None):
+        """rows()的DataFrame形式，列为特征名"""
+        rows = self.rows(after_version, until_version, columns)
+        if rows is None:
+            return None
+        return pd.DataFrame(rows, columns=columns or self.columns)
+
+    def window(self, count, min_count=1, hosts=None):
+        """各主机最近的原始值，返回 (主机列表, 数组 (主机数, 样本数, 特征数))
+
+        样本少于min_count的主机被跳过；其余主机截取为相同长度（不超过count）。
+        """
+        with self._lock:
+            hosts = sorted(self._hosts) if hosts is None else hosts
+            hosts = [h for h in hosts if h in self._hosts and min(self._hosts[h].count, self.capacity) >= min_count]
+            if not hosts:
+                return [], None
+            length = min(count, min(min(self._hosts[h].count, self.capacity) for h in hosts))
+            return hosts, np.stack([self._hosts[h].last(length) for h in hosts])
+
+    def lag_matrix(self, hosts, look_back, scaler):
+        """各主机最近look_back个缩放后的样本展开为模型输入 (主机数, look_back * 特征数)"""
+        if scaler is not self.scaler:
+            self.set_scaler(scaler)
+        with self._lock:
+            windows = [self._hosts[h].last(look_back, self._hosts[h].scaled) for h in hosts]
+            if any(len(w) < look_back for w in windows):
+                return None
+            return np.stack(windows).reshape(len(hosts), -1)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hosts": len(self._hosts),
+                "columns": len(self.columns),
+                "rows": int((self._row_versions >= 0).sum()),
+                "updates": self.updates,
+                "scaled": self.scaler is not None
+            }
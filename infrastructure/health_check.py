@@ -0,0 +1,243 @@
+import os
+import sys
+import time
+import shutil
+import asyncio
+import threading
+from datetime import datetime
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from infrastructure.logging_setup import get_logger
+from infrastructure.remote_collector import HttpConnectionPool
+
+# systemd单元处于这些状态时视为正常（activating/reloading为过渡状态，不触发重启）
+HEALTHY_UNIT_STATES = ("active", "activating", "reloading")
+
+UNIT_PROPERTIES = ("Id", "LoadState", "ActiveState", "SubState")
+
+def _parse_address(address):
+    host, port = address.rsplit(':', 1)
+    return host.strip('[]'), int(port)
+
+class ServiceCheck:
+    """一个服务的健康检查配置和状态
+
+    unit为systemd单元名，tcp为 host:port，http为URL（状态码需为expect_status），
+    至少配置一项；任一项失败即本次检查失败，连续failure_threshold次失败后判定为宕机。
+    remediate为true且配置了unit时，宕机触发service_down修复（重启该单元）。
+    """
+
+    def __init__(self, name, unit=None, tcp=None, http=None, expect_status=200, timeout=None,
+                 failure_threshold=None, remediate=True):
+        if not (unit or tcp or http):
+            raise ValueError(f"service {name} has no unit, tcp or http check")
+        self.name = name
+        self.unit = unit
+        self.tcp = tcp
+        self.http = http
+        self.expect_status = expect_status
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.remediate = remediate
+
+        self.state = "unknown"
+        self.consecutive_failures = 0
+        self.last_result = None
+        self.last_change = None
+
+class ServiceHealthChecker:
+    """服务健康检查
+
+    每次检查在一个事件循环中并发执行所有探测：所有systemd单元通过一次
+    `systemctl show` 批量查询，TCP和HTTP探测受concurrency限制并复用keep-alive连接。
+    结果缓存到下一次检查，状态查询和Web接口直接读取缓存，不触发探测。
+    """
+
+    def __init__(self, services, timeout=3, concurrency=50, failure_threshold=2):
+        self.services = {}
+        for service in services:
+            if not isinstance(service, ServiceCheck):
+                service = ServiceCheck(**service)
+            self.services[service.name] = service
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.failure_threshold = failure_threshold
+        self.logger = self._setup_logger()
+        self.systemctl = shutil.which("systemctl")
+
+        # 事件循环和连接池在多次检查之间保留，HTTP探测复用连接
+        self._loop = asyncio.new_event_loop()
+        self._pool = HttpConnectionPool(max_idle=max(concurrency, 1))
+        self._lock = threading.Lock()
+        self.checks = 0
+        self.last_check = None
+        self.last_duration = None
+
+    def _setup_logger(self):
+        return get_logger("health_checker", "remediation.log")
+
+    async def _unit_states(self, units):
+        """一次systemctl调用查询所有单元，返回 {单元: 属性}；systemctl不可用时返回None"""
+        if not units or self.systemctl is None:
+            return None
+        process = await asyncio.create_subprocess_exec(
+            self.systemctl, "show", "--property=" + ",".join(UNIT_PROPERTIES), "--", *units,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+        )
+        try:
+            output, _ = await asyncio.wait_for(process.communicate(), self.timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise
+
+        # 每个单元输出一段 key=value，段之间以空行分隔，顺序与参数一致
+        blocks = [block for block in output.decode('utf-8', errors='replace').split('\n\n') if block.strip()]
+        states = {}
+        for unit, block in zip(units, blocks):
+            states[unit] = dict(line.split('=', 1) for line in block.splitlines() if '=' in line)
+        return states
+
+    async def _probe(self, kind, service, semaphore):
+        timeout = service.timeout or self.timeout
+        start = time.monotonic()
+        async with semaphore:
+            try:
+                if kind == "tcp":
+                    _, writer = await asyncio.wait_for(asyncio.open_connection(*_parse_address(service.tcp)), timeout)
+                    writer.close()
+                    result = {"ok": True}
+                else:
+                    status, _ = await asyncio.wait_for(self._pool.get(service.http), timeout)
+                    result = {"ok": status == service.expect_status, "status": status}
+                    if not result["ok"]:
+                        result["error"] = f"HTTP {status}, expected {service.expect_status}"
+            except asyncio.TimeoutError:
+                result = {"ok": False, "error": f"timeout after {timeout}s"}
+            except Exception as e:
+                result = {"ok": False, "error": str(e) or type(e).__name__}
+        result["latency_ms"] = round((time.monotonic() - start) * 1000, 2)
+        return kind, service.name, result
+
+    async def _check_all(self):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        probes = []
+        for service in self.services.values():
+            if service.tcp:
+                probes.append(self._probe("tcp", service, semaphore))
+            if service.http:
+                probes.append(self._probe("http", service, semaphore))
+        units = list(dict.fromkeys(s.unit for s in self.services.values() if s.unit))
+        unit_task = asyncio.ensure_future(self._unit_states(units))
+        probe_results = await asyncio.gather(*probes)
+
+        results = {name: {} for name in self.services}
+        for kind, name, result in probe_results:
+            results[name][kind] = result
+        try:
+            states = await unit_task
+        except Exception as e:
+            states = None
+            self.logger.error(f"Error querying systemd unit states: {str(e) or type(e).__name__}")
+        for service in self.services.values():
+            if not service.unit:
+                continue
+            if states is None or service.unit not in states:
+                # systemctl不可用时单元状态未知，不据此判定宕机
+                results[service.name]["unit"] = {"ok": None, "error": "unit state unavailable"}
+                continue
+            unit = states[service.unit]
+            ok = unit.get("LoadState") != "not-found" and unit.get("ActiveState") in HEALTHY_UNIT_STATES
+            results[service.name]["unit"] = {"ok": ok, "active_state": unit.get("ActiveState"),
+                                             "sub_state": unit.get("SubState"), "load_state": unit.get("LoadState")}
+        return results
+
+    def _update(self, service, checks, now):
+        """更新服务状态，返回状态变化（"down"/"up"）或None"""
+        known = [check["ok"] for check in checks.values() if check["ok"] is not None]
+        previous = service.state
+        if not known:
+            healthy = None
+        else:
+            healthy = all(known)
+            if healthy:
+                service.consecutive_failures = 0
+                service.state = "up"
+            else:
+                service.consecutive_failures += 1
+                if service.consecutive_failures >= (service.failure_threshold or self.failure_threshold):
+                    service.state = "down"
+
+        service.last_result = {
+            "healthy": healthy,
+            "state": service.state,
+            "consecutive_failures": service.consecutive_failures,
+            "checks": checks,
+            "checked_at": now
+        }
+        if service.state != previous:
+            service.last_change = now
+            if service.state == "down" or previous == "down":
+                return service.state
+        return None
+
+    def check(self):
+        """对所有服务执行一次检查，返回 (宕机服务列表, 恢复服务列表)
+
+        宕机列表包含本次仍处于宕机状态的所有服务（不只是新宕机的），由调用方决定是否重复告警。
+        """
+        with self._lock:
+            start = time.monotonic()
+            results = self._loop.run_until_complete(self._check_all())
+            now = datetime.now().isoformat()
+            down, recovered = [], []
+            for name, checks in results.items():
+                service = self.services[name]
+                change = self._update(service, checks, now)
+                # 检查结果未知（如systemctl不可用）时保持宕机状态，但不重复告警和修复
+                if service.state == "down" and service.last_result["healthy"] is False:
+                    down.append(service)
+                    if change == "down":
+                        self.logger.warning(f"Service {name} is down: {checks}")
+                elif change == "up":
+                    recovered.append(service)
+                    self.logger.info(f"Service {name} recovered")
+            self.checks += 1
+            self.last_check = now
+            self.last_duration = time.monotonic() - start
+        return down, recovered
+
+    def results(self):
+        """最近一次检查的结果（缓存），{服务: 结果}"""
+        return {name: service.last_result for name, service in self.services.items()}
+
+    def stats(self):
+        states = [service.state for service in self.services.values()]
+        return {
+            "services": len(states),
+            "up": states.count("up"),
+            "down": states.count("down"),
+            "unknown": states.count("unknown"),
+            "checks": self.checks,
+            "last_check": self.last_check,
+            "last_duration": self.last_duration
+        }
+
+    def close(self):
+        with self._lock:
+            self._pool.close()
+            self._loop.close()
+
+def create_health_checker(config):
+    """按配置的health_checks部分创建检查器，未启用或没有服务时返回None"""
+    health_config = config.get("health_checks", {})
+    if not health_config.get("enabled", False) or not health_config.get("services"):
+        return None
+    return ServiceHealthChecker(
+        health_config["services"],
+        timeout=health_config.get("timeout", 3),
+        concurrency=health_config.get("concurrency", 50),
+        failure_threshold=health_config.get("failure_threshold", 2)
+    )
@@ -0,0 +1,229 @@
+import os
+import sys
+import time
+import bisect
+import logging
+import threading
+import traceback
+from collections import Counter
+import psutil
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+def _format_labels(labels, extra=None):
+    items = list(labels) + (list(extra) if extra else [])
+    if not items:
+        return ""
+    escaped = []
+    for key, value in items:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        escaped.append(f'{key}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+class Histogram:
+    """固定分桶的直方图（线程安全）"""
+    
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+    
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+    
+    def snapshot(self):
+        with self.lock:
+            return list(self.counts), self.sum, self.count
+
+class TimedLock:
+    """记录等待时间的锁，可替代threading.Lock使用"""
+    
+    def __init__(self, histogram, lock=None):
+        self._lock = lock or threading.Lock()
+        self._histogram = histogram
+    
+    def acquire(self, blocking=True, timeout=-1):
+        start = time.perf_counter()
+        acquired = self._lock.acquire(blocking, timeout)
+        self._histogram.observe(time.perf_counter() - start)
+        return acquired
+    
+    def release(self):
+        self._lock.release()
+    
+    def locked(self):
+        return self._lock.locked()
+    
+    def __enter__(self):
+        self.acquire()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+class _Timer:
+    def __init__(self, histogram):
+        self.histogram = histogram
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+class Instrumentation:
+    """运维系统自身的指标注册表
+
+    支持直方图（各阶段耗时、锁等待时间）和回调式的gauge/counter（队列深度、RSS等），
+    render_prometheus()输出Prometheus文本格式。
+    """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.callbacks = {}
+        self.help = {}
+        self.process = psutil.Process(os.getpid())
+        self.register_callback("aiops_process_resident_memory_bytes", "gauge",
+                               "Resident memory of the ops process",
+                               lambda: [((), self.process.memory_info().rss)])
+        self.register_callback("aiops_process_threads", "gauge",
+                               "Number of threads in the ops process",
+                               lambda: [((), threading.active_count())])
+    
+    def histogram(self, name, help_text="", buckets=DEFAULT_BUCKETS, **labels):
+        """获取（或创建）带标签的直方图"""
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram(buckets)
+                self.help.setdefault(name, help_text)
+            return self.histograms[key]
+    
+    def observe(self, name, value, **labels):
+        self.histogram(name, **labels).observe(value)
+    
+    def timer(self, name, **labels):
+        """计时上下文管理器：with instrumentation.timer("...", stage="collect"):"""
+        return _Timer(self.histogram(name, **labels))
+    
+    def timed_lock(self, lock_name, lock=None):
+        """创建记录等待时间的锁"""
+        histogram = self.histogram("aiops_lock_wait_seconds", "Time spent waiting to acquire locks",
+                                   buckets=(0.00001, 0.0001, 0.001, 0.01, 0.1, 1.0, 10.0),
+                                   lock=lock_name)
+        return TimedLock(histogram, lock)
+    
+    def register_callback(self, name, metric_type, help_text, func):
+        """注册回调式指标，func返回 [(标签元组, 值), ...]"""
+        with self.lock:
+            self.callbacks[name] = (metric_type, func)
+            self.help[name] = help_text
+    
+    def render_prometheus(self):
+        """以Prometheus文本格式输出所有指标"""
+        lines = []
+        
+        with self.lock:
+            histograms = sorted(self.histograms.items())
+            callbacks = sorted(self.callbacks.items())
+        
+        current = None
+        for (name, labels), histogram in histograms:
+            if name != current:
+                lines.append(f"# HELP {name} {self.help.get(name, '')}")
+                lines.append(f"# TYPE {name} histogram")
+                current = name
+            counts, total, count = histogram.snapshot()
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        
+        for name, (metric_type, func) in callbacks:
+            try:
+                samples = func()
+            except Exception:
+                continue
+            lines.append(f"# HELP {name} {self.help.get(name, '')}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for labels, value in samples:
+                if value is None:
+                    continue
+                lines.append(f"{name}{_format_labels(labels)} {float(value)}")
+        
+        return "\n".join(lines) + "\n"
+
+class SamplingProfiler:
+    """采样分析器
+
+    后台线程按interval采样所有线程的调用栈，累计为折叠栈格式
+    （每行“线程;函数;函数 次数”），可直接用flamegraph.pl或speedscope生成火焰图。
+    """
+    
+    def __init__(self, interval=0.01, output_path="profile.folded"):
+        self.interval = interval
+        self.output_path = output_path
+        self.logger = logging.getLogger("ai_ops_controller")
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+    
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+    
+    def start(self):
+        if self.running:
+            return False
+        with self._lock:
+            self.stacks = Counter()
+            self.samples = 0
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        self.logger.info(f"Sampling profiler started (interval={self.interval}s)")
+        return True
+    
+    def stop(self):
+        """停止采样并写出折叠栈文件，返回文件路径"""
+        if not self.running:
+            return None
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        with open(self.output_path, 'w') as f:
+            f.write(self.folded())
+        self.logger.info(f"Sampling profiler stopped, {self.samples} samples written to {self.output_path}")
+        return self.output_path
+    
+    def _run(self):
+        own_ident = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, frame in frames.items():
+                    if ident == own_ident:
+                        continue
+                    stack = [f"{fs.name} ({os.path.basename(fs.filename)}:{fs.lineno})"
+                             for fs in traceback.extract_stack(frame)]
+                    self.stacks[";".join([names.get(ident, str(ident))] + stack)] += 1
+                self.samples += 1
+    
+    def folded(self):
+        """返回折叠栈文本"""
+        with self._lock:
+            return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
@@ -0,0 +1,269 @@
+import os
+import json
+import queue
+import atexit
+import logging
+import threading
+import logging.handlers
+from datetime import datetime
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+DEFAULT_LOGGING_CONFIG = {
+    "level": "INFO",
+    "format": "text",
+    "directory": "",
+    "rotation": "size",
+    "max_bytes": 10 * 1024 * 1024,
+    "backup_count": 5,
+    "when": "midnight",
+    "console": True,
+    "root_file": "ai_ops.log",
+    "queue_size": 10000,
+    "sampling": {
+        "enabled": True,
+        "interval": 60,
+        "burst": 10
+    }
+}
+
+def load_logging_config(config_path=None):
+    """读取配置文件中的logging部分（与默认值合并）"""
+    config = json.loads(json.dumps(DEFAULT_LOGGING_CONFIG))
+    if config_path and os.path.exists(config_path):
+        with open(config_path, 'r') as f:
+            loaded = json.load(f).get("logging", {})
+        for key, value in loaded.items():
+            if isinstance(value, dict) and isinstance(config.get(key), dict):
+                config[key].update(value)
+            else:
+                config[key] = value
+    return config
+
+class TextFormatter(logging.Formatter):
+    """文本格式，附带采样丢弃的条数"""
+
+    def format(self, record):
+        text = super().format(record)
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            text += f" ({suppressed} similar messages suppressed)"
+        return text
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出为一行JSON，通过extra传入的字段作为顶层字段"""
+
+    RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName
+        }
+        for key, value in vars(record).items():
+            if key not in self.RESERVED:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class SamplingFilter(logging.Filter):
+    """按调用位置对高频日志采样
+
+    同一位置（logger、文件、行号）每interval秒最多通过burst条，ERROR及以上不采样；
+    丢弃的条数记录在该位置下一个周期第一条日志的suppressed字段中。
+    """
+
+    def __init__(self, interval=60, burst=10):
+        super().__init__()
+        self.interval = interval
+        self.burst = burst
+        self.suppressed = 0
+        self._sites = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.ERROR or self.interval <= 0:
+            return True
+        key = (record.name, record.pathname, record.lineno)
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None or record.created - site[0] >= self.interval:
+                # [周期开始时间, 本周期通过的条数, 本周期丢弃的条数]
+                self._sites[key] = [record.created, 1, 0]
+                if site is not None and site[2]:
+                    record.suppressed = site[2]
+                return True
+            if site[1] < self.burst:
+                site[1] += 1
+                return True
+            site[2] += 1
+            self.suppressed += 1
+            return False
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """队列满时丢弃日志而不是阻塞调用线程"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class RoutingHandler(logging.Handler):
+    """在监听线程中按logger名称把日志写入对应的文件，并写入公共输出（控制台、总日志）"""
+
+    def __init__(self):
+        super().__init__()
+        self.routes = {}
+        self.common = []
+
+    def emit(self, record):
+        handler = self.routes.get(record.name)
+        if handler is not None:
+            handler.handle(record)
+        for handler in self.common:
+            handler.handle(record)
+
+class _LoggingState:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.config = None
+        self.directory = ""
+        self.queue = None
+        self.handler = None
+        self.listener = None
+        self.router = None
+        self.sampler = None
+        self.files = {}
+        self.filenames = {}
+
+_state = _LoggingState()
+
+def _formatter(config):
+    return JsonFormatter() if config["format"] == "json" else TextFormatter(TEXT_FORMAT)
+
+def _file_handler(config, path):
+    """按配置创建滚动日志文件（delay=True，首次写入时才创建文件）"""
+    if config["rotation"] == "time":
+        handler = logging.handlers.TimedRotatingFileHandler(path, when=config["when"],
+                                                            backupCount=config["backup_count"], delay=True)
+    elif config["rotation"] == "size":
+        handler = logging.handlers.RotatingFileHandler(path, maxBytes=config["max_bytes"],
+                                                       backupCount=config["backup_count"], delay=True)
+    else:
+        handler = logging.FileHandler(path, delay=True)
+    handler.setFormatter(_formatter(config))
+    return handler
+
+def _route(name, filename):
+    """把logger的日志路由到filename（同一文件的logger共用一个handler）"""
+    _state.filenames[name] = filename
+    handler = _state.files.get(filename)
+    if handler is None:
+        path = os.path.join(_state.directory, filename) if _state.directory else filename
+        handler = _state.files[filename] = _file_handler(_state.config, path)
+    _state.router.routes[name] = handler
+
+def configure_logging(config_path=None, root_file=None, process_name=None, config=None):
+    """配置进程的日志：所有logger经由一个队列写入，由监听线程负责格式化、滚动和写文件
+
+    可重复调用（如读取配置后），会刷新并替换监听线程和文件，已创建的logger保持不变。
+    root_file为公共日志文件（默认取配置中的root_file），process_name给出时日志写入
+    directory下的同名子目录，避免多个进程滚动同一个文件。
+    """
+    with _state.lock:
+        config = config or load_logging_config(config_path)
+        shutdown_logging()
+
+        _state.config = config
+        _state.directory = config.get("directory") or ""
+        if process_name:
+            _state.directory = os.path.join(_state.directory, process_name)
+        if _state.directory:
+            os.makedirs(_state.directory, exist_ok=True)
+
+        if _state.queue is None:
+            _state.queue = queue.Queue(maxsize=config["queue_size"])
+            _state.handler = DroppingQueueHandler(_state.queue)
+        sampling = config.get("sampling", {})
+        suppressed = 0
+        if _state.sampler is not None:
+            suppressed = _state.sampler.suppressed
+            _state.handler.removeFilter(_state.sampler)
+            _state.sampler = None
+        if sampling.get("enabled", True):
+            _state.sampler = SamplingFilter(interval=sampling.get("interval", 60), burst=sampling.get("burst", 10))
+            _state.sampler.suppressed = suppressed
+            _state.handler.addFilter(_state.sampler)
+
+        _state.router = RoutingHandler()
+        _state.files = {}
+        for name, filename in list(_state.filenames.items()):
+            _route(name, filename)
+            logging.getLogger(name).setLevel(config["level"])
+
+        # 公共输出：控制台和总日志，第三方库的日志经由根logger进入同一个队列
+        root_file = root_file if root_file is not None else config.get("root_file")
+        if config.get("console", True):
+            console = logging.StreamHandler()
+            console.setFormatter(_formatter(config))
+            _state.router.common.append(console)
+        if root_file:
+            path = os.path.join(_state.directory, root_file) if _state.directory else root_file
+            _state.router.common.append(_file_handler(config, path))
+        if _state.router.common:
+            root = logging.getLogger()
+            for handler in list(root.handlers):
+                root.removeHandler(handler)
+            root.addHandler(_state.handler)
+            root.setLevel(config["level"])
+
+        _state.listener = logging.handlers.QueueListener(_state.queue, _state.router)
+        _state.listener.start()
+
+def get_logger(name, filename=None):
+    """返回写入filename的logger；可重复调用，不会重复添加handler
+
+    尚未调用configure_logging时使用默认配置（不输出到控制台和总日志）。
+    """
+    logger = logging.getLogger(name)
+    with _state.lock:
+        if _state.listener is None:
+            configure_logging(config=dict(DEFAULT_LOGGING_CONFIG, console=False, root_file=None))
+        if filename and _state.filenames.get(name) != filename:
+            _route(name, filename)
+        if _state.handler not in logger.handlers:
+            logger.addHandler(_state.handler)
+            logger.setLevel(_state.config["level"])
+            # 由RoutingHandler统一写入公共输出，不再传递给根logger
+            logger.propagate = False
+    return logger
+
+def logging_stats():
+    """队列积压、队列满丢弃和采样丢弃的条数"""
+    with _state.lock:
+        return {
+            "queued": _state.queue.qsize() if _state.queue is not None else 0,
+            "dropped": _state.handler.dropped if _state.handler is not None else 0,
+            "suppressed": _state.sampler.suppressed if _state.sampler is not None else 0
+        }
+
+def shutdown_logging():
+    """停止监听线程（写完队列中剩余的日志）并关闭文件"""
+    with _state.lock:
+        if _state.listener is not None:
+            _state.listener.stop()
+            _state.listener = None
+        if _state.router is not None:
+            for handler in list(_state.files.values()) + _state.router.common:
+                handler.close()
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,288 @@
+import os
+import sys
+import time
+import threading
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from infrastructure.compression import CompressedBlock
+
+# 未带host字段的记录（本机采集）归属的主机名
+DEFAULT_HOST = "localhost"
+
+def to_epoch(value):
+    """把记录中的时间戳（ISO字符串、datetime或秒数）转换为epoch秒"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return datetime.fromisoformat(str(value)).timestamp()
+
+def _chunk_records(chunk):
+    """数据块的记录：压缩块解码，未压缩块直接返回"""
+    return chunk.records() if isinstance(chunk, CompressedBlock) else chunk
+
+class SegmentIndex:
+    """已封存数据块的时间索引
+    
+    按时间排序的时间戳数组加上到原记录的下标映射，并按主机分别建立索引，
+    范围查询在块内二分查找，耗时只与命中的记录数有关。
+    """
+    
+    def __init__(self, records, times):
+        times = np.asarray(times, dtype=float)
+        order = np.argsort(times, kind='stable')
+        self.source = records
+        self.times = times[order]
+        self.order = order
+        self.min_time = float(self.times[0]) if len(times) else None
+        self.max_time = float(self.times[-1]) if len(times) else None
+        
+        hosts = np.array([r.get("host", DEFAULT_HOST) for r in records], dtype=object)[order]
+        self.hosts = {}
+        for host in set(hosts):
+            mask = hosts == host
+            self.hosts[host] = (self.times[mask], order[mask])
+    
+    def with_source(self, source):
+        """数据块被压缩后，复用已建立的索引指向新的数据源"""
+        index = object.__new__(SegmentIndex)
+        index.__dict__.update(self.__dict__)
+        index.source = source
+        return index
+    
+    def range(self, start=None, end=None, host=None):
+        """返回[start, end)内的 (时间戳数组, 记录列表)"""
+        if host is None:
+            times, order = self.times, self.order
+        elif host in self.hosts:
+            times, order = self.hosts[host]
+        else:
+            return np.empty(0), []
+        lo = np.searchsorted(times, start, 'left') if start is not None else 0
+        hi = np.searchsorted(times, end, 'left') if end is not None else len(times)
+        if isinstance(self.source, CompressedBlock):
+            # 只还原命中的行
+            return times[lo:hi], self.source.records(order[lo:hi].tolist()) if hi > lo else []
+        return times[lo:hi], [self.source[i] for i in order[lo:hi]]
+
+class MetricsSnapshot:
+    """指标数据的不可变快照
+
+    由已封存的数据块和尾块组成，读者无需加锁即可访问；
+    DataFrame和特征矩阵在首次使用时构建并缓存在快照上。
+    快照中的记录为只读，调用方不应修改。
+    """
+    
+    def __init__(self, chunks, tail, version, dropped, length, segments=(), tail_times=()):
+        self._chunks = chunks
+        self._tail = tail
+        self._segments = segments
+        self._tail_times = tail_times
+        self.version = version
+        self.dropped = dropped
+        self._length = length
+        self._frame = None
+        self._arrays = {}
+    
+    def __len__(self):
+        return self._length
+    
+    def records(self, last=None):
+        """返回记录列表，last指定时只返回最近的last条"""
+        if last is not None and last <= 0:
+            return []
+        if last is not None and last <= len(self._tail):
+            return list(self._tail[-last:])
+        
+        # 只收集覆盖最近last条记录所需的数据块
+        parts = [self._tail]
+        count = len(self._tail)
+        for chunk in reversed(self._chunks):
+            if last is not None and count >= last:
+                break
+            parts.append(chunk)
+            count += len(chunk)
+        
+        result = []
+        for part in reversed(parts):
+            result.extend(_chunk_records(part))
+        return result[-last:] if last is not None else result
+    
+    def records_since(self, version):
+        """返回版本号version之后追加的记录"""
+        count = self.version - version
+        if count <= 0:
+            return []
+        return self.records(min(count, self._length))
+    
+    def times(self):
+        """所有记录的时间戳（epoch秒），顺序与records()一致"""
+        parts = [segment.times[np.argsort(segment.order)] for segment in self._segments]
+        parts.append(np.asarray(self._tail_times, dtype=float))
+        return np.concatenate(parts)
+    
+    def hosts(self):
+        """窗口内出现过的主机"""
+        hosts = set()
+        for segment in self._segments:
+            hosts.update(segment.hosts)
+        hosts.update(record.get("host", DEFAULT_HOST) for record in self._tail)
+        return sorted(hosts)
+    
+    def latest(self, host, count):
+        """某台主机最近的count条记录，从最新的数据块开始查找"""
+        records = [record for record in self._tail if record.get("host", DEFAULT_HOST) == host]
+        for segment in reversed(self._segments):
+            if len(records) >= count:
+                break
+            _, found = segment.range(host=host)
+            records = found + records
+        return records[-count:]
+    
+    def oldest_time(self):
+        """最早记录的时间（epoch秒），没有数据时返回None"""
+        if self._segments:
+            return self._segments[0].min_time
+        return min(self._tail_times) if self._tail_times else None
+    
+    def range(self, start=None, end=None, host=None):
+        """按时间范围（epoch秒，[start, end)）和主机查询，返回按时间排序的 (时间戳数组, 记录列表)
+        
+        跳过时间范围不相交的数据块，块内二分查找，尾块直接扫描。
+        """
+        time_parts, record_parts = [], []
+        for segment in self._segments:
+            if (start is not None and segment.max_time < start) or (end is not None and segment.min_time >= end):
+                continue
+            times, records = segment.range(start, end, host)
+            if records:
+                time_parts.append(times)
+                record_parts.extend(records)
+        
+        tail_hits = [i for i, t in enumerate(self._tail_times)
+                     if (start is None or t >= start) and (end is None or t < end)
+                     and (host is None or self._tail[i].get("host", DEFAULT_HOST) == host)]
+        if tail_hits:
+            time_parts.append(np.array([self._tail_times[i] for i in tail_hits], dtype=float))
+            record_parts.extend(self._tail[i] for i in tail_hits)
+        
+        if not record_parts:
+            return np.empty(0), []
+        
+        times = np.concatenate(time_parts)
+        # 多主机数据可能乱序到达，跨块合并后保证按时间排序
+        if len(time_parts) > 1 and np.any(np.diff(times) < 0):
+            order = np.argsort(times, kind='stable')
+            return times[order], [record_parts[i] for i in order]
+        return times, record_parts
+    
+    def to_frame(self):
+        """全部记录的DataFrame（缓存）"""
+        if self._frame is None:
+            self._frame = pd.DataFrame(self.records())
+        return self._frame
+    
+    def feature_array(self, features, last=None):
+        """指定特征的二维数组，last指定时只取最近的last条"""
+        if last is not None:
+            records = self.records(last)
+            return np.array([[r.get(f) for f in features] for r in records], dtype=float)
+        
+        key = tuple(features)
+        if key not in self._arrays:
+            # 压缩块直接按列解码，不经过字典记录
+            parts = []
+            for chunk in self._chunks + (self._tail,):
+                if isinstance(chunk, CompressedBlock):
+                    parts.append(chunk.feature_array(features))
+                elif chunk:
+                    parts.append(np.array([[r.get(f) for f in features] for r in chunk], dtype=float))
+            self._arrays[key] = np.vstack(parts) if parts else np.empty((0, len(features)))
+        return self._arrays[key]
+    
+    def compressed_stats(self):
+        """返回 (压缩保存的记录数, 压缩后的字节数)"""
+        blocks = [chunk for chunk in self._chunks if isinstance(chunk, CompressedBlock)]
+        return sum(len(block) for block in blocks), sum(block.nbytes for block in blocks)
+
+class MetricsStore:
+    """单写者的指标存储
+
+    写者追加记录时只复制不超过chunk_size的尾块，然后发布新的快照；
+    读者通过snapshot()获取当前快照引用，读写互不阻塞。
+    """
+    
+    def __init__(self, max_records=None, chunk_size=1024, lock=None, compress=False, on_compress=None):
+        self.max_records = max_records
+        self.chunk_size = chunk_size
+        self.compress = compress
+        self.on_compress = on_compress
+        self._write_lock = lock or threading.Lock()
+        self._snapshot = MetricsSnapshot((), (), 0, 0, 0)
+    
+    @staticmethod
+    def _timestamp(record):
+        try:
+            return to_epoch(record["timestamp"])
+        except (KeyError, TypeError, ValueError):
+            return time.time()
+    
+    def snapshot(self):
+        """获取当前快照（无锁）"""
+        return self._snapshot
+    
+    def __len__(self):
+        return len(self._snapshot)
+    
+    def append(self, record):
+        """追加一条记录并发布新快照"""
+        compressed = None
+        with self._write_lock:
+            current = self._snapshot
+            chunks = current._chunks
+            segments = current._segments
+            tail = current._tail + (dict(record),)
+            tail_times = current._tail_times + (self._timestamp(record),)
+            dropped = current.dropped
+            length = len(current) + 1
+            
+            # 尾块写满后封存，同时建立时间索引
+            if len(tail) >= self.chunk_size:
+                # 上一个封存的块此时压缩：最近一个块保留原始记录（含Top进程等诊断字段）
+                if self.compress and chunks and not isinstance(chunks[-1], CompressedBlock):
+                    compressed = CompressedBlock.encode(chunks[-1], segments[-1].times[np.argsort(segments[-1].order)])
+                    chunks = chunks[:-1] + (compressed,)
+                    segments = segments[:-1] + (segments[-1].with_source(compressed),)
+                chunks = chunks + (tail,)
+                segments = segments + (SegmentIndex(tail, tail_times),)
+                tail = ()
+                tail_times = ()
+            
+            # 按保留条数整块淘汰最旧的数据
+            if self.max_records:
+                while chunks and length - len(chunks[0]) >= self.max_records:
+                    length -= len(chunks[0])
+                    dropped += len(chunks[0])
+                    chunks = chunks[1:]
+                    segments = segments[1:]
+            
+            self._snapshot = MetricsSnapshot(chunks, tail, current.version + 1, dropped, length,
+                                             segments, tail_times)
+            snapshot = self._snapshot
+        
+        # 在锁外回调（如写入段文件），不阻塞其他写入
+        if compressed is not None and self.on_compress is not None:
+            self.on_compress(compressed)
+        return snapshot
+    
+    def extend(self, records):
+        """批量追加记录"""
+        snapshot = self._snapshot
+        for record in records:
+            snapshot = self.append(record)
+        return snapshot
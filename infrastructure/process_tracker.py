@@ -0,0 +1,103 @@
+import sys
+import os
+import time
+import heapq
+import threading
+import psutil
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from infrastructure.logging_setup import get_logger
+
+class ProcessTracker:
+    """进程级Top-N跟踪
+
+    每次采样只遍历一次psutil.process_iter（只取需要的属性），
+    CPU使用率由两次采样之间的cpu_times差值计算，不需要额外等待；
+    结果保存为按CPU和RSS排序的Top-N表，供告警和修复直接使用。
+    """
+    
+    ATTRS = ['pid', 'name', 'create_time', 'cpu_times', 'memory_info']
+    
+    def __init__(self, top_n=5):
+        self.top_n = top_n
+        self.logger = self._setup_logger()
+        self.lock = threading.Lock()
+        self._prev_cpu = {}
+        self._prev_time = None
+        self.num_cpus = psutil.cpu_count() or 1
+        self.top_cpu = []
+        self.top_memory = []
+        self.last_sample = None
+        self.sample_duration = None
+    
+    def _setup_logger(self):
+        return get_logger("process_tracker", "system_metrics.log")
+    
+    def sample(self):
+        """采样一次所有进程，更新Top-N表"""
+        start = time.monotonic()
+        elapsed = start - self._prev_time if self._prev_time is not None else None
+        own_pid = os.getpid()
+        
+        current_cpu = {}
+        rows = []
+        for proc in psutil.process_iter(self.ATTRS):
+            info = proc.info
+            cpu_times = info.get('cpu_times')
+            memory_info = info.get('memory_info')
+            if cpu_times is None or memory_info is None:
+                continue
+            
+            # 以(pid, 创建时间)为键，避免PID复用导致的错误差值
+            key = (info['pid'], info.get('create_time'))
+            total = cpu_times.user + cpu_times.system
+            current_cpu[key] = total
+            
+            cpu_percent = 0.0
+            previous = self._prev_cpu.get(key)
+            if previous is not None and elapsed:
+                cpu_percent = max(0.0, (total - previous) / elapsed * 100)
+            
+            rows.append({
+                "pid": info['pid'],
+                "name": info.get('name'),
+                "cpu_percent": round(cpu_percent, 1),
+                "rss": memory_info.rss,
+                "self": info['pid'] == own_pid
+            })
+        
+        top_cpu = heapq.nlargest(self.top_n, rows, key=lambda row: row["cpu_percent"])
+        top_memory = heapq.nlargest(self.top_n, rows, key=lambda row: row["rss"])
+        
+        with self.lock:
+            self._prev_cpu = current_cpu
+            self._prev_time = start
+            self.top_cpu = top_cpu
+            self.top_memory = top_memory
+            self.last_sample = time.time()
+            self.sample_duration = time.monotonic() - start
+        
+        return top_cpu, top_memory
+    
+    def culprits(self):
+        """当前CPU和内存占用最高的进程（精简字段，用于附加到指标记录）"""
+        with self.lock:
+            cpu = self.top_cpu[0] if self.top_cpu else None
+            memory = self.top_memory[0] if self.top_memory else None
+        return {
+            "cpu": {k: cpu[k] for k in ("pid", "name", "cpu_percent")} if cpu else None,
+            "memory": {k: memory[k] for k in ("pid", "name", "rss")} if memory else None
+        }
+    
+    def get_table(self):
+        """返回Top-N表"""
+        with self.lock:
+            return {
+                "top_cpu": list(self.top_cpu),
+                "top_memory": list(self.top_memory),
+                "num_cpus": self.num_cpus,
+                "last_sample": self.last_sample,
+                "sample_duration": self.sample_duration
+            }
@@ -0,0 +1,77 @@
+import numpy as np
+from datetime import datetime
+
+# 原始数据支持的聚合方式
+AGGREGATIONS = {
+    "mean": lambda values: np.nanmean(values, axis=0),
+    "min": lambda values: np.nanmin(values, axis=0),
+    "max": lambda values: np.nanmax(values, axis=0),
+    "sum": lambda values: np.nansum(values, axis=0),
+    "p95": lambda values: np.nanpercentile(values, 95, axis=0),
+    "last": lambda values: values[-1],
+    "count": lambda values: np.sum(~np.isnan(values), axis=0)
+}
+
+# 可以由降采样层级合并得到的聚合方式（p95取各桶p95的最大值，是上界）
+ROLLUP_AGGREGATIONS = ("mean", "min", "max", "p95", "count")
+
+def parse_time(value):
+    """解析查询参数中的时间：epoch秒或ISO格式字符串，None原样返回"""
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return datetime.fromisoformat(str(value)).timestamp()
+
+def _point(timestamp, features, values):
+    point = {"timestamp": datetime.fromtimestamp(timestamp).isoformat()}
+    for feature, value in zip(features, values):
+        point[feature] = None if np.isnan(value) else float(value)
+    return point
+
+def aggregate_records(times, records, features, start, step, agg="mean"):
+    """把按时间排序的原始记录按step秒分桶聚合，空桶不输出"""
+    if not records:
+        return []
+    func = AGGREGATIONS[agg]
+    values = np.array([[np.nan if r.get(f) is None else r[f] for f in features] for r in records], dtype=float)
+    origin = start if start is not None else times[0] - times[0] % step
+    buckets = np.floor((times - origin) / step).astype(int)
+
+    # 时间已排序，每个桶是连续的一段
+    boundaries = np.flatnonzero(np.diff(buckets)) + 1
+    result = []
+    for lo, hi in zip(np.concatenate(([0], boundaries)), np.concatenate((boundaries, [len(buckets)]))):
+        result.append(_point(origin + buckets[lo] * step, features, func(values[lo:hi])))
+    return result
+
+def rebucket_rollup(points, features, start, step, agg="mean"):
+    """把降采样层级的聚合点合并到更大的step（均值按样本数加权）"""
+    if not points:
+        return []
+    origin = start if start is not None else datetime.fromisoformat(points[0]["timestamp"]).timestamp()
+    groups = {}
+    for point in points:
+        bucket = int((datetime.fromisoformat(point["timestamp"]).timestamp() - origin) // step)
+        groups.setdefault(bucket, []).append(point)
+
+    result = []
+    for bucket in sorted(groups):
+        group = groups[bucket]
+        values = []
+        for feature in features:
+            summaries = [(p["count"], p[feature]) for p in group if feature in p]
+            if not summaries:
+                values.append(np.nan)
+            elif agg == "mean":
+                total = sum(count for count, _ in summaries)
+                values.append(sum(count * s["mean"] for count, s in summaries) / total)
+            elif agg == "min":
+                values.append(min(s["min"] for _, s in summaries))
+            elif agg == "count":
+                values.append(sum(count for count, _ in summaries))
+            else:
+                values.append(max(s[agg] for _, s in summaries))
+        result.append(_point(origin + bucket * step, features, values))
+    return result
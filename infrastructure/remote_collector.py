@@ -0,0 +1,507 @@
+import os
+import sys
+import json
+import time
+import zlib
+import random
+import asyncio
+import threading
+from collections import deque, OrderedDict
+from datetime import datetime
+from urllib.parse import urlsplit
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from infrastructure.logging_setup import get_logger
+
+# 记录字段 -> 指标名；导出器直接提供这些指标时无需配置映射
+DEFAULT_METRIC_MAP = {
+    "cpu_percent": "cpu_percent",
+    "memory_percent": "memory_percent",
+    "disk_usage": "disk_usage"
+}
+
+AGGREGATES = {
+    "sum": sum,
+    "avg": lambda values: sum(values) / len(values),
+    "max": max,
+    "min": min
+}
+
+def _parse_labels(text):
+    """解析 key="value",... 形式的标签（值中的转义按Prometheus文本格式处理）"""
+    labels = {}
+    i, n = 0, len(text)
+    while i < n:
+        eq = text.index('=', i)
+        key = text[i:eq].strip().lstrip(',').strip()
+        i = eq + 2
+        value = []
+        while text[i] != '"':
+            if text[i] == '\\':
+                i += 1
+                value.append('\n' if text[i] == 'n' else text[i])
+            else:
+                value.append(text[i])
+            i += 1
+        labels[key] = ''.join(value)
+        i += 1
+        while i < n and text[i] in ', ':
+            i += 1
+    return labels
+
+def parse_prometheus_text(text, names=None):
+    """解析Prometheus文本格式，返回 {指标名: [(标签, 值), ...]}
+
+    names给出时只解析这些指标（大型导出器的其余行只做一次前缀判断）。
+    """
+    series = {}
+    for line in text.splitlines():
+        if not line or line[0] == '#':
+            continue
+        brace = line.find('{')
+        space = line.find(' ')
+        if brace != -1 and (space == -1 or brace < space):
+            name = line[:brace]
+            if names is not None and name not in names:
+                continue
+            end = line.rindex('}')
+            labels = _parse_labels(line[brace + 1:end])
+            rest = line[end + 1:].split()
+        else:
+            name = line[:space]
+            if names is not None and name not in names:
+                continue
+            labels = {}
+            rest = line[space + 1:].split()
+        try:
+            value = float(rest[0])
+        except (IndexError, ValueError):
+            continue
+        series.setdefault(name, []).append((labels, value))
+    return series
+
+class ScrapeTarget:
+    """一个远程采集目标及其采集状态
+
+    format为prometheus（文本格式导出器）或json（返回扁平或嵌套JSON对象的HTTP接口）。
+    metrics把记录字段映射到指标：字符串为指标名（JSON为点分隔的键路径），
+    或 {"metric", "labels", "aggregate", "rate", "scale", "offset"}，
+    rate为true时按两次采集之间的差值计算每秒速率（计数器重置时本次跳过）。
+    """
+
+    def __init__(self, name, url, format="prometheus", metrics=None, interval=None, timeout=None):
+        self.name = name
+        self.url = url
+        self.format = format
+        self.metrics = {}
+        for field, spec in (metrics or DEFAULT_METRIC_MAP).items():
+            self.metrics[field] = {"metric": spec} if isinstance(spec, str) else dict(spec)
+        self.names = {spec["metric"] for spec in self.metrics.values()}
+        self.interval = interval
+        self.timeout = timeout
+
+        self._counters = {}
+        self.up = None
+        self.scrapes = 0
+        self.failures = 0
+        self.last_error = None
+        self.last_duration = None
+        self.last_success = None
+        self.missing = []
+
+    def _lookup(self, data, path):
+        for key in path.split('.'):
+            if not isinstance(data, dict) or key not in data:
+                return None
+            data = data[key]
+        return data if isinstance(data, (int, float)) and not isinstance(data, bool) else None
+
+    def _rate(self, key, value, now):
+        previous = self._counters.get(key)
+        self._counters[key] = (value, now)
+        if previous is None or now <= previous[1] or value < previous[0]:
+            return None
+        return (value - previous[0]) / (now - previous[1])
+
+    def extract(self, body, now):
+        """从响应体提取记录字段，返回 {字段: 值}（缺失的字段不出现）"""
+        values = {}
+        if self.format == "json":
+            data = json.loads(body)
+            for field, spec in self.metrics.items():
+                value = self._lookup(data, spec["metric"])
+                if value is not None and spec.get("rate"):
+                    value = self._rate((field,), value, now)
+                if value is not None:
+                    values[field] = value * spec.get("scale", 1) + spec.get("offset", 0)
+            return values
+
+        series = parse_prometheus_text(body.decode('utf-8', errors='replace'), self.names)
+        for field, spec in self.metrics.items():
+            wanted = spec.get("labels", {})
+            selected = []
+            for labels, value in series.get(spec["metric"], ()):
+                if any(labels.get(k) != v for k, v in wanted.items()):
+                    continue
+                if spec.get("rate"):
+                    value = self._rate((field, tuple(sorted(labels.items()))), value, now)
+                    if value is None:
+                        continue
+                selected.append(value)
+            if selected:
+                value = AGGREGATES[spec.get("aggregate", "sum")](selected)
+                values[field] = value * spec.get("scale", 1) + spec.get("offset", 0)
+        return values
+
+    def stats(self):
+        return {
+            "url": self.url,
+            "up": self.up,
+            "scrapes": self.scrapes,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "last_duration": self.last_duration,
+            "last_success": self.last_success,
+            "missing": self.missing
+        }
+
+class HttpConnectionPool:
+    """asyncio上的最小HTTP/1.1 GET客户端，按 (协议, 主机, 端口) 复用keep-alive连接
+
+    空闲连接总数不超过max_idle，超出时关闭最久未使用端点的连接；
+    复用的连接已被对端关闭时自动用新连接重试一次。
+    """
+
+    def __init__(self, max_idle=256, user_agent="ai-ops-collector"):
+        self.max_idle = max_idle
+        self.user_agent = user_agent
+        # 端点 -> 空闲连接列表，按最近使用排序（最久未使用的在前）
+        self._idle = OrderedDict()
+        self._idle_count = 0
+        self.opened = 0
+        self.reused = 0
+
+    async def _connect(self, scheme, host, port):
+        reader, writer = await asyncio.open_connection(host, port, ssl=scheme == "https" or None)
+        self.opened += 1
+        return reader, writer
+
+    def _acquire_idle(self, key):
+        idle = self._idle.get(key)
+        conn = None
+        while idle and conn is None:
+            conn = idle.pop()
+            self._idle_count -= 1
+            if conn[0].at_eof() or conn[1].is_closing():
+                conn[1].close()
+                conn = None
+        if idle is not None and not idle:
+            del self._idle[key]
+        return conn
+
+    def _release(self, key, conn):
+        idle = self._idle.get(key)
+        if idle is None:
+            idle = self._idle[key] = []
+        else:
+            self._idle.move_to_end(key)
+        idle.append(conn)
+        self._idle_count += 1
+        while self._idle_count > self.max_idle:
+            oldest_key, oldest = next(iter(self._idle.items()))
+            oldest.pop(0)[1].close()
+            self._idle_count -= 1
+            if not oldest:
+                del self._idle[oldest_key]
+
+    @staticmethod
+    async def _read_response(reader):
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("connection closed by peer")
+        version, status = status_line.split(None, 2)[:2]
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        keep_alive = version == b'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+        if 'content-length' in headers:
+            body = await reader.readexactly(int(headers['content-length']))
+        elif headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    # 跳过trailer
+                    while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+            body = b''.join(chunks)
+        else:
+            body = await reader.read()
+            keep_alive = False
+        return int(status), body, keep_alive
+
+    async def get(self, url):
+        """GET请求，返回 (状态码, 响应体)"""
+        parts = urlsplit(url)
+        scheme = parts.scheme or "http"
+        port = parts.port or (443 if scheme == "https" else 80)
+        key = (scheme, parts.hostname, port)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        request = (f"GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\nUser-Agent: {self.user_agent}\r\n"
+                   f"Accept: text/plain, application/json\r\nConnection: keep-alive\r\n\r\n").encode('latin-1')
+
+        while True:
+            conn = self._acquire_idle(key)
+            reused = conn is not None
+            if reused:
+                self.reused += 1
+            else:
+                conn = await self._connect(*key)
+            try:
+                conn[1].write(request)
+                await conn[1].drain()
+                status, body, keep_alive = await self._read_response(conn[0])
+            except (ConnectionError, asyncio.IncompleteReadError) as e:
+                conn[1].close()
+                if reused:
+                    continue
+                raise ConnectionError(str(e) or type(e).__name__) from e
+            except BaseException:
+                # 超时取消或解析失败：连接状态未知，不再复用
+                conn[1].close()
+                raise
+            if keep_alive:
+                self._release(key, conn)
+            else:
+                conn[1].close()
+            return status, body
+
+    def close(self):
+        for idle in self._idle.values():
+            for _, writer in idle:
+                writer.close()
+        self._idle = OrderedDict()
+        self._idle_count = 0
+
+class RemoteCollector:
+    """基于asyncio的远程指标采集器（Prometheus导出器、JSON指标接口）
+
+    在独立线程的事件循环中为每个目标运行一个协程：按固定频率采集，各目标按名称哈希
+    错开在周期内的起始时间并加随机抖动，避免所有请求同时发出；同时进行的采集数由
+    concurrency限制，连接按端点复用，每个目标有自己的超时。
+    采集到的记录（host为目标名）放入有界缓冲区，由采集任务drain()后与本机指标一起写入，
+    缓冲区满时丢弃最旧的记录。缺少required_fields中任一字段的记录（导出器没有该指标、
+    速率指标的第一次采集）不写入，检测和特征计算只会看到完整的记录。
+    """
+
+    def __init__(self, targets, interval=60, timeout=5, concurrency=200, jitter=0.1, max_idle=256,
+                 max_buffer=100000, required_fields=None):
+        self.targets = {}
+        for target in targets:
+            if not isinstance(target, ScrapeTarget):
+                target = ScrapeTarget(**target)
+            self.targets[target.name] = target
+        self.interval = interval
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.jitter = jitter
+        self.max_idle = max_idle
+        self.required_fields = list(required_fields or DEFAULT_METRIC_MAP)
+        self.logger = self._setup_logger()
+
+        self._buffer = deque(maxlen=max_buffer)
+        self.dropped = 0
+        self.incomplete = 0
+        self.scrapes = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.total_duration = 0.0
+        self.pool = None
+
+        self._loop = None
+        self._main_task = None
+        self._thread = None
+
+    def _setup_logger(self):
+        return get_logger("remote_collector", "system_metrics.log")
+
+    def _offset(self, target, interval):
+        """目标在周期内的固定起始偏移（按名称哈希，重启后保持不变）"""
+        return zlib.crc32(target.name.encode('utf-8')) / 2 ** 32 * interval
+
+    async def _scrape(self, target, semaphore):
+        timeout = target.timeout or self.timeout
+        async with semaphore:
+            start = time.monotonic()
+            target.scrapes += 1
+            self.scrapes += 1
+            try:
+                status, body = await asyncio.wait_for(self.pool.get(target.url), timeout)
+                if status != 200:
+                    raise ConnectionError(f"HTTP {status}")
+                values = target.extract(body, time.time())
+            except Exception as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    self.timeouts += 1
+                    e = f"timeout after {timeout}s"
+                target.failures += 1
+                target.up = 0
+                target.last_error = str(e)
+                self.failures += 1
+                self.logger.warning(f"Scrape of {target.name} ({target.url}) failed: {target.last_error}")
+                return None
+            finally:
+                target.last_duration = time.monotonic() - start
+                self.total_duration += target.last_duration
+
+        target.up = 1
+        target.last_error = None
+        target.last_success = datetime.now().isoformat()
+        target.missing = [field for field in self.required_fields if field not in values]
+        if target.missing:
+            self.incomplete += 1
+            return None
+        record = {"timestamp": target.last_success, "host": target.name}
+        record.update(values)
+        if len(self._buffer) == self._buffer.maxlen:
+            self.dropped += 1
+        self._buffer.append(record)
+        return record
+
+    async def _run_target(self, target, semaphore, start):
+        interval = target.interval or self.interval
+        next_run = start + self._offset(target, interval)
+        while True:
+            delay = next_run - self._loop.time() + random.uniform(0, self.jitter * interval)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await self._scrape(target, semaphore)
+            # 固定频率：跳过已经错过的周期
+            now = self._loop.time()
+            next_run += interval
+            if next_run < now:
+                next_run += (now - next_run) // interval * interval + interval
+
+    async def _main(self):
+        self.pool = HttpConnectionPool(max_idle=self.max_idle)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        start = self._loop.time()
+        tasks = [asyncio.create_task(self._run_target(target, semaphore, start)) for target in self.targets.values()]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.pool.close()
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        self._main_task = self._loop.create_task(self._main())
+        try:
+            self._loop.run_until_complete(self._main_task)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            self.logger.error(f"Remote collector stopped unexpectedly: {str(e)}")
+        finally:
+            self._loop.close()
+
+    def start(self):
+        """在后台线程启动事件循环"""
+        if self._thread is not None or not self.targets:
+            return False
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name="remote-collector", daemon=True)
+        self._thread.start()
+        self.logger.info(f"Remote collection started for {len(self.targets)} targets")
+        return True
+
+    def stop(self, timeout=10):
+        """取消所有采集协程并等待线程退出"""
+        if self._thread is None:
+            return True
+        if self._main_task is not None:
+            self._loop.call_soon_threadsafe(self._main_task.cancel)
+        self._thread.join(timeout)
+        stopped = not self._thread.is_alive()
+        self._thread = None
+        self.logger.info("Remote collection stopped")
+        return stopped
+
+    def scrape_once(self):
+        """立即对所有目标并发采集一次（不经过调度），返回得到的记录；不能在运行中调用"""
+        async def scrape_all():
+            self.pool = HttpConnectionPool(max_idle=self.max_idle)
+            semaphore = asyncio.Semaphore(self.concurrency)
+            try:
+                return await asyncio.gather(*[self._scrape(t, semaphore) for t in self.targets.values()])
+            finally:
+                self.pool.close()
+
+        if self._thread is not None:
+            raise RuntimeError("scrape_once() cannot be used while the collector is running")
+        self._loop = asyncio.new_event_loop()
+        try:
+            records = self._loop.run_until_complete(scrape_all())
+        finally:
+            self._loop.close()
+            self._loop = None
+        return [record for record in records if record is not None]
+
+    def drain(self):
+        """取出缓冲区中的全部记录"""
+        records = []
+        for _ in range(len(self._buffer)):
+            records.append(self._buffer.popleft())
+        return records
+
+    def stats(self, targets=False):
+        stats = {
+            "targets": len(self.targets),
+            "up": sum(1 for t in self.targets.values() if t.up),
+            "down": sum(1 for t in self.targets.values() if t.up == 0),
+            "scrapes": self.scrapes,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "avg_duration": self.total_duration / self.scrapes if self.scrapes else None,
+            "buffered": len(self._buffer),
+            "dropped": self.dropped,
+            "incomplete": self.incomplete,
+            "connections_opened": self.pool.opened if self.pool is not None else 0,
+            "connections_reused": self.pool.reused if self.pool is not None else 0
+        }
+        if targets:
+            stats["by_target"] = {name: target.stats() for name, target in self.targets.items()}
+        return stats
+
+def create_remote_collector(config, interval=60, required_fields=None):
+    """按配置的remote_collection部分创建采集器，未启用或没有目标时返回None
+
+    required_fields为写入前记录必须包含的字段（默认为三项基础指标）。
+    """
+    remote_config = config.get("remote_collection", {})
+    if not remote_config.get("enabled", False) or not remote_config.get("targets"):
+        return None
+    return RemoteCollector(
+        remote_config["targets"],
+        interval=remote_config.get("interval") or interval,
+        timeout=remote_config.get("timeout", 5),
+        concurrency=remote_config.get("concurrency", 200),
+        jitter=remote_config.get("jitter", 0.1),
+        max_idle=remote_config.get("max_idle_connections", 256),
+        max_buffer=remote_config.get("max_buffer", 100000),
+        required_fields=required_fields
+    )
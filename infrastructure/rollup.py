@@ -0,0 +1,261 @@
+import os
+import sys
+import time
+import bisect
+import threading
+import numpy as np
+from datetime import datetime
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from infrastructure.metrics_store import to_epoch
+
+SUMMARY_STATS = ("min", "max", "mean", "p95")
+
+def summarize(values):
+    """计算一个时间桶内的min/max/mean/p95"""
+    array = np.asarray(values, dtype=float)
+    return {
+        "min": float(array.min()),
+        "max": float(array.max()),
+        "mean": float(array.mean()),
+        "p95": float(np.percentile(array, 95))
+    }
+
+class RollupTier:
+    """单个聚合层级
+
+    当前时间桶保留原始值，进入下一个桶时计算min/max/mean/p95并封存，
+    因此每个层级的p95都由原始数据精确计算；封存的桶按retention淘汰。
+    """
+
+    def __init__(self, resolution, retention, features):
+        self.resolution = resolution
+        self.retention = retention
+        self.features = features
+        self.starts = []
+        self.summaries = []
+        self.open_start = None
+        self.open_values = {feature: [] for feature in features}
+        self.late = 0
+
+    @property
+    def name(self):
+        return f"{int(self.resolution)}s"
+
+    def add(self, timestamp, record):
+        start = timestamp - timestamp % self.resolution
+        if self.open_start is None and self.starts and start <= self.starts[-1]:
+            # 从快照恢复的桶已包含该数据（重放原始窗口时）
+            return
+        if self.open_start is not None and start != self.open_start:
+            # 早于当前桶的迟到数据不再回填已封存的桶
+            if start < self.open_start:
+                self.late += 1
+                return
+            self._close()
+        self.open_start = start
+
+        for feature in self.features:
+            value = record.get(feature)
+            if value is not None:
+                self.open_values[feature].append(value)
+
+    def _close(self):
+        point = self._summary(self.open_start, self.open_values)
+        if point is not None:
+            self.starts.append(self.open_start)
+            self.summaries.append(point)
+        self.open_values = {feature: [] for feature in self.features}
+
+        # 淘汰超出保留期的桶
+        cutoff = bisect.bisect_left(self.starts, self.open_start - self.retention)
+        if cutoff:
+            del self.starts[:cutoff]
+            del self.summaries[:cutoff]
+
+    def _summary(self, start, values):
+        count = max((len(v) for v in values.values()), default=0)
+        if count == 0:
+            return None
+        point = {"timestamp": datetime.fromtimestamp(start).isoformat(), "count": count}
+        for feature, feature_values in values.items():
+            if feature_values:
+                point[feature] = summarize(feature_values)
+        return point
+
+    def oldest(self):
+        """最早可查询的时间（epoch秒）"""
+        if self.starts:
+            return self.starts[0]
+        return self.open_start
+
+    def _range(self, start, end):
+        """[start, end)范围内封存的桶的下标范围，以及是否包含当前桶"""
+        lo = bisect.bisect_left(self.starts, start - start % self.resolution) if start is not None else 0
+        hi = bisect.bisect_left(self.starts, end) if end is not None else len(self.starts)
+        include_open = self.open_start is not None and (start is None or self.open_start + self.resolution > start) \
+            and (end is None or self.open_start < end)
+        return lo, hi, include_open
+
+    def points(self, start=None, end=None):
+        """返回[start, end)范围内的聚合点（含尚未封存的当前桶）"""
+        lo, hi, include_open = self._range(start, end)
+        result = self.summaries[lo:hi]
+        if include_open:
+            current = self._summary(self.open_start, self.open_values)
+            if current is not None:
+                result.append(current)
+        return result
+
+    def count(self, start=None, end=None):
+        """points()返回的点数（不构建聚合点）"""
+        lo, hi, include_open = self._range(start, end)
+        return max(hi - lo, 0) + (1 if include_open else 0)
+
+    def export(self):
+        """封存的桶（按列保存，用于状态快照）；当前桶可由原始数据重建，不保存"""
+        data = {
+            "resolution": self.resolution,
+            "starts": list(self.starts),
+            "count": [point["count"] for point in self.summaries]
+        }
+        for feature in self.features:
+            data[feature] = {stat: [point[feature][stat] if feature in point else None for point in self.summaries]
+                             for stat in SUMMARY_STATS}
+        return data
+
+    def restore(self, data):
+        """从export()的结果恢复封存的桶，超出保留期的桶被丢弃；层级已有数据时不恢复"""
+        if self.starts or self.open_start is not None or data.get("resolution") != self.resolution:
+            return 0
+        cutoff = time.time() - self.retention
+        for i, start in enumerate(data["starts"]):
+            if start < cutoff:
+                continue
+            point = {"timestamp": datetime.fromtimestamp(start).isoformat(), "count": data["count"][i]}
+            for feature in self.features:
+                columns = data.get(feature)
+                if columns is not None and columns["mean"][i] is not None:
+                    point[feature] = {stat: columns[stat][i] for stat in SUMMARY_STATS}
+            self.starts.append(start)
+            self.summaries.append(point)
+        return len(self.starts)
+
+    def stats(self):
+        return {
+            "resolution": self.resolution,
+            "retention": self.retention,
+            "buckets": len(self.starts),
+            "late_samples": self.late
+        }
+
+def merge_points(points, max_points):
+    """把相邻的聚合点合并为不超过max_points个点
+
+    均值按样本数加权，min/max取极值；p95无法由各桶精确合并，取各桶p95的最大值（上界）。
+    """
+    if not max_points or len(points) <= max_points:
+        return points
+    size = -(-len(points) // max_points)
+    merged = []
+    for i in range(0, len(points), size):
+        group = points[i:i + size]
+        point = {"timestamp": group[0]["timestamp"], "count": sum(p["count"] for p in group)}
+        features = dict.fromkeys(key for p in group for key in p if key not in ("timestamp", "count"))
+        for feature in features:
+            summaries = [(p["count"], p[feature]) for p in group if feature in p]
+            total = sum(count for count, _ in summaries)
+            point[feature] = {
+                "min": min(s["min"] for _, s in summaries),
+                "max": max(s["max"] for _, s in summaries),
+                "mean": sum(count * s["mean"] for count, s in summaries) / total,
+                "p95": max(s["p95"] for _, s in summaries)
+            }
+        merged.append(point)
+    return merged
+
+class RollupStore:
+    """多级降采样存储
+
+    每条原始记录到达时增量更新所有层级（如1分钟、1小时），
+    查询时根据时间范围和所需分辨率选择能满足要求的最粗层级，
+    长时间范围的查询只需读取少量聚合点。
+    """
+
+    def __init__(self, features, tiers=((60, 7 * 86400), (3600, 30 * 86400))):
+        self.features = list(features)
+        self.tiers = sorted((RollupTier(resolution, retention, self.features) for resolution, retention in tiers),
+                            key=lambda tier: tier.resolution)
+        self.lock = threading.Lock()
+
+    def add(self, record):
+        """按记录的时间戳更新所有层级"""
+        timestamp = to_epoch(record["timestamp"])
+        with self.lock:
+            for tier in self.tiers:
+                tier.add(timestamp, record)
+
+    def choose_tier(self, start=None, end=None, resolution=None, max_points=None):
+        """选择查询使用的层级；需要原始精度时返回None
+
+        resolution为所需的最大点间隔：选择不超过该间隔、且保留期覆盖start的最粗层级；
+        满足分辨率的层级都不能覆盖start时，改用能覆盖整个范围的最细层级；
+        没有层级覆盖start（如刚启动不久）时，各层级的数据同样只从启动时开始，
+        仍使用满足分辨率的最粗层级。
+
+        max_points限制返回的点数：在满足分辨率的层级中选择点数不超过max_points的最细层级
+        （优先覆盖start的层级）；最粗的层级仍超过时返回它，由调用方合并为max_points个点。
+        """
+        if resolution is None and not max_points:
+            return None
+        candidates = [tier for tier in self.tiers if resolution is None or tier.resolution <= resolution]
+        if not candidates:
+            return None
+
+        with self.lock:
+            covering = [tier for tier in self.tiers
+                        if start is None or (tier.oldest() is not None and tier.oldest() <= start)]
+            fitting = [tier for tier in self.tiers if not max_points or tier.count(start, end) <= max_points]
+
+        if max_points:
+            for tier in candidates:
+                if tier in covering and tier in fitting:
+                    return tier
+            for tier in covering:
+                if tier in fitting:
+                    return tier
+            for tier in candidates:
+                if tier in fitting:
+                    return tier
+            return candidates[-1]
+
+        for tier in reversed(candidates):
+            if tier in covering:
+                return tier
+        if covering:
+            return covering[0]
+        return candidates[-1]
+
+    def export(self):
+        """各层级封存的桶，{层级名: 数据}"""
+        with self.lock:
+            return {tier.name: tier.export() for tier in self.tiers}
+
+    def restore(self, data):
+        """从快照恢复各层级封存的桶（在重放原始数据之前调用），返回恢复的桶数"""
+        restored = 0
+        with self.lock:
+            for tier in self.tiers:
+                if tier.name in data:
+                    restored += tier.restore(data[tier.name])
+        return restored
+
+    def query(self, tier, start=None, end=None):
+        with self.lock:
+            return tier.points(start, end)
+
+    def stats(self):
+        with self.lock:
+            return {tier.name: tier.stats() for tier in self.tiers}
@@ -0,0 +1,83 @@
+import os
+import sys
+import json
+import mmap
+import time
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from infrastructure.compression import CompressedBlock
+
+def _write_atomic(path, data):
+    """先写临时文件再替换，进程中途退出不会留下半个快照"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class StateSnapshot:
+    """控制器状态快照
+
+    内存中的指标窗口保存为一个压缩段文件（与段文件格式相同，读取时通过mmap映射），
+    降采样层级封存的桶按列保存为JSON（长期历史不随重启丢失），
+    模型版本、告警冷却、调度进度等其余状态保存为JSON。重启时据此恢复，
+    检测不必等待重新采集数据和训练模型。
+    """
+    
+    SERIES_FILE = "series.seg"
+    STATE_FILE = "state.json"
+    ROLLUP_FILE = "rollups.json"
+    
+    def __init__(self, directory):
+        self.directory = directory
+        self.series_path = os.path.join(directory, self.SERIES_FILE)
+        self.state_path = os.path.join(directory, self.STATE_FILE)
+        self.rollup_path = os.path.join(directory, self.ROLLUP_FILE)
+    
+    def save(self, records, times, state, rollups=None):
+        """写入指标窗口（records及其epoch秒times）、降采样层级和状态字典，返回写入的字节数"""
+        os.makedirs(self.directory, exist_ok=True)
+        size = 0
+        if records:
+            data = CompressedBlock.encode(records, times).to_bytes()
+            _write_atomic(self.series_path, data)
+            size += len(data)
+        elif os.path.exists(self.series_path):
+            os.remove(self.series_path)
+        
+        if rollups is not None:
+            data = json.dumps(rollups).encode("utf-8")
+            _write_atomic(self.rollup_path, data)
+            size += len(data)
+        
+        state = dict(state, saved_at=time.time(), series_count=len(records))
+        data = json.dumps(state, ensure_ascii=False, default=str).encode("utf-8")
+        _write_atomic(self.state_path, data)
+        return size + len(data)
+    
+    def exists(self):
+        return os.path.exists(self.state_path)
+    
+    def load(self):
+        """读取快照，返回 (记录列表, 状态字典)；没有快照时返回 ([], None)"""
+        if not self.exists():
+            return [], None
+        with open(self.state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        
+        records = []
+        if state.get("series_count") and os.path.exists(self.series_path):
+            with open(self.series_path, 'rb') as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    records = CompressedBlock.from_bytes(mapped).records()
+        return records, state
+    
+    def load_rollups(self):
+        """读取降采样层级（RollupStore.export()的结果），没有时返回None"""
+        if not os.path.exists(self.rollup_path):
+            return None
+        with open(self.rollup_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
@@ -2,23 +2,17 @@ import os
 import sys
 import argparse
 import json
-import logging
 import signal
 import time
 
 from controller.main_controller import AIOperationsController
+from controller.sharding import ShardCoordinator, load_sharding_config, run_shard_worker
+from infrastructure.logging_setup import configure_logging, get_logger
 
-def setup_logging():
-    """设置日志"""
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler("ai_ops.log"),
-            logging.StreamHandler()
-        ]
-    )
-    return logging.getLogger("main")
+def setup_logging(config_path=None):
+    """设置日志（队列异步写入、滚动、格式和采样由配置文件的logging部分决定）"""
+    configure_logging(config_path)
+    return get_logger("main")
 
 def signal_handler(sig, frame):
     """处理信号"""
@@ -32,22 +26,38 @@ def parse_arguments():
     parser = argparse.ArgumentParser(description='AI智能运维系统')
     parser.add_argument('--config', type=str, help='配置文件路径')
     parser.add_argument('--daemon', action='store_true', help='作为守护进程运行')
+    parser.add_argument('--shards', type=int, default=None, help='分片模式：在本机启动N个分片进程并作为协调器运行')
+    parser.add_argument('--shard-worker', type=int, default=None, help='作为编号为ID的分片工作进程运行（供远程协调器连接）')
+    parser.add_argument('--listen', type=str, default='127.0.0.1:6100', help='分片工作进程的监听地址 host:port')
     return parser.parse_args()
 
 if __name__ == "__main__":
+    # 解析参数
+    args = parse_arguments()
+    
     # 设置日志
-    logger = setup_logging()
+    logger = setup_logging(args.config)
     logger.info("Starting AI Operations System")
     
-    # 解析参数
-    args = parse_arguments()
+    # 分片工作进程：阻塞运行直到协调器发送stop
+    if args.shard_worker is not None:
+        host, port = args.listen.rsplit(':', 1)
+        authkey = load_sharding_config(args.config)["authkey"].encode("utf-8")
+        logger.info(f"Starting shard worker {args.shard_worker} on {args.listen}")
+        run_shard_worker(args.shard_worker, (host, int(port)), config_path=args.config, authkey=authkey)
+        sys.exit(0)
     
     # 注册信号处理
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
     
-    # 创建控制器
-    controller = AIOperationsController(config_path=args.config)
+    # 创建控制器（分片模式下为协调器）
+    if args.shards:
+        controller = ShardCoordinator(config_path=args.config, workers=args.shards)
+    elif load_sharding_config(args.config).get("enabled", False):
+        controller = ShardCoordinator(config_path=args.config)
+    else:
+        controller = AIOperationsController(config_path=args.config)
     
     try:
         # 启动系统
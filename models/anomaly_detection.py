@@ -1,39 +1,52 @@
+import sys
 import os
 import pandas as pd
 import numpy as np
 from sklearn.ensemble import IsolationForest
 import joblib
-import logging
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from infrastructure.logging_setup import get_logger
 
 class AnomalyDetector:
-    def __init__(self, model_path=None):
+    def __init__(self, model_path=None, cpu_budget=None, contamination=0.05, n_estimators=100, features=None):
         self.model = None
+        self.features = features or ['cpu_percent', 'memory_percent', 'disk_usage']
         self.model_path = model_path
+        self.cpu_budget = cpu_budget
+        self.contamination = contamination
+        self.n_estimators = n_estimators
         self.logger = self._setup_logger()
         
     def _setup_logger(self):
-        logger = logging.getLogger("anomaly_detector")
-        logger.setLevel(logging.INFO)
-        handler = logging.FileHandler("anomaly_detection.log")
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        handler.setFormatter(formatter)
-        logger.addHandler(handler)
-        return logger
+        return get_logger("anomaly_detector", "anomaly_detection.log")
     
-    def train(self, data_path, save_model=True):
-        """训练异常检测模型"""
+    def train(self, data_path, save_model=True, n_jobs=None):
+        """训练异常检测模型（data_path可以是CSV路径或DataFrame）"""
         try:
             # 加载数据
-            df = pd.read_csv(data_path)
+            df = data_path if isinstance(data_path, pd.DataFrame) else pd.read_csv(data_path)
+            
+            # 选择特征（可包含FeatureStore的派生特征列）
+            X = df[self.features].values
+            
+            # 按CPU预算确定并行度
+            if self.cpu_budget is not None and n_jobs is None:
+                n_jobs = self.cpu_budget.n_jobs()
             
-            # 选择特征
-            features = ['cpu_percent', 'memory_percent', 'disk_usage']
-            X = df[features].values
+            # 训练模型（有CPU预算时在调低了优先级的专用训练线程中拟合）
+            self.logger.info(f"Training anomaly detection model (n_jobs={n_jobs})...")
+            model = IsolationForest(contamination=self.contamination, n_estimators=self.n_estimators,
+                                    random_state=42, n_jobs=n_jobs)
+            if self.cpu_budget is not None:
+                self.cpu_budget.run(model.fit, X)
+            else:
+                model.fit(X)
             
-            # 训练模型
-            self.logger.info("Training anomaly detection model...")
-            self.model = IsolationForest(contamination=0.05, random_state=42)
-            self.model.fit(X)
+            # 训练完成后再替换，检测线程始终看到完整的模型
+            self.model = model
             
             if save_model and self.model_path:
                 joblib.dump(self.model, self.model_path)
@@ -0,0 +1,183 @@
+import os
+import sys
+import math
+import bisect
+import threading
+import numpy as np
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from infrastructure.logging_setup import get_logger
+
+class DriftMonitor:
+    """概念漂移监控
+
+    以训练数据为参考分布，为每个特征维护固定分箱的衰减直方图（常量内存），
+    通过PSI衡量当前分布与参考分布的偏离；同时以EWMA跟踪预测残差，
+    只有当漂移分数超过阈值时才建议重新训练模型。
+    """
+
+    def __init__(self, features=None, bins=10, decay=0.995, psi_threshold=0.2,
+                 residual_threshold=2.0, min_samples=30, name="model"):
+        self.features = features or ['cpu_percent', 'memory_percent', 'disk_usage']
+        self.bins = bins
+        self.decay = decay
+        self.psi_threshold = psi_threshold
+        self.residual_threshold = residual_threshold
+        self.min_samples = min_samples
+        self.name = name
+        self.logger = self._setup_logger()
+        self._lock = threading.Lock()
+
+        # 参考分布（训练时确定）
+        self.edges = None
+        self.reference = None
+
+        # 当前分布（衰减计数）
+        self.current = None
+        self.current_weight = 0.0
+        self.samples = 0
+
+        # 残差统计
+        self.residual_baseline = None
+        self.residual_baseline_count = 0
+        self.residual_ewma = None
+
+    def _setup_logger(self):
+        return get_logger("drift_monitor", "anomaly_detection.log")
+
+    def has_reference(self):
+        """是否已建立参考分布"""
+        return self.reference is not None
+
+    def set_reference(self, data):
+        """以训练数据建立参考分布，并重置当前统计"""
+        data = np.asarray(data, dtype=float)
+        if data.ndim != 2 or data.shape[1] != len(self.features) or len(data) == 0:
+            self.logger.error(f"[{self.name}] Invalid reference data shape: {data.shape}")
+            return False
+
+        all_edges = []
+        reference = []
+        quantiles = np.linspace(0, 1, self.bins + 1)[1:-1]
+        for i in range(len(self.features)):
+            column = data[:, i]
+            # 以分位数作为分箱边界，保证参考分布各箱大致等频
+            edges = np.unique(np.quantile(column, quantiles)).tolist()
+            counts = np.bincount(np.searchsorted(edges, column, side='right'),
+                                 minlength=len(edges) + 1)
+            all_edges.append(edges)
+            reference.append(self._normalize(counts.astype(float).tolist()))
+
+        with self._lock:
+            self.edges = all_edges
+            self.reference = reference
+            self.current = [[0.0] * (len(edges) + 1) for edges in all_edges]
+            self.current_weight = 0.0
+            self.samples = 0
+            self.residual_baseline = None
+            self.residual_baseline_count = 0
+            self.residual_ewma = None
+        self.logger.info(f"[{self.name}] Reference distribution set from {len(data)} samples")
+        return True
+
+    @staticmethod
+    def _normalize(counts, epsilon=1e-4):
+        total = float(sum(counts))
+        if total <= 0:
+            return [1.0 / len(counts)] * len(counts)
+        return [max(c / total, epsilon) for c in counts]
+
+    def update(self, sample):
+        """加入一个新样本（字典或按特征顺序的序列）"""
+        if self.reference is None:
+            return
+
+        if isinstance(sample, dict):
+            values = [sample.get(f) for f in self.features]
+        else:
+            values = list(sample)
+
+        with self._lock:
+            for i, value in enumerate(values):
+                if not isinstance(value, (int, float)):
+                    continue
+                counts = self.current[i]
+                for b in range(len(counts)):
+                    counts[b] *= self.decay
+                counts[bisect.bisect_right(self.edges[i], value)] += 1.0
+
+            self.current_weight = self.current_weight * self.decay + 1.0
+            self.samples += 1
+
+    def update_residual(self, actual, predicted):
+        """记录一次预测残差（平均绝对误差）"""
+        actual = np.asarray(actual, dtype=float).ravel()
+        predicted = np.asarray(predicted, dtype=float).ravel()
+        if actual.shape != predicted.shape or actual.size == 0:
+            return
+
+        error = float(np.mean(np.abs(actual - predicted)))
+
+        # 前min_samples个残差作为基线，之后以EWMA跟踪
+        if self.residual_baseline_count < self.min_samples:
+            self.residual_baseline_count += 1
+            if self.residual_baseline is None:
+                self.residual_baseline = error
+            else:
+                self.residual_baseline += (error - self.residual_baseline) / self.residual_baseline_count
+            self.residual_ewma = self.residual_baseline
+        else:
+            alpha = 1.0 - self.decay
+            self.residual_ewma = (1 - alpha) * self.residual_ewma + alpha * error
+
+    def psi_scores(self):
+        """计算每个特征的PSI"""
+        if self.reference is None or self.samples == 0:
+            return {}
+
+        with self._lock:
+            reference = self.reference
+            current = [list(counts) for counts in self.current]
+
+        scores = {}
+        for i, feature in enumerate(self.features):
+            cur = self._normalize(current[i])
+            scores[feature] = sum((c - r) * math.log(c / r) for c, r in zip(cur, reference[i]))
+        return scores
+
+    def residual_ratio(self):
+        """当前残差相对基线的比值"""
+        if (self.residual_ewma is None or not self.residual_baseline or
+                self.residual_baseline_count < self.min_samples):
+            return None
+        return self.residual_ewma / self.residual_baseline
+
+    def drift_scores(self):
+        """返回漂移分数"""
+        psi = self.psi_scores()
+        return {
+            "psi": psi,
+            "max_psi": max(psi.values()) if psi else 0.0,
+            "residual_ratio": self.residual_ratio(),
+            "samples": self.samples,
+            "has_reference": self.has_reference()
+        }
+
+    def should_retrain(self):
+        """判断是否需要重新训练"""
+        if self.reference is None or self.samples < self.min_samples:
+            return False
+
+        scores = self.drift_scores()
+        if scores["max_psi"] > self.psi_threshold:
+            self.logger.warning(f"[{self.name}] Feature drift detected: {scores['psi']}")
+            return True
+
+        ratio = scores["residual_ratio"]
+        if ratio is not None and ratio > self.residual_threshold:
+            self.logger.warning(f"[{self.name}] Residual drift detected: ratio {ratio:.2f}")
+            return True
+
+        return False
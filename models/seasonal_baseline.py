@@ -0,0 +1,139 @@
+import math
+import threading
+import numpy as np
+from datetime import datetime
+
+# 季节周期对应的时间槽数量
+SEASONALITY_SLOTS = {
+    "hour_of_week": 168,
+    "hour_of_day": 24
+}
+
+class SeasonalBaseline:
+    """按季节时间槽维护的EWMA基线（常量内存）
+
+    每台主机、每个指标在每个时间槽（默认一周中的小时）维护EWMA均值和方差，
+    另维护一组不分时间槽的全局统计，时间槽样本不足时退回全局统计。
+    更新时先把偏离超过z_threshold的值截断到边界，异常值不会被基线吸收，
+    持续的水平变化仍会逐步被跟上。
+
+    用作异常检测的第一阶段：只有偏离基线的样本才交给IsolationForest；
+    同时提供按时间槽的动态阈值（均值 + k倍标准差）。
+    """
+
+    def __init__(self, features=None, seasonality="hour_of_week", alpha=0.01, z_threshold=2.5, min_samples=30,
+                 min_std=0.5):
+        self.features = features or ['cpu_percent', 'memory_percent', 'disk_usage']
+        self.seasonality = seasonality
+        self.slots = SEASONALITY_SLOTS[seasonality]
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.min_samples = min_samples
+        # 标准差下限：几乎不变的指标（如磁盘使用率）的微小波动不算偏离
+        self.min_std = min_std
+        self._lock = threading.Lock()
+
+        # 主机 -> (均值, 方差, 样本数)，形状为 (时间槽数 + 1, 特征数)，最后一行是全局统计
+        self._stats = {}
+
+        self.scored = 0
+        self.suspicious = 0
+
+    def _slot(self, timestamp):
+        if isinstance(timestamp, (int, float)):
+            moment = datetime.fromtimestamp(timestamp)
+        elif isinstance(timestamp, datetime):
+            moment = timestamp
+        else:
+            moment = datetime.fromisoformat(str(timestamp))
+        if self.slots == 24:
+            return moment.hour
+        return moment.weekday() * 24 + moment.hour
+
+    def _host_stats(self, host):
+        stats = self._stats.get(host)
+        if stats is None:
+            shape = (self.slots + 1, len(self.features))
+            stats = (np.zeros(shape), np.zeros(shape), np.zeros(shape, dtype=np.int64))
+            self._stats[host] = stats
+        return stats
+
+    def _values(self, record):
+        return np.array([np.nan if record.get(f) is None else record[f] for f in self.features], dtype=float)
+
+    def _expected(self, record):
+        """返回记录所在时间槽的 (均值, 标准差)，样本不足的特征为NaN"""
+        stats = self._stats.get(record.get("host"))
+        if stats is None:
+            return None, None
+        mean, var, count = stats
+        slot = self._slot(record["timestamp"])
+        use_slot = count[slot] >= self.min_samples
+        use_global = ~use_slot & (count[-1] >= self.min_samples)
+        expected = np.where(use_slot, mean[slot], np.where(use_global, mean[-1], np.nan))
+        variance = np.where(use_slot, var[slot], np.where(use_global, var[-1], np.nan))
+        return expected, np.maximum(np.sqrt(variance), self.min_std)
+
+    def update(self, record):
+        """用一条记录更新所在时间槽和全局统计"""
+        values = self._values(record)
+        valid = ~np.isnan(values)
+        if not valid.any():
+            return
+        slot = self._slot(record["timestamp"])
+        with self._lock:
+            mean, var, count = self._host_stats(record.get("host"))
+            for row in (slot, self.slots):
+                # 样本不足时用1/n作为权重，初始均值即为算术平均
+                n = count[row] + valid
+                weight = np.where(valid, np.maximum(self.alpha, 1.0 / np.maximum(n, 1)), 0.0)
+                warm = count[row] >= self.min_samples
+                bound = self.z_threshold * np.maximum(np.sqrt(var[row]), self.min_std)
+                x = np.where(warm, np.clip(values, mean[row] - bound, mean[row] + bound), values)
+                x = np.where(valid, x, mean[row])
+
+                diff = x - mean[row]
+                increment = weight * diff
+                mean[row] += increment
+                var[row] = (1 - weight) * (var[row] + diff * increment)
+                count[row] = n
+
+    def score(self, record):
+        """返回各特征偏离基线的z分数的最大值，基线尚未建立时返回None"""
+        with self._lock:
+            expected, std = self._expected(record)
+        if expected is None:
+            return None
+        z = np.abs(self._values(record) - expected) / std
+        z = z[~np.isnan(z)]
+        if len(z) < len(self.features):
+            return None
+        return float(z.max())
+
+    def is_suspicious(self, record):
+        """是否需要交给第二阶段模型：偏离基线或基线尚未建立"""
+        z = self.score(record)
+        suspicious = z is None or z > self.z_threshold
+        with self._lock:
+            self.scored += 1
+            self.suspicious += suspicious
+        return suspicious
+
+    def threshold(self, feature, record, sigma=4.0):
+        """记录所在时间槽的动态阈值（均值 + sigma倍标准差），基线尚未建立时返回None"""
+        index = self.features.index(feature)
+        with self._lock:
+            expected, std = self._expected(record)
+        if expected is None or math.isnan(expected[index]):
+            return None
+        return float(expected[index] + sigma * std[index])
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hosts": len(self._stats),
+                "seasonality": self.seasonality,
+                "scored": self.scored,
+                "suspicious": self.suspicious,
+                "filtered_ratio": (self.scored - self.suspicious) / self.scored if self.scored else None
+            }
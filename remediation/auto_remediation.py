@@ -1,44 +1,174 @@
 import subprocess
-import logging
 import os
+import sys
 import time
+import signal
+import tempfile
+import psutil
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from remediation.executor import RemediationExecutor
+from remediation.guard import RemediationGuard
+from infrastructure.logging_setup import get_logger
 
 class RemediationEngine:
-    def __init__(self):
+    def __init__(self, config=None):
         self.logger = self._setup_logger()
+        self.config = config or {}
+        self.is_linux = sys.platform.startswith("linux")
         self.remediation_actions = {
             "high_cpu": self.handle_high_cpu,
             "memory_leak": self.handle_memory_leak,
             "disk_full": self.handle_disk_full,
             "service_down": self.handle_service_down
         }
-        
+        self.executor = RemediationExecutor(
+            max_concurrency=self.config.get("max_concurrency", 2),
+            max_pending=self.config.get("max_pending", 50),
+            default_timeout=self.config.get("action_timeout", 60)
+        )
+        self.guard = RemediationGuard(
+            min_interval_seconds=self.config.get("min_interval_seconds", 300),
+            max_per_hour=self.config.get("max_per_hour", 6),
+            failure_threshold=self.config.get("failure_threshold", 3),
+            breaker_reset_seconds=self.config.get("breaker_reset_seconds", 1800)
+        )
+    
     def _setup_logger(self):
-        logger = logging.getLogger("remediation_engine")
-        logger.setLevel(logging.INFO)
-        handler = logging.FileHandler("remediation.log")
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        handler.setFormatter(formatter)
-        logger.addHandler(handler)
-        return logger
-    
-    def execute_command(self, command):
-        """执行系统命令"""
+        return get_logger("remediation_engine", "remediation.log")
+    
+    def execute_command(self, command, timeout=None):
+        """执行系统命令（command为列表时不经过shell）"""
         try:
             self.logger.info(f"Executing command: {command}")
-            result = subprocess.run(command, shell=True, check=True, 
+            result = subprocess.run(command, shell=isinstance(command, str), check=True,
                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                                   text=True)
+                                   text=True, timeout=timeout)
             self.logger.info(f"Command output: {result.stdout}")
             return True, result.stdout
         except subprocess.CalledProcessError as e:
             self.logger.error(f"Command failed: {e.stderr}")
             return False, e.stderr
+        except subprocess.TimeoutExpired:
+            self.logger.error(f"Command timed out after {timeout}s: {command}")
+            return False, ""
+    
+    def _protected_pids(self):
+        """不允许处理的进程：init、本进程及其父进程"""
+        pids = {0, 1, os.getpid(), os.getppid()}
+        return pids
     
-    def handle_high_cpu(self, process_name=None):
+    def _is_protected(self, proc):
+        protected_names = self.config.get("protected_processes", ["systemd", "init", "sshd", "kthreadd"])
+        try:
+            return proc.pid in self._protected_pids() or proc.name() in protected_names
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return True
+    
+    def _find_processes(self, process_name=None, pid=None):
+        """按名称或PID查找进程"""
+        if pid is not None:
+            try:
+                proc = psutil.Process(pid)
+                # 同时给出名称时校验，避免PID被复用后误伤其他进程
+                if process_name and proc.name() != process_name:
+                    self.logger.warning(f"Process {pid} is no longer {process_name}, skipping")
+                    return []
+                return [proc]
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                return []
+        return [p for p in psutil.process_iter(['name']) if p.info['name'] == process_name]
+    
+    def top_processes(self, sort_by="cpu", limit=5, context=None):
+        """在进程内获取CPU或内存占用最高的进程（不创建shell）"""
+        procs = list(psutil.process_iter(['pid', 'name', 'memory_info']))
+        
+        if sort_by == "cpu":
+            # cpu_percent需要两次采样
+            for proc in procs:
+                try:
+                    proc.cpu_percent(None)
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    pass
+            if context is not None:
+                context.sleep(0.5)
+            else:
+                time.sleep(0.5)
+        
+        rows = []
+        for proc in procs:
+            try:
+                rss = proc.info['memory_info'].rss if proc.info['memory_info'] else 0
+                cpu = proc.cpu_percent(None) if sort_by == "cpu" else 0.0
+                rows.append({"pid": proc.pid, "name": proc.info['name'], "cpu_percent": cpu, "rss": rss})
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        
+        key = "cpu_percent" if sort_by == "cpu" else "rss"
+        rows.sort(key=lambda row: row[key], reverse=True)
+        return rows[:limit]
+    
+    def _renice(self, procs, niceness, context=None):
+        success = bool(procs)
+        for proc in procs:
+            if context is not None:
+                context.check()
+            if self._is_protected(proc):
+                self.logger.warning(f"Skipping protected process {proc.pid}")
+                success = False
+                continue
+            try:
+                proc.nice(niceness)
+                self.logger.info(f"Reniced process {proc.pid} to {niceness}")
+            except (psutil.NoSuchProcess, psutil.AccessDenied) as e:
+                self.logger.error(f"Failed to renice process {proc.pid}: {str(e)}")
+                success = False
+        return success
+    
+    def _terminate(self, procs, context=None, grace_seconds=5):
+        """先SIGTERM，超过宽限期仍存活的进程再SIGKILL"""
+        targets = []
+        for proc in procs:
+            if self._is_protected(proc):
+                self.logger.warning(f"Skipping protected process {proc.pid}")
+                continue
+            try:
+                proc.send_signal(signal.SIGTERM)
+                targets.append(proc)
+            except (psutil.NoSuchProcess, psutil.AccessDenied) as e:
+                self.logger.error(f"Failed to terminate process {proc.pid}: {str(e)}")
+        
+        if not targets:
+            return False
+        
+        if context is not None and context.remaining() is not None:
+            grace_seconds = min(grace_seconds, context.remaining())
+        _, alive = psutil.wait_procs(targets, timeout=grace_seconds)
+        for proc in alive:
+            try:
+                proc.kill()
+            except psutil.NoSuchProcess:
+                pass
+        self.logger.info(f"Terminated processes: {[p.pid for p in targets]}")
+        return True
+    
+    def handle_high_cpu(self, process_name=None, pid=None, context=None):
         """处理CPU使用率过高的问题"""
         self.logger.info("Handling high CPU usage")
         
+        if self.is_linux:
+            if process_name or pid is not None:
+                procs = self._find_processes(process_name, pid)
+                if self.config.get("cpu_action", "renice") == "terminate":
+                    return self._terminate(procs, context)
+                return self._renice(procs, self.config.get("renice_value", 19), context)
+            
+            top = self.top_processes("cpu", context=context)
+            self.logger.info(f"Top CPU consuming processes: {top}")
+            return True
+        
         if process_name:
             # 尝试终止特定进程
             success, output = self.execute_command(f"taskkill /F /IM {process_name}")
@@ -53,10 +183,19 @@ class RemediationEngine:
         
         return success
     
-    def handle_memory_leak(self, process_name=None):
+    def handle_memory_leak(self, process_name=None, pid=None, context=None):
         """处理内存泄漏问题"""
         self.logger.info("Handling memory leak")
         
+        if self.is_linux:
+            if process_name or pid is not None:
+                # Linux下终止进程，由systemd等进程管理器负责重启
+                return self._terminate(self._find_processes(process_name, pid), context)
+            
+            top = self.top_processes("memory", context=context)
+            self.logger.info(f"Top memory consuming processes: {top}")
+            return True
+        
         if process_name:
             # 尝试重启特定进程
             success, output = self.execute_command(f"taskkill /F /IM {process_name} && start {process_name}")
@@ -71,8 +210,49 @@ class RemediationEngine:
         
         return success
     
-    def handle_disk_full(self, path="C:\\"):
+    def _clean_temp_dir(self, temp_path, max_age_seconds, context=None):
+        """删除临时目录中超过max_age_seconds未修改的文件，返回释放的字节数"""
+        freed = 0
+        cutoff = time.time() - max_age_seconds
+        stack = [temp_path]
+        while stack:
+            if context is not None:
+                context.check()
+            current = stack.pop()
+            try:
+                with os.scandir(current) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append(entry.path)
+                            elif entry.is_file(follow_symlinks=False):
+                                stat = entry.stat(follow_symlinks=False)
+                                if stat.st_mtime < cutoff:
+                                    os.remove(entry.path)
+                                    freed += stat.st_size
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+        return freed
+    
+    def handle_disk_full(self, path=None, context=None):
         """处理磁盘空间不足问题"""
+        if self.is_linux:
+            path = path or "/"
+            self.logger.info(f"Handling disk full issue for path: {path}")
+            
+            max_age = self.config.get("temp_max_age_hours", 24) * 3600
+            temp_paths = {tempfile.gettempdir(), "/tmp", "/var/tmp"}
+            freed = 0
+            for temp_path in sorted(temp_paths):
+                if os.path.isdir(temp_path):
+                    freed += self._clean_temp_dir(temp_path, max_age, context)
+            
+            self.logger.info(f"Freed {freed} bytes of temporary files, disk usage now {psutil.disk_usage(path).percent}%")
+            return True
+        
+        path = path or "C:\\"
         self.logger.info(f"Handling disk full issue for path: {path}")
         
         # 清理临时文件
@@ -95,17 +275,33 @@ class RemediationEngine:
         
         return success
     
-    def handle_service_down(self, service_name):
+    def handle_service_down(self, service_name, context=None):
         """处理服务宕机问题"""
         self.logger.info(f"Handling service down issue for service: {service_name}")
+        timeout = context.remaining() if context is not None else None
+        
+        if self.is_linux:
+            # systemctl以参数列表调用，不经过shell
+            success, output = self.execute_command(["systemctl", "is-active", service_name], timeout=timeout)
+            if output.strip() == "active":
+                self.logger.info(f"Service {service_name} is already running")
+                return True
+            
+            self.logger.info(f"Service {service_name} is not running, attempting to restart")
+            success, output = self.execute_command(["systemctl", "restart", service_name], timeout=timeout)
+            if success:
+                self.logger.info(f"Successfully restarted service: {service_name}")
+            else:
+                self.logger.error(f"Failed to restart service: {service_name}")
+            return success
         
         # 检查服务状态
-        success, output = self.execute_command(f"sc query {service_name}")
+        success, output = self.execute_command(f"sc query {service_name}", timeout=timeout)
         
         if "RUNNING" not in output:
             # 尝试启动服务
             self.logger.info(f"Service {service_name} is not running, attempting to start")
-            success, output = self.execute_command(f"sc start {service_name}")
+            success, output = self.execute_command(f"sc start {service_name}", timeout=timeout)
             if success:
                 self.logger.info(f"Successfully started service: {service_name}")
             else:
@@ -116,11 +312,84 @@ class RemediationEngine:
         
         return success
     
+    @staticmethod
+    def _action_key(issue_type, kwargs):
+        """修复操作的去重键：(问题类型, 目标)"""
+        for name in ("pid", "process_name", "service_name", "path"):
+            if kwargs.get(name) is not None:
+                return (issue_type, f"{name}={kwargs[name]}")
+        return (issue_type, "system")
+    
     def remediate(self, issue_type, **kwargs):
-        """执行修复操作"""
-        if issue_type in self.remediation_actions:
-            self.logger.info(f"Initiating remediation for issue: {issue_type}")
-            return self.remediation_actions[issue_type](**kwargs)
-        else:
+        """同步执行修复操作（经过去重、限流和熔断检查）"""
+        if issue_type not in self.remediation_actions:
+            self.logger.error(f"Unknown issue type: {issue_type}")
+            return False
+        
+        key = self._action_key(issue_type, kwargs)
+        with self.guard.lock:
+            status, task = self.guard.check(key)
+            if status != "executed":
+                self.logger.info(f"Remediation for {key} skipped: {status}")
+                return task.result() if task is not None else False
+            self.guard.start(key)
+        
+        self.logger.info(f"Initiating remediation for issue: {issue_type}")
+        success = False
+        try:
+            success = bool(self.remediation_actions[issue_type](**kwargs))
+            return success
+        finally:
+            self.guard.finish(key, success)
+    
+    def remediate_async(self, issue_type, timeout=None, **kwargs):
+        """异步执行修复操作，立即返回RemediationTask
+
+        执行中的重复请求返回同一个任务；被限流、熔断、未知类型或队列已满时返回None。
+        """
+        if issue_type not in self.remediation_actions:
             self.logger.error(f"Unknown issue type: {issue_type}")
-            return False
\ No newline at end of file
+            return None
+        
+        key = self._action_key(issue_type, kwargs)
+        with self.guard.lock:
+            status, task = self.guard.check(key)
+            if status == "coalesced":
+                self.logger.info(f"Remediation for {key} already in progress, coalesced")
+                return task
+            if status != "executed":
+                self.logger.info(f"Remediation for {key} skipped: {status}")
+                return None
+            
+            self.logger.info(f"Scheduling remediation for issue: {issue_type}")
+            task = self.executor.submit(issue_type, self.remediation_actions[issue_type], timeout=timeout, **kwargs)
+            if task is None:
+                self.guard.abort(key)
+                return None
+            self.guard.start(key, task)
+        
+        task.future.add_done_callback(lambda future: self.guard.finish(key, self._task_succeeded(future)))
+        return task
+    
+    @staticmethod
+    def _task_succeeded(future):
+        if future.cancelled():
+            return False
+        try:
+            return bool(future.result())
+        except Exception:
+            return False
+    
+    def get_stats(self):
+        """返回修复操作的统计"""
+        stats = self.guard.stats()
+        stats["pending"] = len(self.executor.pending())
+        return stats
+    
+    def cancel_all(self):
+        """取消所有未完成的修复操作"""
+        self.executor.cancel_all()
+    
+    def shutdown(self):
+        """取消未完成的修复操作并关闭执行线程池（停止系统时调用）"""
+        self.executor.shutdown()
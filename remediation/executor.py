@@ -0,0 +1,121 @@
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, CancelledError
+
+class RemediationCancelled(Exception):
+    """修复操作被取消或超时"""
+
+class RemediationContext:
+    """传递给修复操作的上下文，用于协作式的取消和超时检查"""
+    
+    def __init__(self, timeout=None):
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.cancel_event = threading.Event()
+    
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+    
+    def remaining(self):
+        """剩余时间（秒），未设置超时返回None"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+    
+    def check(self):
+        """已取消或超时则抛出RemediationCancelled"""
+        if self.cancel_event.is_set():
+            raise RemediationCancelled("cancelled")
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise RemediationCancelled("timeout")
+    
+    def sleep(self, seconds):
+        """可被取消打断的等待"""
+        remaining = self.remaining()
+        if remaining is not None:
+            seconds = min(seconds, remaining)
+        self.cancel_event.wait(seconds)
+        self.check()
+
+class RemediationTask:
+    """已提交的修复任务"""
+    
+    def __init__(self, issue_type, context, future):
+        self.issue_type = issue_type
+        self.context = context
+        self.future = future
+        self.submitted_at = time.time()
+    
+    def cancel(self):
+        """取消任务：未开始的直接取消，运行中的在下一个检查点停止"""
+        self.context.cancel_event.set()
+        return self.future.cancel()
+    
+    def done(self):
+        return self.future.done()
+    
+    def result(self, timeout=None):
+        """等待并返回修复结果（True/False）"""
+        try:
+            return self.future.result(timeout=timeout)
+        except CancelledError:
+            return False
+
+class RemediationExecutor:
+    """修复操作的并发执行器
+
+    修复在线程池中执行，调用方立即返回；max_concurrency限制同时运行的操作数，
+    max_pending限制排队数量，每个操作有独立的超时，可随时取消。
+    """
+    
+    def __init__(self, max_concurrency=2, max_pending=50, default_timeout=60):
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self.default_timeout = default_timeout
+        self.logger = logging.getLogger("remediation_engine")
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="remediation")
+        self._lock = threading.Lock()
+        self._tasks = set()
+    
+    def submit(self, issue_type, func, timeout=None, **kwargs):
+        """提交修复操作，func需接受context关键字参数；队列已满时返回None"""
+        with self._lock:
+            self._tasks = {task for task in self._tasks if not task.done()}
+            if len(self._tasks) >= self.max_pending:
+                self.logger.warning(f"Remediation queue full, dropping {issue_type}")
+                return None
+            
+            context = RemediationContext(timeout or self.default_timeout)
+            future = self._pool.submit(self._run, issue_type, func, context, kwargs)
+            task = RemediationTask(issue_type, context, future)
+            self._tasks.add(task)
+            return task
+    
+    def _run(self, issue_type, func, context, kwargs):
+        start = time.monotonic()
+        try:
+            context.check()
+            result = func(context=context, **kwargs)
+            self.logger.info(f"Remediation {issue_type} finished in {time.monotonic() - start:.2f}s: {result}")
+            return result
+        except RemediationCancelled as e:
+            self.logger.warning(f"Remediation {issue_type} stopped ({str(e)}) after {time.monotonic() - start:.2f}s")
+            return False
+        except Exception as e:
+            self.logger.error(f"Remediation {issue_type} failed: {str(e)}")
+            return False
+    
+    def pending(self):
+        """未完成的任务"""
+        with self._lock:
+            return [task for task in self._tasks if not task.done()]
+    
+    def cancel_all(self):
+        """取消所有未完成的任务"""
+        for task in self.pending():
+            task.cancel()
+    
+    def shutdown(self, wait=False):
+        self.cancel_all()
+        self._pool.shutdown(wait=wait)
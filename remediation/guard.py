@@ -0,0 +1,143 @@
+import time
+import threading
+from collections import deque
+
+class CircuitBreaker:
+    """修复操作的熔断器
+
+    连续失败达到failure_threshold次后打开，reset_seconds内拒绝执行；
+    之后进入半开状态只放行一次试探，成功则关闭，失败则重新打开。
+    """
+    
+    def __init__(self, failure_threshold=3, reset_seconds=1800):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_progress = False
+    
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+    
+    def allow(self):
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.trial_in_progress:
+            self.trial_in_progress = True
+            return True
+        return False
+    
+    def record(self, success):
+        self.trial_in_progress = False
+        if success:
+            self.failures = 0
+            self.opened_at = None
+        else:
+            self.failures += 1
+            if self.failures >= self.failure_threshold or self.opened_at is not None:
+                self.opened_at = time.monotonic()
+
+class RemediationGuard:
+    """修复操作的去重、限流和熔断
+
+    按(问题类型, 目标)跟踪正在执行和最近执行的操作：执行中的重复请求被合并，
+    同一目标在min_interval_seconds内不重复执行，每种问题类型每小时最多
+    max_per_hour次，连续失败的目标由熔断器暂停，所有决定记录在history中。
+    """
+    
+    def __init__(self, min_interval_seconds=300, max_per_hour=6, failure_threshold=3,
+                 breaker_reset_seconds=1800, history_size=200):
+        self.min_interval_seconds = min_interval_seconds
+        self.max_per_hour = max_per_hour
+        self.failure_threshold = failure_threshold
+        self.breaker_reset_seconds = breaker_reset_seconds
+        self.lock = threading.Lock()
+        self.inflight = {}
+        self.last_started = {}
+        self.type_starts = {}
+        self.breakers = {}
+        self.history = deque(maxlen=history_size)
+        self.counters = {"executed": 0, "coalesced": 0, "rate_limited": 0, "circuit_open": 0,
+                         "succeeded": 0, "failed": 0}
+    
+    def _breaker(self, key):
+        if key not in self.breakers:
+            self.breakers[key] = CircuitBreaker(self.failure_threshold, self.breaker_reset_seconds)
+        return self.breakers[key]
+    
+    def _record(self, key, status, result=None):
+        self.counters[status] = self.counters.get(status, 0) + 1
+        self.history.append({
+            "issue_type": key[0],
+            "target": key[1],
+            "status": status,
+            "result": result,
+            "timestamp": time.time()
+        })
+    
+    def check(self, key):
+        """判断是否允许执行，返回 (状态, 执行中的任务)；调用方需持有lock
+
+        状态为 executed（允许执行）、coalesced、rate_limited 或 circuit_open。
+        """
+        task = self.inflight.get(key)
+        if task is not None and not task.done():
+            self._record(key, "coalesced")
+            return "coalesced", task
+        
+        now = time.monotonic()
+        last = self.last_started.get(key)
+        if last is not None and now - last < self.min_interval_seconds:
+            self._record(key, "rate_limited")
+            return "rate_limited", None
+        
+        starts = self.type_starts.setdefault(key[0], deque())
+        while starts and now - starts[0] >= 3600:
+            starts.popleft()
+        if self.max_per_hour and len(starts) >= self.max_per_hour:
+            self._record(key, "rate_limited")
+            return "rate_limited", None
+        
+        if not self._breaker(key).allow():
+            self._record(key, "circuit_open")
+            return "circuit_open", None
+        
+        return "executed", None
+    
+    def start(self, key, task=None):
+        """记录一次执行开始；调用方需持有lock"""
+        now = time.monotonic()
+        self.last_started[key] = now
+        self.type_starts.setdefault(key[0], deque()).append(now)
+        if task is not None:
+            self.inflight[key] = task
+        self._record(key, "executed")
+    
+    def abort(self, key):
+        """提交失败时撤销check中占用的熔断器试探名额；调用方需持有lock"""
+        if key in self.breakers:
+            self.breakers[key].trial_in_progress = False
+    
+    def finish(self, key, success):
+        """记录执行结果"""
+        with self.lock:
+            self.inflight.pop(key, None)
+            self._breaker(key).record(success)
+            self._record(key, "succeeded" if success else "failed", result=success)
+    
+    def stats(self):
+        """返回计数、熔断器状态和最近的记录"""
+        with self.lock:
+            return {
+                "counters": dict(self.counters),
+                "inflight": [f"{k[0]}:{k[1]}" for k, t in self.inflight.items() if not t.done()],
+                "breakers": {f"{k[0]}:{k[1]}": {"state": b.state, "failures": b.failures}
+                             for k, b in self.breakers.items()},
+                "recent": list(self.history)[-20:]
+            }
@@ -0,0 +1,62 @@
+import os
+import sys
+import time
+from datetime import datetime
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from alerting.alert_store import AlertStore
+
+def make_store(tmp_path, count=30, retention_days=180):
+    store = AlertStore(str(tmp_path / "alerts.db"), retention_days=retention_days)
+    now = time.time()
+    for i in range(count):
+        store.add({
+            "timestamp": datetime.fromtimestamp(now - (count - i) * 60),
+            "type": "high_cpu" if i % 2 else "service_down",
+            "resource_id": f"host-{i % 3}",
+            "severity": "warning",
+            "message": f"alert {i}",
+            "details": {"i": i}
+        })
+    return store, now
+
+def test_query_pages_newest_first(tmp_path):
+    store, _ = make_store(tmp_path)
+    alerts, total = store.query(limit=10)
+    assert total == 30
+    assert [a["details"]["i"] for a in alerts] == list(range(20, 30))
+    alerts, _ = store.query(limit=10, offset=10)
+    assert [a["details"]["i"] for a in alerts] == list(range(10, 20))
+    store.close()
+
+def test_query_filters(tmp_path):
+    store, now = make_store(tmp_path)
+    alerts, total = store.query(alert_type="high_cpu", resource_id="host-1", limit=100)
+    assert total == len(alerts) == 5
+    assert all(a["type"] == "high_cpu" and a["resource_id"] == "host-1" for a in alerts)
+    _, total = store.query(start=now - 10 * 60 - 1, end=now)
+    assert total == 10
+    store.close()
+
+def test_recent_and_last_sent(tmp_path):
+    store, now = make_store(tmp_path)
+    recent = store.recent(3)
+    assert [a["message"] for a in recent] == ["alert 27", "alert 28", "alert 29"]
+    assert isinstance(recent[0]["timestamp"], datetime)
+    last = store.last_sent(now - 3600)
+    assert last[("high_cpu", "host-2")] == datetime.fromtimestamp(now - 60)
+    assert len(last) == 6
+    store.close()
+
+def test_prune_and_reopen(tmp_path):
+    store, now = make_store(tmp_path, count=5, retention_days=1)
+    store.add({"timestamp": datetime.fromtimestamp(now - 2 * 86400), "type": "old", "resource_id": "x"})
+    assert store.count() == 6
+    assert store.prune() == 1
+    store.close()
+
+    reopened = AlertStore(str(tmp_path / "alerts.db"))
+    assert reopened.count() == 5
+    reopened.close()
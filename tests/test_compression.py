@@ -0,0 +1,71 @@
+import os
+import sys
+from datetime import datetime
+
+import numpy as np
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from infrastructure.compression import CompressedBlock, decode_floats, encode_floats, encode_ints, decode_ints
+
+START = 1_700_000_000
+
+def make_records(count=200):
+    records = []
+    for i in range(count):
+        records.append({
+            "timestamp": START + i * 60,
+            "host": f"web-{i % 3}",
+            "cpu_percent": round(10 + (i % 17) * 1.5, 1),
+            "memory_percent": None if i % 10 == 0 else 40.0 + i / 7,
+            "processes": 100 + i % 5,
+            "healthy": i % 4 != 0,
+            "network_io": {"bytes_sent": 1000 * i, "bytes_recv": 2000 * i}
+        })
+    return records
+
+def encode(records):
+    return CompressedBlock.encode(records, [r["timestamp"] for r in records])
+
+def expected(record):
+    """缺失值不还原"""
+    return {key: value for key, value in record.items() if value is not None}
+
+def test_float_and_int_codecs_roundtrip():
+    values = [0.1, 2.5, np.nan, -3.75, 1e6, 42.0]
+    decoded = decode_floats(*encode_floats(values))
+    np.testing.assert_array_equal(decoded, np.array(values))
+    ints = [5, 7, 7, -3, 2 ** 40]
+    assert decode_ints(encode_ints(ints)).tolist() == ints
+
+def test_block_roundtrip():
+    records = make_records()
+    block = encode(records)
+    assert len(block) == len(records)
+    assert block.times().tolist() == [r["timestamp"] for r in records]
+    assert block.records() == [expected(r) for r in records]
+    np.testing.assert_array_equal(block.feature_array(["cpu_percent"])[:, 0],
+                                  [r["cpu_percent"] for r in records])
+
+def test_records_with_indices():
+    records = make_records()
+    block = encode(records)
+    indices = [199, 0, 57, 57, 120]
+    assert block.records(indices) == [expected(records[i]) for i in indices]
+    assert block.records([]) == []
+
+def test_iso_timestamps():
+    records = make_records(10)
+    times = [r["timestamp"] for r in records]
+    for record in records:
+        record["timestamp"] = datetime.fromtimestamp(record["timestamp"]).isoformat()
+    block = CompressedBlock.encode(records, times)
+    assert not block.numeric_timestamps
+    assert block.records([3, 1]) == [expected(records[3]), expected(records[1])]
+
+def test_bytes_roundtrip():
+    records = make_records()
+    block = CompressedBlock.from_bytes(encode(records).to_bytes())
+    assert block.records() == [expected(r) for r in records]
+    assert block.records([5, 6]) == [expected(records[5]), expected(records[6])]
@@ -0,0 +1,31 @@
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from infrastructure.cpu_budget import CPUBudget
+
+def test_training_runs_on_dedicated_thread():
+    """调用方（如调度器的工作线程）的nice值不受训练影响"""
+    budget = CPUBudget(niceness=5)
+    pool = ThreadPoolExecutor(max_workers=1)
+    try:
+        before = pool.submit(os.nice, 0).result()
+        training = pool.submit(budget.run, lambda: (threading.current_thread().name, os.nice(0))).result()
+        assert training[0].startswith("training")
+        assert training[1] == max(before, 5)
+        assert pool.submit(os.nice, 0).result() == before
+        # 训练线程内的嵌套调用直接执行
+        training_thread = budget.run(threading.current_thread)
+        assert budget.run(budget.run, threading.current_thread) is training_thread
+    finally:
+        budget.close()
+        pool.shutdown()
+
+def test_n_jobs_respects_limits():
+    budget = CPUBudget(max_cores=1, cpu_fraction=1.0)
+    assert budget.n_jobs() == 1
+    assert CPUBudget(cpu_fraction=0.01).n_jobs() == 1
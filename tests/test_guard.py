@@ -0,0 +1,104 @@
+import os
+import sys
+from concurrent.futures import Future
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from remediation import guard as guard_module
+from remediation.guard import CircuitBreaker, RemediationGuard
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def use_clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(guard_module.time, "monotonic", clock)
+    return clock
+
+def run(guard, key, success=True):
+    """检查并执行一次，返回检查状态"""
+    with guard.lock:
+        status, _ = guard.check(key)
+        if status == "executed":
+            guard.start(key)
+    if status == "executed":
+        guard.finish(key, success)
+    return status
+
+def test_breaker_opens_and_half_opens(monkeypatch):
+    clock = use_clock(monkeypatch)
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=60)
+    breaker.record(False)
+    assert breaker.state == "closed"
+    breaker.record(False)
+    assert breaker.state == "open" and not breaker.allow()
+
+    clock.now += 60
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()  # 半开状态只放行一次试探
+    breaker.record(False)
+    assert breaker.state == "open"
+
+    clock.now += 60
+    assert breaker.allow()
+    breaker.record(True)
+    assert breaker.state == "closed" and breaker.failures == 0
+
+def test_inflight_requests_are_coalesced(monkeypatch):
+    use_clock(monkeypatch)
+    guard = RemediationGuard()
+    key = ("service_down", "nginx")
+    task = Future()
+    with guard.lock:
+        assert guard.check(key) == ("executed", None)
+        guard.start(key, task)
+        assert guard.check(key) == ("coalesced", task)
+    assert guard.stats()["inflight"] == ["service_down:nginx"]
+
+def test_rate_limits(monkeypatch):
+    clock = use_clock(monkeypatch)
+    guard = RemediationGuard(min_interval_seconds=300, max_per_hour=2)
+    assert run(guard, ("high_cpu", "a")) == "executed"
+    assert run(guard, ("high_cpu", "a")) == "rate_limited"
+    assert run(guard, ("high_cpu", "b")) == "executed"
+    # 每种问题类型每小时最多max_per_hour次
+    clock.now += 300
+    assert run(guard, ("high_cpu", "c")) == "rate_limited"
+    assert run(guard, ("disk_full", "c")) == "executed"
+
+    clock.now += 3600
+    assert run(guard, ("high_cpu", "a")) == "executed"
+    assert guard.counters["rate_limited"] == 2
+
+def test_failing_target_trips_breaker(monkeypatch):
+    clock = use_clock(monkeypatch)
+    guard = RemediationGuard(min_interval_seconds=0, max_per_hour=0, failure_threshold=2,
+                             breaker_reset_seconds=600)
+    key = ("service_down", "db")
+    assert run(guard, key, success=False) == "executed"
+    assert run(guard, key, success=False) == "executed"
+    assert run(guard, key) == "circuit_open"
+    assert guard.stats()["breakers"]["service_down:db"]["state"] == "open"
+
+    clock.now += 600
+    assert run(guard, key) == "executed"
+    assert guard.stats()["breakers"]["service_down:db"]["state"] == "closed"
+    assert [entry["status"] for entry in guard.history][-2:] == ["executed", "succeeded"]
+
+def test_abort_releases_trial(monkeypatch):
+    clock = use_clock(monkeypatch)
+    guard = RemediationGuard(min_interval_seconds=0, max_per_hour=0, failure_threshold=1,
+                             breaker_reset_seconds=60)
+    key = ("high_memory", "1234")
+    run(guard, key, success=False)
+    clock.now += 60
+    with guard.lock:
+        assert guard.check(key)[0] == "executed"
+        guard.abort(key)
+        assert guard.check(key)[0] == "executed"
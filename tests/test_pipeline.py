@@ -0,0 +1,61 @@
+import os
+import sys
+import time
+import logging
+import threading
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from controller.pipeline import Pipeline, Stage
+
+def test_items_flow_through_stages():
+    results = []
+    done = threading.Event()
+    pipeline = Pipeline()
+    pipeline.add_stage("double", lambda item: [item * 2])
+    pipeline.add_stage("collect", lambda item: results.append(item) or (len(results) == 3 and done.set()))
+    pipeline.start()
+    for item in (1, 2, 3):
+        assert pipeline.submit("double", item)
+    assert done.wait(5)
+    assert pipeline.stop(timeout=5)
+    assert sorted(results) == [2, 4, 6]
+
+def test_stop_while_queue_is_refilled():
+    """工作线程忙且上游持续写入使队列保持满时，停止不会无限阻塞"""
+    gate = threading.Event()
+    stage = Stage("slow", lambda item: gate.wait(5), queue_size=1, policy="drop_newest", block_timeout=0.2)
+    stage.start(logging.getLogger("test"))
+    producing = threading.Event()
+    producing.set()
+
+    def produce():
+        while producing.is_set():
+            stage.submit(1)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    time.sleep(0.1)
+    workers = list(stage.threads)
+    result = []
+    stopper = threading.Thread(target=lambda: result.append(stage.stop(timeout=1)), daemon=True)
+    stopper.start()
+    stopper.join(3)
+    assert result == [False]
+
+    # 当前数据处理完后工作线程退出
+    gate.set()
+    for thread in workers:
+        thread.join(3)
+        assert not thread.is_alive()
+    producing.clear()
+    producer.join()
+
+    # 重新启动后工作线程不会读到遗留的停止标记
+    stage.start(logging.getLogger("test"))
+    stage.submit(1)
+    time.sleep(0.3)
+    assert stage.queue.qsize() == 0
+    assert all(thread.is_alive() for thread in stage.threads)
+    assert stage.stop(timeout=2)
@@ -0,0 +1,55 @@
+import os
+import sys
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from infrastructure.remote_collector import RemoteCollector, ScrapeTarget, parse_prometheus_text
+
+def test_parse_prometheus_text():
+    text = '# TYPE a gauge\na{x="1",y="q\\"z"} 3 123\nb 4\nc{} 5\n'
+    assert parse_prometheus_text(text) == {"a": [({"x": "1", "y": 'q"z'}, 3.0)], "b": [({}, 4.0)],
+                                           "c": [({}, 5.0)]}
+    assert list(parse_prometheus_text(text, {"b"})) == ["b"]
+
+def test_rate_metric_missing_on_first_scrape():
+    target = ScrapeTarget("t", "http://unused", metrics={
+        "cpu_percent": {"metric": "idle_seconds", "rate": True, "scale": -100, "offset": 100}
+    })
+    assert target.extract(b"idle_seconds 10\n", now=100.0) == {}
+    assert target.extract(b"idle_seconds 10.5\n", now=101.0) == {"cpu_percent": 50.0}
+
+class ExporterHandler(BaseHTTPRequestHandler):
+    BODIES = {
+        "/complete": b"cpu_percent 10\nmemory_percent 20\ndisk_usage 30\n",
+        "/partial": b"cpu_percent 10\n"
+    }
+
+    def do_GET(self):
+        body = self.BODIES[self.path]
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def test_incomplete_records_are_not_buffered():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ExporterHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        collector = RemoteCollector([{"name": "complete", "url": url + "/complete"},
+                                     {"name": "partial", "url": url + "/partial"}])
+        records = collector.scrape_once()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert [record["host"] for record in records] == ["complete"]
+    assert collector.drain() == records
+    assert collector.stats()["incomplete"] == 1
+    assert collector.targets["partial"].missing == ["memory_percent", "disk_usage"]
@@ -0,0 +1,92 @@
+import os
+import sys
+import json
+import time
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from infrastructure.rollup import RollupStore, merge_points
+
+NOW = 1_700_000_000 - 1_700_000_000 % 3600
+FEATURES = ['cpu_percent']
+
+def make_store(seconds, step=60):
+    """1分钟（保留7天）和1小时（保留30天）两个层级，写入最近seconds秒的数据"""
+    store = RollupStore(FEATURES, tiers=((60, 7 * 86400), (3600, 30 * 86400)))
+    for timestamp in range(NOW - seconds, NOW, step):
+        store.add({"timestamp": timestamp, "cpu_percent": float(timestamp % 100)})
+    return store
+
+def test_no_resolution_uses_raw():
+    store = make_store(3600)
+    assert store.choose_tier(NOW - 3600, NOW) is None
+
+def test_coarsest_tier_meeting_resolution():
+    store = make_store(10 * 86400)
+    assert store.choose_tier(NOW - 86400, NOW, resolution=60).resolution == 60
+    assert store.choose_tier(NOW - 86400, NOW, resolution=7200).resolution == 3600
+
+def test_start_beyond_fine_retention_uses_covering_tier():
+    store = make_store(10 * 86400)
+    assert store.choose_tier(NOW - 9 * 86400, NOW, resolution=60).resolution == 3600
+
+def test_short_uptime_keeps_requested_resolution():
+    # 只有1小时数据，没有层级覆盖24小时前的start
+    store = make_store(3600)
+    assert store.choose_tier(NOW - 86400, NOW, resolution=60).resolution == 60
+
+    tier = store.choose_tier(NOW - 86400, NOW, max_points=500)
+    assert tier.resolution == 60
+    assert len(store.query(tier, NOW - 86400, NOW)) == 60
+
+def test_max_points_limits_points():
+    store = make_store(10 * 86400)
+    for hours, max_points in ((50, 100), (24, 500), (2, 500)):
+        start = NOW - hours * 3600
+        tier = store.choose_tier(start, NOW, max_points=max_points)
+        assert len(store.query(tier, start, NOW)) <= max_points
+    # 满足点数限制的最细层级
+    assert store.choose_tier(NOW - 2 * 3600, NOW, max_points=500).resolution == 60
+    assert store.choose_tier(NOW - 50 * 3600, NOW, max_points=100).resolution == 3600
+
+def test_merge_points_when_coarsest_tier_is_too_fine():
+    store = make_store(10 * 86400)
+    start = NOW - 9 * 86400
+    tier = store.choose_tier(start, NOW, max_points=100)
+    assert tier.resolution == 3600
+    points = store.query(tier, start, NOW)
+    merged = merge_points(points, 100)
+    assert len(points) > 100 and len(merged) <= 100
+    assert sum(p["count"] for p in merged) == sum(p["count"] for p in points)
+    size = -(-len(points) // 100)
+    first = points[:size]
+    assert merged[0]["cpu_percent"]["max"] == max(p["cpu_percent"]["max"] for p in first)
+    assert abs(merged[0]["cpu_percent"]["mean"] - sum(p["count"] * p["cpu_percent"]["mean"] for p in first)
+               / sum(p["count"] for p in first)) < 1e-9
+    assert min(p["cpu_percent"]["min"] for p in merged) == min(p["cpu_percent"]["min"] for p in points)
+
+def test_short_uptime_coarse_request():
+    store = make_store(3600)
+    assert store.choose_tier(NOW - 30 * 86400, NOW, resolution=86400).resolution == 3600
+
+def test_export_restore_and_replay():
+    """恢复封存的桶后重放原始窗口，已封存的桶不重复计算"""
+    now = time.time()
+    now -= now % 3600
+    records = [{"timestamp": t, "cpu_percent": float(t % 7)} for t in range(int(now - 3 * 86400), int(now), 60)]
+    original = RollupStore(FEATURES)
+    for record in records:
+        original.add(record)
+
+    restored = RollupStore(FEATURES)
+    assert restored.restore(json.loads(json.dumps(original.export()))) > 0
+    # 快照只保留最近2小时的原始数据
+    for record in records[-120:]:
+        restored.add(record)
+
+    for tier_a, tier_b in zip(original.tiers, restored.tiers):
+        assert tier_a.starts == tier_b.starts
+        assert tier_a.summaries == tier_b.summaries
+        assert original.query(tier_a, now - 86400, now) == restored.query(tier_b, now - 86400, now)
+        assert tier_b.late == 0
@@ -0,0 +1,59 @@
+import os
+import sys
+import time
+import threading
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from controller.scheduler import Scheduler
+
+def test_jobs_run_periodically_and_failures_are_counted():
+    scheduler = Scheduler(name="test_scheduler")
+    scheduler.add_job("tick", lambda: None, 0.05)
+    scheduler.add_job("fail", lambda: 1 / 0, 0.05)
+    scheduler.start()
+    time.sleep(0.3)
+    assert scheduler.stop(timeout=2)
+    stats = scheduler.stats()
+    assert stats["tick"]["runs"] >= 4
+    assert stats["fail"]["failures"] == stats["fail"]["runs"] >= 4
+
+def test_overrun_skips_tick():
+    scheduler = Scheduler(name="test_scheduler")
+    release = threading.Event()
+    scheduler.add_job("slow", lambda: release.wait(2), 0.05)
+    scheduler.start()
+    time.sleep(0.3)
+    release.set()
+    assert scheduler.stop(timeout=2)
+    stats = scheduler.stats()["slow"]
+    # 上一次执行未结束时跳过触发，不并发执行
+    assert stats["overruns"] >= 3
+    assert stats["runs"] <= 2
+
+def test_stop_interrupts_wait():
+    scheduler = Scheduler(name="test_scheduler")
+    scheduler.add_job("later", lambda: None, 3600, initial_delay=3600)
+    scheduler.start()
+    start = time.monotonic()
+    assert scheduler.stop(timeout=2)
+    assert time.monotonic() - start < 1
+    assert scheduler.stats()["later"]["runs"] == 0
+
+def test_reschedule_and_resume():
+    scheduler = Scheduler(name="test_scheduler")
+    ran = threading.Event()
+    scheduler.add_job("job", ran.set, 3600, initial_delay=0.01)
+    scheduler.start()
+    assert ran.wait(2)
+    ran.clear()
+    # 缩短间隔后下一次运行不晚于 now + interval
+    scheduler.reschedule("job", 0.05)
+    assert ran.wait(2)
+    assert scheduler.stop(timeout=2)
+
+    resumed = Scheduler(name="test_scheduler")
+    resumed.add_job("job", lambda: None, 3600, initial_delay=3600)
+    resumed.resume({"job": time.time() + 10, "unknown": 0})
+    assert 9 < resumed.jobs["job"].initial_delay <= 10
@@ -0,0 +1,31 @@
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from controller.sharding import HashRing
+
+HOSTS = [f"host-{i}" for i in range(1000)]
+
+def test_hosts_spread_over_nodes():
+    ring = HashRing(["shard-0", "shard-1", "shard-2"])
+    counts = {}
+    for host in HOSTS:
+        node = ring.get(host)
+        counts[node] = counts.get(node, 0) + 1
+    assert ring.nodes() == ["shard-0", "shard-1", "shard-2"]
+    assert min(counts.values()) > len(HOSTS) / 6
+
+def test_adding_node_only_moves_its_hosts():
+    ring = HashRing(["shard-0", "shard-1", "shard-2"])
+    before = {host: ring.get(host) for host in HOSTS}
+    ring.add("shard-3")
+    moved = [host for host in HOSTS if ring.get(host) != before[host]]
+    assert moved and all(ring.get(host) == "shard-3" for host in moved)
+
+    ring.remove("shard-3")
+    assert {host: ring.get(host) for host in HOSTS} == before
+
+def test_empty_ring():
+    assert HashRing().get("host-0") is None
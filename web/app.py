@@ -1,9 +1,8 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, render_template, jsonify, request, Response
 import pandas as pd
 import json
 import os
 import sys
-import logging
 from datetime import datetime, timedelta
 import threading
 import time
@@ -12,19 +11,16 @@ import time
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from controller.main_controller import AIOperationsController
+from controller.sharding import ShardCoordinator, load_sharding_config
+from infrastructure.query import parse_time, AGGREGATIONS
+from infrastructure.logging_setup import configure_logging, get_logger
 
 app = Flask(__name__)
 
 # 设置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("web_app.log"),
-        logging.StreamHandler()
-    ]
-)
-logger = logging.getLogger("web_app")
+configure_logging(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'config', 'config.json')),
+                  root_file="web_app.log")
+logger = get_logger("web_app")
 
 # 全局控制器实例
 controller = None
@@ -34,7 +30,11 @@ def start_controller():
     """在后台线程中启动控制器"""
     global controller
     config_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'config', 'config.json'))
-    controller = AIOperationsController(config_path=config_path)
+    if load_sharding_config(config_path).get("enabled", False):
+        # 分片模式：协调器按主机把指标路由到多个控制器进程
+        controller = ShardCoordinator(config_path=config_path)
+    else:
+        controller = AIOperationsController(config_path=config_path)
     controller.start()
 
 @app.route('/')
@@ -53,48 +53,158 @@ def get_status():
             "message": "系统未启动"
         })
     
-    return jsonify({
-        "status": "running" if controller.running else "stopped",
-        "threads": len(controller.threads),
-        "data_points": len(controller.metrics_data) if controller.metrics_data else 0,
-        "last_update": datetime.now().isoformat()
-    })
+    return jsonify(controller.get_status())
 
 @app.route('/api/metrics')
 def get_metrics():
     """获取最近的指标数据"""
     global controller
     
-    if controller is None or not controller.metrics_data:
+    if controller is None:
         return jsonify([])
     
     # 获取最近的数据点数量
     limit = request.args.get('limit', default=100, type=int)
     
-    with controller.data_lock:
-        recent_data = controller.metrics_data[-limit:]
+    # 读取不可变快照，无需加锁
+    return jsonify(controller.recent_metrics(limit))
+
+@app.route('/api/metrics/history')
+def get_metrics_history():
+    """按时间范围获取指标（hours指定最近几小时，points限制点数，自动选择聚合层级）"""
+    global controller
+    
+    if controller is None:
+        return jsonify({"tier": None, "points": []})
+    
+    hours = request.args.get('hours', default=24, type=float)
+    points = request.args.get('points', default=500, type=int)
+    resolution = request.args.get('resolution', default=None, type=float)
+    
+    end = time.time()
+    start = end - hours * 3600
+    return jsonify(controller.query_metrics(start, end, resolution=resolution, max_points=points))
+
+@app.route('/api/query')
+def query_metrics():
+    """范围查询：host、metrics（逗号分隔）、start/end（epoch秒或ISO时间）、step（秒）、agg"""
+    global controller
+    
+    if controller is None:
+        return jsonify({"source": None, "points": []})
+    
+    try:
+        start = parse_time(request.args.get('start'))
+        end = parse_time(request.args.get('end'))
+    except ValueError as e:
+        return jsonify({"error": f"invalid time: {str(e)}"}), 400
+    
+    metrics = request.args.get('metrics')
+    step = request.args.get('step', default=None, type=float)
+    agg = request.args.get('agg', default='mean')
+    if agg not in AGGREGATIONS:
+        return jsonify({"error": f"unsupported agg: {agg}"}), 400
+    if step is not None and step <= 0:
+        return jsonify({"error": "step must be positive"}), 400
     
-    return jsonify(recent_data)
+    return jsonify(controller.range_query(
+        start=start,
+        end=end,
+        host=request.args.get('host'),
+        features=metrics.split(',') if metrics else None,
+        step=step,
+        agg=agg
+    ))
 
 @app.route('/api/alerts')
 def get_alerts():
-    """获取最近的告警"""
+    """分页查询告警（按时间从新到旧分页，页内从旧到新），总数在X-Total-Count响应头中
+    
+    参数：limit、offset、type、resource、severity、start、end
+    """
     global controller
     
-    if controller is None or not controller.alert_manager:
+    if controller is None:
         return jsonify([])
     
-    # 获取最近的告警数量
     limit = request.args.get('limit', default=50, type=int)
+    offset = request.args.get('offset', default=0, type=int)
+    if limit <= 0 or offset < 0:
+        return jsonify({"error": "limit must be positive and offset non-negative"}), 400
+    try:
+        start = parse_time(request.args.get('start'))
+        end = parse_time(request.args.get('end'))
+    except ValueError as e:
+        return jsonify({"error": f"invalid time: {str(e)}"}), 400
+    
+    result = controller.query_alerts(
+        start=start,
+        end=end,
+        alert_type=request.args.get('type'),
+        resource_id=request.args.get('resource'),
+        severity=request.args.get('severity'),
+        limit=limit,
+        offset=offset
+    )
+    response = jsonify(result["alerts"])
+    response.headers["X-Total-Count"] = str(result["total"])
+    return response
+
+@app.route('/api/processes')
+def get_processes():
+    """获取最近一次采样的进程Top-N表"""
+    global controller
     
-    alerts = controller.alert_manager.alert_history[-limit:]
+    if controller is None or controller.process_tracker is None:
+        return jsonify({})
     
-    # 转换datetime对象为ISO格式字符串
-    for alert in alerts:
-        if isinstance(alert.get('timestamp'), datetime):
-            alert['timestamp'] = alert['timestamp'].isoformat()
+    return jsonify(controller.process_tracker.get_table())
+
+@app.route('/api/services')
+def get_services():
+    """获取最近一次服务健康检查的结果（缓存，不触发检查）"""
+    global controller
+    
+    if controller is None or controller.health_checker is None:
+        return jsonify({})
+    
+    return jsonify(controller.health_checker.results())
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """以Prometheus文本格式输出系统自身指标"""
+    global controller
+    
+    if controller is None:
+        return Response("", mimetype="text/plain; version=0.0.4")
+    
+    return Response(controller.instrumentation.render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+@app.route('/api/profiler', methods=['POST'])
+def toggle_profiler():
+    """开启或关闭采样分析器（action=start/stop），停止时返回折叠栈文件路径"""
+    global controller
     
-    return jsonify(alerts)
+    if controller is None:
+        return jsonify({
+            "success": False,
+            "message": "系统未启动"
+        })
+    
+    action = request.args.get('action', default='start')
+    if action == 'start':
+        started = controller.profiler.start()
+        return jsonify({
+            "success": started,
+            "message": "采样分析已开启" if started else "采样分析已在运行中"
+        })
+    
+    output_path = controller.profiler.stop()
+    return jsonify({
+        "success": output_path is not None,
+        "output_path": output_path,
+        "samples": controller.profiler.samples
+    })
 
 @app.route('/api/start', methods=['POST'])
 def start_system():
@@ -181,11 +291,11 @@ def get_forecast():
             "message": "预测数据不可用"
         })
     
-    # 在实际应用中，应该返回图像文件或预测数据
-    # 这里简化为返回文件路径
+    # 图像只包含第一台主机，各主机各指标的分位数和达到阈值的时间估计在summary中
     return jsonify({
         "success": True,
         "forecast_path": forecast_path,
+        "summary": getattr(controller, "forecast_summary", {}) if controller is not None else {},
         "last_update": datetime.fromtimestamp(os.path.getmtime(forecast_path)).isoformat()
     })
 